@@ -1,15 +1,45 @@
 import os
 import re
+import json
 import time
+import gzip
+import shutil
+import sqlite3
+import select
+import bisect
+import hashlib
+import itertools
+from array import array
+import mimetypes
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
 import secrets
-from datetime import datetime
-from collections import defaultdict
-from flask import Flask, render_template, request, jsonify, redirect, session, Response, send_file
+import socket
+import random
+import tempfile
+import unicodedata
+from datetime import date, datetime, timedelta
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from collections import defaultdict, OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import Flask, render_template, request, jsonify, redirect, session, Response, send_file, send_from_directory, stream_with_context, has_request_context
+from flask.logging import default_handler
 import pytz
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, NamedTupleCursor, execute_values
 from psycopg2 import pool
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 app = Flask(__name__)
@@ -24,39 +54,595 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = True  # Cookie solo viaja por HTTPS
 
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+FECHA_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 TIMEZONE = pytz.timezone('America/Lima')
 DATABASE_URL = os.environ.get("DATABASE_URL")
-print("💾 Usando PostgreSQL (Azure)")
+
+# ===============================
+# CONTEO DE CONSULTAS — por petición
+# ===============================
+# Las conexiones de los pools cuentan cada sentencia enviada y PooledConn cada conexión
+# tomada. Solo se cuenta dentro de una petición (ver iniciar_conteo).
+_conteo = threading.local()
+_cursores_contados = {}
+
+
+def contar(consultas=0, conexiones=0, db_seg=0.0):
+    if getattr(_conteo, "activo", False):
+        _conteo.consultas += consultas
+        _conteo.conexiones += conexiones
+        _conteo.db_seg += db_seg
+
+
+@contextmanager
+def sin_conteo():
+    # Para lecturas de infraestructura que no dependen de la petición (atraso de réplica)
+    activo = getattr(_conteo, "activo", False)
+    _conteo.activo = False
+    try:
+        yield
+    finally:
+        _conteo.activo = activo
+
+
+def cursor_contado(base):
+    if base not in _cursores_contados:
+        class CursorContado(base):
+            def execute(self, query, vars=None):
+                inicio = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    contar(consultas=1, db_seg=time.perf_counter() - inicio)
+
+            def executemany(self, query, vars_list):
+                vars_list = list(vars_list)
+                inicio = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    contar(consultas=len(vars_list), db_seg=time.perf_counter() - inicio)
+
+        CursorContado.__name__ = f"{base.__name__}Contado"
+        _cursores_contados[base] = CursorContado
+    return _cursores_contados[base]
+
+
+class ConexionContada(psycopg2.extensions.connection):
+    # statement_timeout vigente en la sesión (lo fija el pool, ver aplicar_plazo)
+    statement_timeout = None
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = cursor_contado(base)
+        return super().cursor(*args, **kwargs)
+
+
+# ===============================
+# LOGS DE APLICACIÓN — JSON, escritos fuera del hilo de la petición
+# ===============================
+# Una línea JSON por evento, con request_id, endpoint, latencia_ms y db_ms (tiempo dentro de
+# execute() en lo que va de la petición). El hilo que registra solo arma la línea y la encola;
+# un QueueListener la escribe en stdout. Los eventos INFO de alto volumen (cada petición, cada
+# registro) pasan con probabilidad LOG_MUESTREO y llevan "muestreo" para reponderarlos; los
+# WARNING/ERROR, las peticiones lentas y los 5xx se escriben siempre. Con la cola llena (colector
+# lento) los INFO se descartan y los errores esperan hasta LOG_ESPERA_ERROR_SEG.
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO")
+LOG_MUESTREO = float(os.getenv("LOG_MUESTREO", "0.1"))
+LOG_LENTO_MS = int(os.getenv("LOG_LENTO_MS", "1000"))
+LOG_COLA_MAX = 10000
+LOG_ESPERA_ERROR_SEG = 1.0
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_logs = {"descartados": 0}
+
+
+class ContextoLog(logging.Filter):
+    # Corre en el hilo que registra: aplica el muestreo y toma el contexto de la petición
+    def filter(self, record):
+        muestreo = getattr(record, "muestreo", None)
+        if muestreo is not None and record.levelno < logging.WARNING and random.random() >= muestreo:
+            return False
+        record.request_id = record.endpoint = record.latencia_ms = record.db_ms = None
+        if has_request_context():
+            record.request_id = getattr(_conteo, "request_id", None)
+            record.endpoint = request.endpoint
+            inicio = getattr(_conteo, "inicio", None)
+            if inicio is not None:
+                record.latencia_ms = round((time.perf_counter() - inicio) * 1000, 1)
+            record.db_ms = round(getattr(_conteo, "db_seg", 0.0) * 1000, 1)
+        return True
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        linea = {
+            "ts": datetime.fromtimestamp(record.created, TIMEZONE).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "nivel": record.levelname,
+            "evento": getattr(record, "evento", None) or record.name,
+            "mensaje": record.getMessage(),
+            "request_id": record.request_id,
+            "endpoint": record.endpoint,
+            "latencia_ms": record.latencia_ms,
+            "db_ms": record.db_ms,
+        }
+        if getattr(record, "muestreo", None) is not None:
+            linea["muestreo"] = record.muestreo
+        linea.update(getattr(record, "datos", None) or {})
+        if record.exc_info:
+            linea["traza"] = self.formatException(record.exc_info)
+        return json.dumps(linea, ensure_ascii=False, default=str)
+
+
+class ColaLogs(QueueHandler):
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=LOG_ESPERA_ERROR_SEG)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            _logs["descartados"] += 1
+
+
+log = logging.getLogger("cas")
+log.setLevel(LOG_NIVEL)
+log.propagate = False
+_cola_logs = queue.Queue(maxsize=LOG_COLA_MAX)
+_manejador_logs = ColaLogs(_cola_logs)
+_manejador_logs.addFilter(ContextoLog())
+_manejador_logs.setFormatter(FormatoJSON())
+log.addHandler(_manejador_logs)
+# Las excepciones no capturadas que registra Flask también salen como JSON, con su traza
+app.logger.removeHandler(default_handler)
+app.logger.addHandler(_manejador_logs)
+_escritor_logs = QueueListener(_cola_logs, logging.StreamHandler(sys.stdout))
+_escritor_logs.start()
+atexit.register(_escritor_logs.stop)
+
+
+def log_evento(nivel, evento, mensaje, muestreo=None, exc_info=False, **datos):
+    log.log(nivel, mensaje, exc_info=exc_info, extra={"evento": evento, "muestreo": muestreo, "datos": datos})
+
+
+@app.before_request
+def iniciar_peticion():
+    rid = request.headers.get("X-Request-Id", "")
+    _conteo.request_id = rid if REQUEST_ID_RE.match(rid) else secrets.token_hex(8)
+    _conteo.inicio = time.perf_counter()
+    _conteo.estado = None
+
+
+@app.after_request
+def marcar_request_id(resp):
+    resp.headers["X-Request-Id"] = _conteo.request_id
+    _conteo.estado = resp.status_code
+    return resp
+
+
+@app.teardown_request
+def registrar_peticion(exc):
+    # Registrado antes que terminar_conteo, corre después (Flask invierte el orden).
+    # Los contextos armados a mano (test_request_context) no pasan por before_request: se ignoran
+    inicio, _conteo.inicio = getattr(_conteo, "inicio", None), None
+    if inicio is None:
+        return
+    estado = 500 if exc is not None else _conteo.estado
+    latencia_ms = (time.perf_counter() - inicio) * 1000
+    if exc is not None or (estado or 0) >= 500:
+        nivel, muestreo = logging.ERROR, None
+    elif latencia_ms >= LOG_LENTO_MS:
+        nivel, muestreo = logging.WARNING, None
+    else:
+        nivel, muestreo = logging.INFO, LOG_MUESTREO
+    datos = {"error": repr(exc)} if exc is not None else {}
+    log_evento(nivel, "peticion", f"{request.method} {request.path} {estado}", muestreo=muestreo, **datos,
+               metodo=request.method, ruta=request.path, estado=estado, latencia_ms=round(latencia_ms, 1),
+               consultas=getattr(_conteo, "consultas", None), conexiones=getattr(_conteo, "conexiones", None))
+
+
+log_evento(logging.INFO, "inicio", "Usando PostgreSQL (Azure)")
 
 # ===============================
 # CONNECTION POOL
 # ===============================
-db_pool = pool.ThreadedConnectionPool(
+# Límite por sentencia de cada conexión del pool, fijado al conectar (options); los
+# endpoints con otro plazo y el código sin plazo (sin límite) lo cambian solo cuando la
+# conexión trae uno distinto
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "5000"))
+
+
+class PoolAcotado(pool.ThreadedConnectionPool):
+    # Los cupos son un BoundedSemaphore del tamaño del pool: quien espera duerme en
+    # acquire en vez de reintentar getconn, y en_uso cuenta las conexiones prestadas
+    # para las decisiones de carga (pool_saturado, intervalo_poll)
+    def __init__(self, minconn, maxconn, *args, options="", **kwargs):
+        options = f"{options} -c statement_timeout={STATEMENT_TIMEOUT_MS}".strip()
+        super().__init__(minconn, maxconn, *args, options=options, **kwargs)
+        self.cupos = threading.BoundedSemaphore(maxconn)
+        self.en_uso = 0
+        self._uso_lock = threading.Lock()
+
+    def tomar(self, espera=0):
+        # None si no se libera un cupo dentro de la espera
+        if espera > 0:
+            tomado = self.cupos.acquire(timeout=espera)
+        else:
+            tomado = self.cupos.acquire(blocking=False)
+        if not tomado:
+            return None
+        try:
+            conn = self.getconn()
+        except Exception:
+            self.cupos.release()
+            raise
+        with self._uso_lock:
+            self.en_uso += 1
+        if conn.statement_timeout is None:
+            conn.statement_timeout = STATEMENT_TIMEOUT_MS
+        return conn
+
+    def devolver(self, conn, cerrar=False):
+        try:
+            self.putconn(conn, close=cerrar)
+        finally:
+            with self._uso_lock:
+                self.en_uso -= 1
+            self.cupos.release()
+
+
+db_pool = PoolAcotado(
     minconn=2,
     maxconn=10,
     dsn=DATABASE_URL,
-    cursor_factory=RealDictCursor
+    cursor_factory=RealDictCursor,
+    connection_factory=ConexionContada
 )
 
 def get_conn():
-    return db_pool.getconn()
+    conn = db_pool.tomar(POOL_ESPERA_SEG)
+    if conn is None:
+        raise ServidorOcupado("Pool de conexiones agotado")
+    return conn
 
 def release_conn(conn):
-    db_pool.putconn(conn)
+    db_pool.devolver(conn)
 
 class PooledConn:
     def __init__(self):
         self.conn = None
+        self.pool = db_pool
     def __enter__(self):
-        self.conn = get_conn()
+        if getattr(_ruta_lectura, "replica", False):
+            try:
+                self.conn = tomar_conexion(db_pool_lectura, REPLICA_ESPERA_SEG)
+                self.pool = db_pool_lectura
+            except ServidorOcupado:
+                # Réplica saturada, no caída: esta conexión sale del primario
+                pass
+            except psycopg2.OperationalError as e:
+                marcar_replica_caida(e)
+                _ruta_lectura.replica = False
+        if self.conn is None:
+            try:
+                self.conn = tomar_conexion(db_pool)
+            except ServidorOcupado:
+                # Como con QueryCanceled: el 503 de con_plazo manda aunque el endpoint capture la excepción
+                _limites.excedido = True
+                raise
+        contar(conexiones=1)
+        aplicar_plazo(self)
         return self.conn
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type:
+            if issubclass(exc_type, psycopg2.errors.QueryCanceled):
+                _limites.excedido = True
             try:
                 self.conn.rollback()
             except Exception:
                 pass
-        release_conn(self.conn)
+        self.pool.devolver(self.conn)
+
+
+# ===============================
+# FILAS — representaciones livianas
+# ===============================
+# El pool entrega RealDictCursor: cada fila es un dict con sus propias claves. Donde se leen
+# muchas filas (exportaciones, archivo, polling, agregados) el endpoint elige otra forma
+# con conn.cursor(cursor_factory=...):
+#   CURSOR_TUPLAS     -> tuplas (lo más barato; acceso por posición)
+#   NamedTupleCursor  -> namedtuple armada desde las columnas de la consulta
+#   cursor_de(Fila..) -> una clase de fila fija; el SELECT debe traer sus _fields en orden
+# Las clases de fila son tuplas con __slots__ = (): sin __dict__ por instancia.
+CURSOR_TUPLAS = psycopg2.extensions.cursor
+
+
+class FilaPostulante(namedtuple("FilaPostulante", (
+    "id", "area", "convocatoria", "apellidos", "nombres", "tipo_documento",
+    "numero_documento", "fecha_nacimiento", "sexo", "celular", "correo",
+    "fuerzas_armadas", "tiene_discapacidad", "tipo_discapacidad", "created_at",
+    "usuario_atendio", "fecha_atencion",
+))):
+    __slots__ = ()
+
+
+class FilaLog(namedtuple("FilaLog", ("id", "fecha", "usuario", "accion"))):
+    __slots__ = ()
+
+
+_cursores_fila = {}
+
+
+def cursor_de(clase):
+    if clase not in _cursores_fila:
+        class CursorFila(CURSOR_TUPLAS):
+            def execute(self, query, vars=None):
+                resultado = super().execute(query, vars)
+                if self.description is not None:
+                    nombres = tuple(d.name for d in self.description)
+                    if nombres != clase._fields:
+                        raise psycopg2.ProgrammingError(
+                            f"Las columnas {nombres} no corresponden a {clase.__name__}")
+                return resultado
+
+            def fetchone(self):
+                fila = super().fetchone()
+                return None if fila is None else clase._make(fila)
+
+            def fetchmany(self, size=None):
+                return list(map(clase._make, super().fetchmany(self.arraysize if size is None else size)))
+
+            def fetchall(self):
+                return list(map(clase._make, super().fetchall()))
+
+            def __iter__(self):
+                return map(clase._make, super().__iter__())
+
+        CursorFila.__name__ = f"Cursor{clase.__name__}"
+        _cursores_fila[clase] = CursorFila
+    return _cursores_fila[clase]
+
+
+# ===============================
+# RÉPLICA DE LECTURA
+# ===============================
+# Con DATABASE_URL_LECTURA, los endpoints marcados con @solo_lectura (polling, estadísticas,
+# logs, exportaciones) usan un pool propio contra la réplica. Todo el request va al mismo
+# servidor, así el ETag y los datos salen de la misma fuente. Se vuelve al primario si la
+# réplica atrasa más de REPLICA_LAG_MAX_SEG, si no responde, o si la sesión escribió hace
+# poco (lee sus propias escrituras).
+DATABASE_URL_LECTURA = os.environ.get("DATABASE_URL_LECTURA")
+REPLICA_LAG_MAX_SEG = float(os.getenv("REPLICA_LAG_MAX_SEG", "5"))
+REPLICA_CHEQUEO_SEG = 2.0
+REPLICA_PAUSA_ERROR_SEG = 30.0
+# Espera por un cupo de la réplica antes de leer del primario
+REPLICA_ESPERA_SEG = 0.2
+# Endpoints POST que no cuentan como escritura para leer-lo-propio (el latido es constante)
+ESCRITURAS_SIN_MARCA = {"heartbeat"}
+
+db_pool_lectura = None
+if DATABASE_URL_LECTURA:
+    # minconn=0: si la réplica no está, la app arranca igual y lee del primario
+    db_pool_lectura = PoolAcotado(
+        minconn=0,
+        maxconn=10,
+        dsn=DATABASE_URL_LECTURA,
+        cursor_factory=RealDictCursor,
+        connection_factory=ConexionContada,
+        options="-c default_transaction_read_only=on"
+    )
+
+_ruta_lectura = threading.local()
+_replica = {"lag": None, "ts": 0.0, "caida_hasta": 0.0}
+_replica_lock = threading.Lock()
+
+# Sin recuperación en curso (instancia independiente) el atraso es 0; sin receptor de WAL
+# activo la réplica no avanza y se considera atrasada
+LAG_REPLICA_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END AS lag
+"""
+
+
+def marcar_replica_caida(e):
+    log_evento(logging.WARNING, "replica_caida", f"Réplica de lectura no disponible, se usa el primario: {e}")
+    with _replica_lock:
+        _replica.update(lag=None, caida_hasta=time.time() + REPLICA_PAUSA_ERROR_SEG)
+
+
+def lag_replica():
+    ahora = time.time()
+    with _replica_lock:
+        if ahora < _replica["caida_hasta"]:
+            return None
+        if ahora - _replica["ts"] < REPLICA_CHEQUEO_SEG:
+            return _replica["lag"]
+        # Un solo hilo mide; el resto sigue con el último valor
+        _replica["ts"] = ahora
+    try:
+        conn = tomar_conexion(db_pool_lectura, REPLICA_ESPERA_SEG)
+        try:
+            with sin_conteo(), conn.cursor() as cur:
+                cur.execute(LAG_REPLICA_SQL)
+                lag = cur.fetchone()["lag"]
+            conn.rollback()
+        finally:
+            db_pool_lectura.devolver(conn)
+    except ServidorOcupado:
+        # Sin cupo en la réplica no hay medición nueva, pero tampoco caída
+        with _replica_lock:
+            return _replica["lag"]
+    except psycopg2.Error as e:
+        marcar_replica_caida(e)
+        return None
+    lag = None if lag is None else float(lag)
+    with _replica_lock:
+        _replica["lag"] = lag
+    return lag
+
+
+def replica_disponible():
+    if db_pool_lectura is None:
+        return False
+    lag = lag_replica()
+    return lag is not None and lag <= REPLICA_LAG_MAX_SEG
+
+
+def usar_replica():
+    # La última medición puede tener REPLICA_CHEQUEO_SEG de antigüedad
+    if time.time() - session.get("escritura_ts", 0) < REPLICA_LAG_MAX_SEG + REPLICA_CHEQUEO_SEG:
+        return False
+    return replica_disponible()
+
+
+@contextmanager
+def leer_de_replica(activa=True):
+    previo = getattr(_ruta_lectura, "replica", False)
+    _ruta_lectura.replica = activa
+    try:
+        yield
+    finally:
+        _ruta_lectura.replica = previo
+
+
+def solo_lectura(vista):
+    @wraps(vista)
+    def envuelta(*args, **kwargs):
+        with leer_de_replica(usar_replica()):
+            return vista(*args, **kwargs)
+    envuelta.solo_lectura = True
+    return envuelta
+
+# ===============================
+# CARGA — prioridades, plazos e intervalo de polling
+# ===============================
+# @con_plazo fija un plazo por petición: no se toma conexión con el plazo vencido y cada
+# sentencia queda limitada a plazo_ms (statement_timeout). Las peticiones descartables (polling, estadísticas,
+# presencia) responden 503 + Retry-After cuando en el pool solo quedan las
+# CONEXIONES_RESERVADAS, que quedan para /api/submit, la recepción y demás escrituras;
+# esas esperan hasta POOL_ESPERA_SEG por una conexión libre en vez de fallar en seco.
+# Las respuestas de polling llevan X-Poll-Interval-Ms para que los paneles se espacien.
+CONEXIONES_RESERVADAS = int(os.getenv("CONEXIONES_RESERVADAS", "3"))
+POOL_ESPERA_SEG = 2.0
+OCUPADO_REINTENTO_SEG = 5
+POLL_FACTOR_MAX = 4
+POLL_RECHAZO_VENTANA_SEG = 10
+_limites = threading.local()
+_carga = {"ultimo_rechazo": 0.0}
+
+
+class ServidorOcupado(pool.PoolError):
+    pass
+
+
+class PlazoVencido(ServidorOcupado):
+    pass
+
+
+def pool_en_uso(p):
+    return p.en_uso / p.maxconn
+
+
+def pool_saturado(p):
+    return p.en_uso >= p.maxconn - CONEXIONES_RESERVADAS
+
+
+def pool_de_la_peticion():
+    # Con la réplica sin cupos la lectura sale del primario (ver PooledConn)
+    if getattr(_ruta_lectura, "replica", False) and db_pool_lectura.en_uso < db_pool_lectura.maxconn:
+        return db_pool_lectura
+    return db_pool
+
+
+def tomar_conexion(p, espera_max=POOL_ESPERA_SEG):
+    # Las descartables no esperan; el resto, hasta espera_max sin pasar el plazo
+    espera = 0
+    if not getattr(_limites, "descartable", False):
+        espera = espera_max
+        plazo = getattr(_limites, "plazo", None)
+        if plazo is not None:
+            espera = min(espera, plazo - time.monotonic())
+    conn = p.tomar(espera)
+    if conn is None:
+        raise ServidorOcupado("Pool de conexiones agotado")
+    return conn
+
+
+def aplicar_plazo(pooled):
+    plazo = getattr(_limites, "plazo", None)
+    if plazo is None:
+        # Fuera de @con_plazo (tareas periódicas, comandos) las sentencias no tienen límite
+        timeout_ms = 0
+    elif plazo <= time.monotonic():
+        pooled.pool.devolver(pooled.conn)
+        raise PlazoVencido("Plazo de la petición vencido")
+    else:
+        timeout_ms = _limites.timeout_ms
+    conn = pooled.conn
+    if conn.statement_timeout == timeout_ms:
+        return
+    # SET de sesión en autocommit: sobrevive al rollback de la petición y la conexión lo
+    # conserva hasta que otro endpoint pida un límite distinto. No cuenta como consulta del
+    # endpoint porque depende de quién usó la conexión antes
+    try:
+        conn.autocommit = True
+        with sin_conteo(), conn.cursor() as cur:
+            cur.execute("SET statement_timeout = %s", (timeout_ms,))
+        conn.autocommit = False
+    except Exception:
+        # Estado de sesión incierto (autocommit, timeout): la conexión no vuelve al pool
+        pooled.pool.devolver(conn, cerrar=True)
+        raise
+    conn.statement_timeout = timeout_ms
+
+
+def intervalo_poll(base_ms):
+    # 1x con el pool a la mitad o menos, hasta POLL_FACTOR_MAX lleno o tras un rechazo reciente
+    if time.time() - _carga["ultimo_rechazo"] < POLL_RECHAZO_VENTANA_SEG:
+        factor = POLL_FACTOR_MAX
+    else:
+        factor = 1 + max(0.0, pool_en_uso(pool_de_la_peticion()) - 0.5) * 2 * (POLL_FACTOR_MAX - 1)
+    return int(base_ms * factor)
+
+
+def respuesta_ocupado():
+    _carga["ultimo_rechazo"] = time.time()
+    resp = jsonify({"ok": False, "error": "Servidor ocupado, intenta nuevamente en unos segundos"})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(OCUPADO_REINTENTO_SEG)
+    return resp
+
+
+def con_plazo(plazo_ms, descartable=False, poll_ms=None):
+    def decorador(vista):
+        @wraps(vista)
+        def envuelta(*args, **kwargs):
+            if descartable and pool_saturado(pool_de_la_peticion()):
+                return respuesta_ocupado()
+            _limites.plazo = time.monotonic() + plazo_ms / 1000
+            _limites.timeout_ms = plazo_ms
+            _limites.descartable = descartable
+            _limites.excedido = False
+            try:
+                resp = vista(*args, **kwargs)
+            except (ServidorOcupado, psycopg2.errors.QueryCanceled):
+                _limites.excedido = True
+            finally:
+                _limites.plazo = None
+                _limites.descartable = False
+            # Los endpoints que capturan Exception devuelven 500; el plazo vencido manda
+            if _limites.excedido:
+                return respuesta_ocupado()
+            resp = app.make_response(resp)
+            if poll_ms:
+                resp.headers["X-Poll-Interval-Ms"] = str(intervalo_poll(poll_ms))
+            return resp
+        return envuelta
+    return decorador
+
 
 # ===============================
 # RATE LIMITING — LOGIN
@@ -120,6 +706,17 @@ def now_peru():
     return datetime.now(TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
 
 
+def fecha_valida(texto):
+    # El regex fija el formato YYYY-MM-DD; fromisoformat descarta días imposibles (2000-13-45)
+    if not FECHA_RE.match(texto):
+        return False
+    try:
+        date.fromisoformat(texto)
+    except ValueError:
+        return False
+    return True
+
+
 def registrar_log(usuario, accion):
     try:
         with PooledConn() as conn:
@@ -130,7 +727,16 @@ def registrar_log(usuario, accion):
                 """, (now_peru(), usuario, accion))
             conn.commit()
     except Exception as e:
-        print(f"Error al registrar log: {e}")
+        log_evento(logging.ERROR, "log_fallido", f"Error al registrar log: {e}", exc_info=True, usuario=usuario)
+
+
+RECURSOS_VERSIONADOS = ("postulantes", "usuarios", "configuracion", "sesiones_activas", "campanas")
+COLUMNAS_POSTULANTES = (
+    "id", "created_at", "convocatoria", "apellidos", "nombres", "tipo_documento",
+    "numero_documento", "fecha_nacimiento", "sexo", "celular", "correo", "validado",
+    "fuerzas_armadas", "tiene_discapacidad", "tipo_discapacidad", "area",
+    "usuario_atendio", "fecha_atencion", "reservado_por", "reservado_hasta", "recibo",
+)
 
 
 def ensure_column(conn, table, column, ddl):
@@ -146,26 +752,140 @@ def ensure_column(conn, table, column, ddl):
             conn.commit()
 
 
+def ensure_trigger(conn, table, name, ddl):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = %s AND tgrelid = %s::regclass
+        """, (name, table))
+        if not cur.fetchone():
+            cur.execute(ddl)
+            conn.commit()
+            return True
+    return False
+
+
+# ===============================
+# CAMPAÑAS — postulantes particionado por campana_id
+# ===============================
+def crear_tabla_postulantes(cur):
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS postulantes_id_seq")
+    cur.execute("""
+    CREATE TABLE postulantes (
+      id INTEGER NOT NULL DEFAULT nextval('postulantes_id_seq'),
+      created_at TEXT NOT NULL,
+      convocatoria TEXT NOT NULL,
+      apellidos TEXT NOT NULL,
+      nombres TEXT NOT NULL,
+      tipo_documento TEXT NOT NULL,
+      numero_documento TEXT NOT NULL,
+      fecha_nacimiento TEXT NOT NULL,
+      sexo TEXT NOT NULL,
+      celular TEXT NOT NULL,
+      correo TEXT NOT NULL,
+      validado INTEGER NOT NULL DEFAULT 0,
+      fuerzas_armadas TEXT,
+      tiene_discapacidad TEXT,
+      tipo_discapacidad TEXT,
+      area TEXT,
+      usuario_atendio TEXT,
+      fecha_atencion TEXT,
+      reservado_por TEXT,
+      reservado_hasta TEXT,
+      recibo TEXT,
+      campana_id INTEGER NOT NULL,
+      PRIMARY KEY (id, campana_id)
+    ) PARTITION BY LIST (campana_id);
+    """)
+    cur.execute("ALTER SEQUENCE postulantes_id_seq OWNED BY postulantes.id")
+
+
+def nombre_particion(campana_id):
+    return f"postulantes_c{int(campana_id)}"
+
+
+def crear_particion(cur, campana_id):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {nombre_particion(campana_id)}
+        PARTITION OF postulantes FOR VALUES IN ({int(campana_id)})
+    """)
+
+
+def campana_inicial(cur):
+    cur.execute("SELECT id FROM campanas ORDER BY id LIMIT 1")
+    row = cur.fetchone()
+    if row:
+        return row["id"]
+    # Hereda el antiguo interruptor global convocatoria_activa si existía
+    abierta = 1
+    cur.execute("SELECT to_regclass('configuracion') AS tabla")
+    if cur.fetchone()["tabla"] is not None:
+        cur.execute("SELECT valor FROM configuracion WHERE clave = 'convocatoria_activa'")
+        row = cur.fetchone()
+        abierta = 0 if row and row["valor"] == "false" else 1
+    cur.execute("""
+        INSERT INTO campanas (nombre, abierta, vigente, created_at)
+        VALUES ('CAS 2026', %s, 1, %s)
+        ON CONFLICT (nombre) DO UPDATE SET nombre = EXCLUDED.nombre
+        RETURNING id
+    """, (abierta, now_peru()))
+    return cur.fetchone()["id"]
+
+
+def migrar_postulantes_a_particiones(conn):
+    # Tabla heredada sin particiones: se copia a la tabla particionada dentro de una sola transacción
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('migrar_postulantes'))")
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = 'postulantes'::regclass")
+        if cur.fetchone()["relkind"] == "p":
+            conn.commit()
+            return
+
+        cur.execute("LOCK TABLE postulantes IN ACCESS EXCLUSIVE MODE")
+        campana_id = campana_inicial(cur)
+        cur.execute("ALTER TABLE postulantes RENAME TO postulantes_legado")
+        cur.execute("ALTER TABLE postulantes_legado RENAME CONSTRAINT postulantes_pkey TO postulantes_legado_pkey")
+        crear_tabla_postulantes(cur)
+        crear_particion(cur, campana_id)
+        columnas = ", ".join(COLUMNAS_POSTULANTES)
+        cur.execute(f"""
+            INSERT INTO postulantes ({columnas}, campana_id)
+            SELECT {columnas}, %s FROM postulantes_legado
+        """, (campana_id,))
+        cur.execute("DROP TABLE postulantes_legado")
+    conn.commit()
+
+
+def campana_abierta(cur):
+    cur.execute("""
+        SELECT id, nombre FROM campanas
+        WHERE abierta = 1 AND vigente = 1
+        ORDER BY id DESC LIMIT 1
+    """)
+    return cur.fetchone()
+
+
 def init_db():
     with PooledConn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
-            CREATE TABLE IF NOT EXISTS postulantes (
+            CREATE TABLE IF NOT EXISTS campanas (
               id SERIAL PRIMARY KEY,
+              nombre TEXT UNIQUE NOT NULL,
+              abierta INTEGER NOT NULL DEFAULT 0,
+              vigente INTEGER NOT NULL DEFAULT 1,
               created_at TEXT NOT NULL,
-              convocatoria TEXT NOT NULL,
-              apellidos TEXT NOT NULL,
-              nombres TEXT NOT NULL,
-              tipo_documento TEXT NOT NULL,
-              numero_documento TEXT NOT NULL,
-              fecha_nacimiento TEXT NOT NULL,
-              sexo TEXT NOT NULL,
-              celular TEXT NOT NULL,
-              correo TEXT NOT NULL
+              cerrada_at TEXT
             );
             """)
+            cur.execute("SELECT to_regclass('postulantes') AS tabla")
+            if cur.fetchone()["tabla"] is None:
+                crear_tabla_postulantes(cur)
             conn.commit()
 
+        ensure_column(conn, "campanas", "archivada",
+            "ALTER TABLE campanas ADD COLUMN archivada INTEGER NOT NULL DEFAULT 0")
+
         ensure_column(conn, "postulantes", "validado",
             "ALTER TABLE postulantes ADD COLUMN validado INTEGER NOT NULL DEFAULT 0")
         ensure_column(conn, "postulantes", "fuerzas_armadas",
@@ -180,6 +900,20 @@ def init_db():
             "ALTER TABLE postulantes ADD COLUMN usuario_atendio TEXT")
         ensure_column(conn, "postulantes", "fecha_atencion",
             "ALTER TABLE postulantes ADD COLUMN fecha_atencion TEXT")
+        ensure_column(conn, "postulantes", "reservado_por",
+            "ALTER TABLE postulantes ADD COLUMN reservado_por TEXT")
+        ensure_column(conn, "postulantes", "reservado_hasta",
+            "ALTER TABLE postulantes ADD COLUMN reservado_hasta TEXT")
+        ensure_column(conn, "postulantes", "recibo",
+            "ALTER TABLE postulantes ADD COLUMN recibo TEXT")
+
+        migrar_postulantes_a_particiones(conn)
+        with conn.cursor() as cur:
+            campana_inicial(cur)
+            cur.execute("SELECT id FROM campanas WHERE vigente = 1")
+            for row in cur.fetchall():
+                crear_particion(cur, row["id"])
+            conn.commit()
 
         with conn.cursor() as cur:
             cur.execute("""
@@ -197,10 +931,13 @@ def init_db():
               id SERIAL PRIMARY KEY,
               fecha TEXT NOT NULL,
               usuario TEXT NOT NULL,
-              accion TEXT NOT NULL
+              accion TEXT NOT NULL,
+              campana_id INTEGER
             );
             """)
             conn.commit()
+            # Campaña del postulante al que se refiere la acción (NULL en acciones generales)
+            ensure_column(conn, "logs", "campana_id", "ALTER TABLE logs ADD COLUMN campana_id INTEGER")
 
             cur.execute("SELECT id FROM usuarios WHERE username='admin'")
             if not cur.fetchone():
@@ -216,11 +953,6 @@ def init_db():
                   valor TEXT NOT NULL
                 );
             """)
-            cur.execute("""
-                INSERT INTO configuracion (clave, valor)
-                VALUES ('convocatoria_activa', 'true')
-                ON CONFLICT (clave) DO NOTHING;
-            """)
 
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS sesiones_activas (
@@ -228,15 +960,259 @@ def init_db():
                   ultimo_latido TEXT NOT NULL
                 );
             """)
+
+            # Contador de cambios por tabla, sirve como ETag barato: versión plegada + cambios sueltos.
+            # El trigger no suma sobre la fila del recurso (cada escritura esperaría a las demás sobre
+            # ella hasta su commit): agrega una fila en versiones_cambios y la tarea "versiones" las
+            # pliega. La suma solo crece y cada lector la ve junto con los datos ya confirmados.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS versiones (
+                  recurso TEXT PRIMARY KEY,
+                  version BIGINT NOT NULL DEFAULT 0
+                );
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS versiones_cambios (
+                  recurso TEXT NOT NULL
+                );
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_versiones_cambios ON versiones_cambios(recurso)")
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION incrementar_version() RETURNS trigger AS $$
+                BEGIN
+                  INSERT INTO versiones_cambios (recurso) VALUES (TG_ARGV[0]);
+                  RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            conn.commit()
+
+        for tabla in RECURSOS_VERSIONADOS:
+            ensure_trigger(conn, tabla, f"trg_version_{tabla}", f"""
+                CREATE TRIGGER trg_version_{tabla}
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabla}
+                FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version('{tabla}')
+            """)
+
+        # Series por hora: registros por área y recepciones por área y usuario.
+        # 'hora' es el prefijo 'YYYY-MM-DD HH' de los TEXT de fecha. El trigger no suma sobre la fila
+        # de la hora (en una ráfaga todas las altas de un área se esperarían entre sí sobre esa fila
+        # hasta su commit): agrega una fila suelta en estadisticas_delta y la tarea "estadisticas_delta"
+        # las consolida. Quien lee suma ambas tablas. Cada fila lleva su campana_id: la reconciliación
+        # solo rehace las campañas vigentes y las finalizadas (fuera de postulantes) quedan congeladas.
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS estadisticas_hora (
+                  hora TEXT NOT NULL,
+                  evento TEXT NOT NULL,
+                  area TEXT NOT NULL DEFAULT '',
+                  usuario TEXT NOT NULL DEFAULT '',
+                  campana_id INTEGER NOT NULL,
+                  total INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (hora, evento, area, usuario, campana_id)
+                );
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS estadisticas_delta (
+                  hora TEXT NOT NULL,
+                  evento TEXT NOT NULL,
+                  area TEXT NOT NULL DEFAULT '',
+                  usuario TEXT NOT NULL DEFAULT '',
+                  campana_id INTEGER NOT NULL
+                );
+            """)
+            conn.commit()
+        migrar_estadisticas_por_campana(conn)
+
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION acumular_estadisticas_hora() RETURNS trigger AS $$
+                BEGIN
+                  IF TG_OP = 'INSERT' THEN
+                    INSERT INTO estadisticas_delta (hora, evento, area, usuario, campana_id)
+                    VALUES (left(NEW.created_at, 13), 'registro', COALESCE(NEW.area, ''), '', NEW.campana_id);
+                  END IF;
+                  IF NEW.usuario_atendio IS NOT NULL AND NEW.fecha_atencion IS NOT NULL
+                     AND (TG_OP = 'INSERT' OR OLD.usuario_atendio IS NULL) THEN
+                    INSERT INTO estadisticas_delta (hora, evento, area, usuario, campana_id)
+                    VALUES (left(NEW.fecha_atencion, 13), 'recepcion', COALESCE(NEW.area, ''), NEW.usuario_atendio,
+                            NEW.campana_id);
+                  END IF;
+                  RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            conn.commit()
+
+        creado = ensure_trigger(conn, "postulantes", "trg_estadisticas_hora", """
+            CREATE TRIGGER trg_estadisticas_hora
+            AFTER INSERT OR UPDATE OF usuario_atendio ON postulantes
+            FOR EACH ROW EXECUTE FUNCTION acumular_estadisticas_hora()
+        """)
+        if creado:
+            rellenar_estadisticas_hora(conn, completo=True)
+
+        # Avisos de altas/bajas de documentos para el índice en memoria de cada worker
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION notificar_documento() RETURNS trigger AS $$
+                BEGIN
+                  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    PERFORM pg_notify('postulantes_doc', json_build_object(
+                      'op', '-', 'c', OLD.campana_id, 't', OLD.tipo_documento, 'n', OLD.numero_documento)::text);
+                  END IF;
+                  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM pg_notify('postulantes_doc', json_build_object(
+                      'op', '+', 'c', NEW.campana_id, 't', NEW.tipo_documento, 'n', NEW.numero_documento,
+                      'conv', NEW.convocatoria, 'area', NEW.area)::text);
+                  END IF;
+                  RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
             conn.commit()
 
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION notificar_campanas() RETURNS trigger AS $$
+                BEGIN
+                  PERFORM pg_notify('postulantes_doc', '{"op": "campanas"}');
+                  RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            conn.commit()
+
+        ensure_trigger(conn, "campanas", "trg_notificar_campanas", """
+            CREATE TRIGGER trg_notificar_campanas
+            AFTER INSERT OR UPDATE OR DELETE ON campanas
+            FOR EACH STATEMENT EXECUTE FUNCTION notificar_campanas()
+        """)
+
+        ensure_trigger(conn, "postulantes", "trg_notificar_documento", """
+            CREATE TRIGGER trg_notificar_documento
+            AFTER INSERT OR DELETE OR UPDATE OF tipo_documento, numero_documento, convocatoria, area
+            ON postulantes
+            FOR EACH ROW EXECUTE FUNCTION notificar_documento()
+        """)
+
+
+def migrar_estadisticas_por_campana(conn):
+    # Las series anteriores no tenían campana_id: sus filas sumaban todas las campañas. Se
+    # recalculan las vigentes por campaña y lo que sobra de cada fila vieja (campañas ya
+    # separadas de postulantes) queda congelado con campana_id = 0.
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'estadisticas_hora' AND column_name = 'campana_id'
+        """)
+        if cur.fetchone():
+            return
+        cur.execute("LOCK TABLE postulantes IN SHARE MODE")
+        cur.execute("ALTER TABLE estadisticas_delta ADD COLUMN campana_id INTEGER NOT NULL DEFAULT 0")
+        cur.execute("ALTER TABLE estadisticas_hora ADD COLUMN campana_id INTEGER NOT NULL DEFAULT 0")
+        cur.execute("ALTER TABLE estadisticas_hora DROP CONSTRAINT estadisticas_hora_pkey")
+        cur.execute("ALTER TABLE estadisticas_hora ADD PRIMARY KEY (hora, evento, area, usuario, campana_id)")
+        cur.execute("""
+            WITH movidas AS (
+              DELETE FROM estadisticas_delta RETURNING hora, evento, area, usuario
+            )
+            INSERT INTO estadisticas_hora (hora, evento, area, usuario, total)
+            SELECT hora, evento, area, usuario, COUNT(*) FROM movidas
+            GROUP BY hora, evento, area, usuario
+            ON CONFLICT (hora, evento, area, usuario, campana_id)
+            DO UPDATE SET total = estadisticas_hora.total + EXCLUDED.total
+        """)
+        cur.execute(f"""
+            INSERT INTO estadisticas_hora (hora, evento, area, usuario, campana_id, total)
+            {ESTADISTICAS_RECALCULO_SQL}
+        """, {"corte": "9999", "campanas": campanas_vigentes(cur)})
+        cur.execute("""
+            UPDATE estadisticas_hora h
+            SET total = h.total - v.total
+            FROM (SELECT hora, evento, area, usuario, SUM(total) AS total
+                  FROM estadisticas_hora WHERE campana_id <> 0
+                  GROUP BY hora, evento, area, usuario) v
+            WHERE h.campana_id = 0
+              AND (h.hora, h.evento, h.area, h.usuario) = (v.hora, v.evento, v.area, v.usuario)
+        """)
+        cur.execute("DELETE FROM estadisticas_hora WHERE campana_id = 0 AND total <= 0")
+        cur.execute("ALTER TABLE estadisticas_delta ALTER COLUMN campana_id DROP DEFAULT")
+        cur.execute("ALTER TABLE estadisticas_hora ALTER COLUMN campana_id DROP DEFAULT")
+    conn.commit()
+
+
+ESTADISTICAS_RECALCULO_SQL = """
+    SELECT left(created_at, 13), 'registro', COALESCE(area, ''), '', campana_id, COUNT(*)
+    FROM postulantes
+    WHERE left(created_at, 13) < %(corte)s AND campana_id = ANY(%(campanas)s)
+    GROUP BY 1, 3, 5
+    UNION ALL
+    SELECT left(fecha_atencion, 13), 'recepcion', COALESCE(area, ''), usuario_atendio, campana_id, COUNT(*)
+    FROM postulantes
+    WHERE usuario_atendio IS NOT NULL AND fecha_atencion IS NOT NULL
+      AND left(fecha_atencion, 13) < %(corte)s AND campana_id = ANY(%(campanas)s)
+    GROUP BY 1, 3, 4, 5
+"""
+
+
+def campanas_vigentes(cur):
+    # FOR SHARE: finalizar_campana (FOR UPDATE) espera a que termine la reconciliación, así una
+    # campaña no se separa de postulantes entre el DELETE y el recálculo de sus series
+    cur.execute("SELECT id FROM campanas WHERE vigente = 1 FOR SHARE")
+    return [r["id"] for r in cur.fetchall()]
+
+
+def rellenar_estadisticas_hora(conn, completo=False):
+    # Recalcula desde postulantes solo las horas ya cerradas, en una transacción normal: la hora
+    # en curso es del trigger. El margen cubre altas estampadas antes del cambio de hora que aún no
+    # hacían commit. completo=True (al crear el trigger) rehace todo bajo un bloqueo SHARE.
+    # Solo se tocan las campañas vigentes: las finalizadas ya no están en postulantes.
+    if completo:
+        corte = "9999"
+    else:
+        corte = (datetime.now(TIMEZONE) - timedelta(seconds=ESTADISTICAS_MARGEN_SEG)).strftime("%Y-%m-%d %H")
+    with conn.cursor() as cur:
+        if completo:
+            cur.execute("LOCK TABLE postulantes IN SHARE MODE")
+        params = {"corte": corte, "campanas": campanas_vigentes(cur)}
+        cur.execute("DELETE FROM estadisticas_delta WHERE hora < %(corte)s AND campana_id = ANY(%(campanas)s)",
+                    params)
+        cur.execute("DELETE FROM estadisticas_hora WHERE hora < %(corte)s AND campana_id = ANY(%(campanas)s)",
+                    params)
+        cur.execute(f"""
+            INSERT INTO estadisticas_hora (hora, evento, area, usuario, campana_id, total)
+            {ESTADISTICAS_RECALCULO_SQL}
+        """, params)
+        insertadas = cur.rowcount
+    conn.commit()
+    return insertadas
+
+
+def consolidar_estadisticas_hora(conn):
+    # Pasa las filas sueltas del trigger a sus totales por hora en una sola sentencia
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH movidas AS (
+              DELETE FROM estadisticas_delta RETURNING hora, evento, area, usuario, campana_id
+            )
+            INSERT INTO estadisticas_hora (hora, evento, area, usuario, campana_id, total)
+            SELECT hora, evento, area, usuario, campana_id, COUNT(*) FROM movidas
+            GROUP BY hora, evento, area, usuario, campana_id
+            ON CONFLICT (hora, evento, area, usuario, campana_id)
+            DO UPDATE SET total = estadisticas_hora.total + EXCLUDED.total
+        """)
+        consolidadas = cur.rowcount
+    conn.commit()
+    return consolidadas
+
 
 def crear_indices():
     with PooledConn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 CREATE UNIQUE INDEX IF NOT EXISTS idx_documento_unico
-                ON postulantes(numero_documento, tipo_documento)
+                ON postulantes(numero_documento, tipo_documento, campana_id)
             """)
             cur.execute("""
                 CREATE INDEX IF NOT EXISTS idx_usuario_atendio
@@ -258,6 +1234,21 @@ def crear_indices():
                 CREATE INDEX IF NOT EXISTS idx_usuario_sexo
                 ON postulantes(usuario_atendio, sexo)
             """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cola_pendientes
+                ON postulantes(area, id) WHERE usuario_atendio IS NULL
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_logs_campana
+                ON logs(campana_id) WHERE campana_id IS NOT NULL
+            """)
+            # Cubre /api/reportes/atencion (index-only) y los recibidos del snapshot del panel
+            cur.execute("DROP INDEX IF EXISTS idx_fecha_atencion")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_atencion_reporte
+                ON postulantes(fecha_atencion) INCLUDE (usuario_atendio, area, sexo, created_at)
+                WHERE usuario_atendio IS NOT NULL
+            """)
             conn.commit()
 
 
@@ -265,6 +1256,50 @@ init_db()
 crear_indices()
 
 
+# ===============================
+# ESTÁTICOS — nombres con hash (python build_assets.py)
+# ===============================
+DIST_DIR = os.path.join(BASE_DIR, "static", "dist")
+STATIC_INMUTABLE_SEG = 365 * 24 * 60 * 60
+
+
+def cargar_manifiesto():
+    try:
+        with open(os.path.join(DIST_DIR, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+_manifiesto_estaticos = cargar_manifiesto()
+
+
+# url_for('static', filename='admin.js') -> /static/dist/admin.<hash>.js si existe el build
+@app.url_defaults
+def estatico_con_hash(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        hashed = _manifiesto_estaticos.get(values["filename"])
+        if hashed:
+            values["filename"] = f"dist/{hashed}"
+
+
+@app.get("/static/dist/<path:nombre>")
+def estatico_dist(nombre):
+    tipo = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+    aceptadas = request.accept_encodings
+    resp = None
+    for codificacion, ext in (("br", ".br"), ("gzip", ".gz")):
+        if aceptadas[codificacion] and os.path.isfile(os.path.join(DIST_DIR, nombre + ext)):
+            resp = send_from_directory(DIST_DIR, nombre + ext, mimetype=tipo)
+            resp.headers["Content-Encoding"] = codificacion
+            break
+    if resp is None:
+        resp = send_from_directory(DIST_DIR, nombre, mimetype=tipo)
+    resp.headers["Cache-Control"] = f"public, max-age={STATIC_INMUTABLE_SEG}, immutable"
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
 # ===============================
 # WEB
 # ===============================
@@ -406,15 +1441,289 @@ def require_csrf():
     return None
 
 
+# ===============================
+# RESPUESTAS CONDICIONALES — ETag / 304 y compresión
+# ===============================
+COMPRESION_MIN_BYTES = 1024
+
+
+VERSION_SQL = """
+    SELECT (SELECT COALESCE(SUM(version), 0) FROM versiones WHERE recurso = ANY(%(recursos)s))
+         + (SELECT COUNT(*) FROM versiones_cambios WHERE recurso = ANY(%(recursos)s)) AS v
+"""
+VERSIONES_PLIEGUE_SEG = int(os.getenv("VERSIONES_PLIEGUE_SEG", "10"))
+
+
+def plegar_versiones(conn):
+    # Mueve los cambios sueltos a la versión del recurso en una sola sentencia: la suma no cambia
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH movidos AS (
+              DELETE FROM versiones_cambios RETURNING recurso
+            )
+            INSERT INTO versiones (recurso, version)
+            SELECT recurso, COUNT(*) FROM movidos GROUP BY recurso
+            ON CONFLICT (recurso) DO UPDATE SET version = versiones.version + EXCLUDED.version
+        """)
+        plegados = cur.rowcount
+    conn.commit()
+    return plegados
+
+
+def etag_recursos(*recursos, extra=""):
+    # Una sola lectura antes de la consulta principal; si falla, se responde sin ETag
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(VERSION_SQL, {"recursos": list(recursos)})
+                version = cur.fetchone()["v"]
+    except Exception:
+        return None
+    return f"{'+'.join(recursos)}-{version}{extra}"
+
+
+def no_modificado(etag):
+    if etag and request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        return con_etag(resp, etag)
+    return None
+
+
+def con_etag(resp, etag):
+    if etag:
+        resp.set_etag(etag, weak=True)
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@app.after_request
+def marcar_escritura(resp):
+    # Tras una mutación exitosa, la sesión lee del primario durante el margen de atraso
+    if (db_pool_lectura is not None and request.method != "GET" and resp.status_code < 400
+            and "usuario" in session and request.endpoint not in ESCRITURAS_SIN_MARCA
+            and not getattr(app.view_functions.get(request.endpoint), "solo_lectura", False)):
+        session["escritura_ts"] = time.time()
+    return resp
+
+
+@app.after_request
+def comprimir_json(resp):
+    if (resp.status_code != 200 or resp.mimetype != "application/json"
+            or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers):
+        return resp
+
+    cuerpo = resp.get_data()
+    if len(cuerpo) < COMPRESION_MIN_BYTES:
+        return resp
+
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas["br"]:
+        resp.set_data(brotli.compress(cuerpo, quality=5))
+        resp.headers["Content-Encoding"] = "br"
+    elif aceptadas["gzip"]:
+        resp.set_data(gzip.compress(cuerpo, compresslevel=6))
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        return resp
+
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
 # ===============================
 # API
 # ===============================
 @app.get("/api/health")
 def health():
-    return jsonify({"ok": True, "db": "postgresql"})
+    if db_pool_lectura is None:
+        return jsonify({"ok": True, "db": "postgresql", "logs_descartados": _logs["descartados"]})
+    return jsonify({"ok": True, "db": "postgresql", "logs_descartados": _logs["descartados"],
+                    "replica": {"disponible": replica_disponible(), "lag_seg": _replica["lag"]}})
+
+
+# ===============================
+# ÍNDICE DE DOCUMENTOS — en memoria, por worker
+# ===============================
+# (campana_id, tipo, número) -> (convocatoria, área). Las claves son hashes de 64 bits en un
+# array ordenado con los códigos de valor en paralelo (~12 bytes por postulante) y un filtro
+# Bloom delante para descartar sin búsqueda. Se mantiene al día con LISTEN/NOTIFY.
+INDICE_CANAL = "postulantes_doc"
+INDICE_RECIENTES_MAX = 2048
+INDICE_BLOOM_BITS_POR_CLAVE = 10
+INDICE_BLOOM_HASHES = 7
+INDICE_BORRADO = 0xFFFFFFFF
+
+
+def hash_documento(campana_id, tipo_documento, numero_documento):
+    clave = f"{campana_id}|{tipo_documento}|{numero_documento}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(clave, digest_size=8).digest(), "little")
+
+
+class IndiceDocumentos:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listo = False
+        self._vaciar()
+
+    def _vaciar(self):
+        self.claves = array("Q")
+        self.codigos = array("I")
+        self.recientes = {}
+        self.valores = []
+        self.codigo_de = {}
+        self._crear_bloom(0)
+
+    def _crear_bloom(self, n):
+        self.bloom_bits = max(1 << 20, n * 2 * INDICE_BLOOM_BITS_POR_CLAVE)
+        self.bloom = bytearray(self.bloom_bits // 8 + 1)
+        self.bloom_capacidad = self.bloom_bits // INDICE_BLOOM_BITS_POR_CLAVE
+
+    def _posiciones(self, h):
+        a, b = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(a + i * b) % self.bloom_bits for i in range(INDICE_BLOOM_HASHES)]
+
+    def _codigo(self, convocatoria, area):
+        valor = (convocatoria or "", area or "")
+        codigo = self.codigo_de.get(valor)
+        if codigo is None:
+            codigo = self.codigo_de[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def _agregar(self, h, codigo):
+        for pos in self._posiciones(h):
+            self.bloom[pos >> 3] |= 1 << (pos & 7)
+        self.recientes[h] = codigo
+        if len(self.recientes) > INDICE_RECIENTES_MAX:
+            self._compactar()
+
+    def _compactar(self):
+        # Mezcla los recientes en los arrays ordenados y descarta los borrados
+        claves, codigos = array("Q"), array("I")
+        recientes = sorted(self.recientes.items())
+        i = j = 0
+        while i < len(self.claves) or j < len(recientes):
+            if j == len(recientes) or (i < len(self.claves) and self.claves[i] < recientes[j][0]):
+                h, codigo = self.claves[i], self.codigos[i]
+                i += 1
+            else:
+                h, codigo = recientes[j]
+                if i < len(self.claves) and self.claves[i] == h:
+                    i += 1
+                j += 1
+            if codigo != INDICE_BORRADO:
+                claves.append(h)
+                codigos.append(codigo)
+        self.claves, self.codigos, self.recientes = claves, codigos, {}
+        if len(self.claves) > self.bloom_capacidad:
+            self._crear_bloom(len(self.claves))
+            for h in self.claves:
+                for pos in self._posiciones(h):
+                    self.bloom[pos >> 3] |= 1 << (pos & 7)
+
+    def cargar(self, filas):
+        with self.lock:
+            self._vaciar()
+            pares = sorted((hash_documento(c, t, n), self._codigo(conv, area)) for c, t, n, conv, area in filas)
+            self._crear_bloom(len(pares))
+            for h, codigo in pares:
+                self.claves.append(h)
+                self.codigos.append(codigo)
+                for pos in self._posiciones(h):
+                    self.bloom[pos >> 3] |= 1 << (pos & 7)
+            self.listo = True
+
+    def aplicar(self, aviso):
+        with self.lock:
+            h = hash_documento(aviso["c"], aviso["t"], aviso["n"])
+            if aviso["op"] == "+":
+                self._agregar(h, self._codigo(aviso.get("conv"), aviso.get("area")))
+            else:
+                self.recientes[h] = INDICE_BORRADO
+
+    def buscar(self, campana_id, tipo_documento, numero_documento):
+        # None: seguro que no existe. () si el índice no está listo: hay que consultar la base.
+        if not self.listo:
+            return ()
+        h = hash_documento(campana_id, tipo_documento, numero_documento)
+        with self.lock:
+            if not all(self.bloom[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(h)):
+                return None
+            codigo = self.recientes.get(h)
+            if codigo is None:
+                i = bisect.bisect_left(self.claves, h)
+                if i < len(self.claves) and self.claves[i] == h:
+                    codigo = self.codigos[i]
+            if codigo is None or codigo == INDICE_BORRADO:
+                return None
+            return self.valores[codigo]
+
+
+indice_documentos = IndiceDocumentos()
+
+
+def escuchar_documentos():
+    # Conexión propia (fuera del pool): LISTEN primero y luego la carga completa,
+    # así no se pierde ningún aviso entre ambos pasos.
+    espera = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {INDICE_CANAL}")
+            conn.commit()
+            with conn.cursor(name="indice_documentos") as cur:
+                cur.itersize = 10000
+                cur.execute("""
+                    SELECT campana_id, tipo_documento, numero_documento, convocatoria, area
+                    FROM postulantes
+                """)
+                indice_documentos.cargar(cur)
+            conn.commit()
+            conn.autocommit = True
+            log_evento(logging.INFO, "indice_cargado", "Índice de documentos cargado",
+                       claves=len(indice_documentos.claves))
+            espera = 1
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = json.loads(conn.notifies.pop(0).payload)
+                    if aviso["op"] in ("campanas", "recargar"):
+                        _campana_cache["ts"] = 0.0
+                    if aviso["op"] == "campanas":
+                        continue
+                    if aviso["op"] == "recargar":
+                        raise InterruptedError("recarga solicitada")
+                    indice_documentos.aplicar(aviso)
+        except InterruptedError:
+            espera = 0
+        except Exception as e:
+            log_evento(logging.ERROR, "indice_sin_conexion", f"Índice de documentos sin conexión: {e}")
+            espera = min(espera * 2, 60)
+        finally:
+            # Sin avisos el índice podría quedar desactualizado: se consulta la base hasta recargar
+            indice_documentos.listo = False
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(espera)
+
+
+def avisar_recarga_indice(cur):
+    cur.execute("SELECT pg_notify(%s, %s)", (INDICE_CANAL, json.dumps({"op": "recargar"})))
+
+
+threading.Thread(target=escuchar_documentos, name="indice-documentos", daemon=True).start()
 
 
 @app.post("/api/verificar-postulante")
+@con_plazo(5000)
 def verificar_postulante():
     data = request.get_json(silent=True) or {}
     numero_documento = (data.get("numero_documento") or "").strip()
@@ -424,12 +1733,19 @@ def verificar_postulante():
         return jsonify({"ok": False, "error": "Datos incompletos"}), 400
 
     try:
+        campana = campana_abierta_cache()
+        # Negativo seguro del índice: se responde sin ir a la base. Sin campaña en la caché (o sin
+        # índice cargado) se consulta como siempre, contra todas las campañas abiertas.
+        if campana and indice_documentos.buscar(campana["id"], tipo_documento, numero_documento) is None:
+            return jsonify({"ok": True, "existe": False}), 200
+
         with PooledConn() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT convocatoria, area, apellidos, nombres, created_at
                     FROM postulantes
                     WHERE numero_documento = %s AND tipo_documento = %s
+                      AND campana_id IN (SELECT id FROM campanas WHERE abierta = 1 AND vigente = 1)
                     LIMIT 1
                 """, (numero_documento, tipo_documento))
                 resultado = cur.fetchone()
@@ -448,56 +1764,496 @@ def verificar_postulante():
                     return jsonify({"ok": True, "existe": False}), 200
 
     except Exception as e:
-        print(f"❌ Error al verificar postulante: {str(e)}")
+        log_evento(logging.ERROR, "verificar_fallido", f"Error al verificar postulante: {e}", exc_info=True)
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
-@app.post("/api/submit")
-def submit():
+# ===============================
+# INGESTA — spool local (SQLite WAL) para /api/submit
+# ===============================
+# Con INGESTA_SPOOL definido, /api/submit valida, guarda en un SQLite local y responde
+# con un recibo sin tocar PostgreSQL; un hilo drena el spool por lotes.
+INGESTA_SPOOL = os.getenv("INGESTA_SPOOL")
+SPOOL_LOTE = 200
+SPOOL_TOMA_SEG = 60
+SPOOL_RETENCION_DIAS = 7
+CAMPANA_CACHE_SEG = 60
+CAMPOS_POSTULACION = (
+    "area", "convocatoria", "apellidos", "nombres", "tipo_documento", "numero_documento",
+    "fecha_nacimiento", "sexo", "celular", "correo", "fuerzas_armadas",
+    "tiene_discapacidad", "tipo_discapacidad",
+)
+_spool_evento = threading.Event()
+_campana_cache = {"valor": None, "ts": 0.0}
+
+
+class SpoolConn:
+    def __init__(self):
+        self.db = None
+    def __enter__(self):
+        # Autocommit: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+        self.db = sqlite3.connect(INGESTA_SPOOL, timeout=10, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA synchronous=FULL")
+        return self.db
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type and self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+        self.db.close()
+
+
+def init_spool():
+    with SpoolConn() as db:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("BEGIN IMMEDIATE")
+        anterior = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'spool'").fetchone()
+        # Antes el UNIQUE cubría también filas aceptadas y rechazadas (7 días de retención): un
+        # postulante eliminado en PostgreSQL o un envío rechazado bloqueaban el documento. SQLite no
+        # quita restricciones de tabla, así que se reconstruye.
+        migrar = anterior is not None and "UNIQUE" in anterior["sql"]
+        if migrar:
+            db.execute("ALTER TABLE spool RENAME TO spool_anterior")
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS spool (
+          recibo TEXT PRIMARY KEY,
+          campana_id INTEGER NOT NULL,
+          tipo_documento TEXT NOT NULL,
+          numero_documento TEXT NOT NULL,
+          datos TEXT NOT NULL,
+          created_at TEXT NOT NULL,
+          estado TEXT NOT NULL DEFAULT 'pendiente',
+          tomado_hasta REAL,
+          intentos INTEGER NOT NULL DEFAULT 0,
+          postulante_id INTEGER,
+          error TEXT,
+          procesado_at TEXT
+        )
+        """)
+        if migrar:
+            db.execute("INSERT INTO spool SELECT * FROM spool_anterior")
+            db.execute("DROP TABLE spool_anterior")
+        # Solo los envíos aún sin volcar reservan el documento; después manda PostgreSQL
+        db.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_spool_documento
+            ON spool(campana_id, tipo_documento, numero_documento)
+            WHERE estado IN ('pendiente', 'procesando')
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_spool_estado ON spool(estado, created_at)")
+        db.execute("COMMIT")
+
+
+def campana_abierta_cache():
+    # Evita una consulta por envío; los avisos de 'campanas' invalidan el valor. Sin el canal
+    # de avisos se consulta siempre, y si la base no responde se usa el último valor conocido.
+    ahora = time.time()
+    if indice_documentos.listo and ahora - _campana_cache["ts"] < CAMPANA_CACHE_SEG:
+        return _campana_cache["valor"]
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT valor FROM configuracion WHERE clave = 'convocatoria_activa'")
-                row = cur.fetchone()
-                if row and row['valor'] == 'false':
-                    return jsonify({"ok": False, "cerrado": True,
-                                    "error": "La convocatoria ha finalizado. Ya no se aceptan registros."}), 403
-    except Exception as e:
-        print(f"Error verificando estado convocatoria: {e}")
-
-    data = request.get_json(silent=True) or {}
+                campana = campana_abierta(cur)
+    except Exception:
+        if _campana_cache["ts"]:
+            return _campana_cache["valor"]
+        raise
+    _campana_cache.update(valor=campana, ts=ahora)
+    return campana
 
-    area = (data.get("area") or "").strip()
-    convocatoria = (data.get("convocatoria") or "").strip()
-    apellidos = (data.get("apellidos") or "").strip().upper()
-    nombres = (data.get("nombres") or "").strip().upper()
-    tipo_documento = (data.get("tipo_documento") or "").strip()
-    numero_documento = (data.get("numero_documento") or "").strip()
-    fecha_nacimiento = (data.get("fecha_nacimiento") or "").strip()
-    sexo = (data.get("sexo") or "").strip()
-    celular = (data.get("celular") or "").strip()
-    correo = (data.get("correo") or "").strip()
-    fuerzas_armadas = (data.get("fuerzas_armadas") or "").strip()
-    tiene_discapacidad = (data.get("tiene_discapacidad") or "").strip()
-    tipo_discapacidad = (data.get("tipo_discapacidad") or "").strip()
 
-    if not all([area, convocatoria, apellidos, nombres, tipo_documento,
-                numero_documento, fecha_nacimiento,
-                sexo, celular, correo, fuerzas_armadas, tiene_discapacidad]):
-        return jsonify({"ok": False, "error": "Completa todos los campos"}), 400
+def encolar_postulacion(campana_id, datos):
+    recibo = secrets.token_urlsafe(12)
+    try:
+        with SpoolConn() as db:
+            db.execute("""
+                INSERT INTO spool (recibo, campana_id, tipo_documento, numero_documento, datos, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (recibo, campana_id, datos["tipo_documento"], datos["numero_documento"],
+                  json.dumps(datos, ensure_ascii=False), now_peru()))
+    except sqlite3.IntegrityError:
+        return jsonify({
+            "ok": False,
+            "error": f"El {datos['tipo_documento']} {datos['numero_documento']} ya está registrado"
+        }), 400
+    _spool_evento.set()
+    return jsonify({"ok": True, "recibo": recibo, "estado": "pendiente"}), 202
 
-    if not EMAIL_RE.match(correo):
-        return jsonify({"ok": False, "error": "Correo inválido"}), 400
 
-    try:
-        with PooledConn() as conn:
-            with conn.cursor() as cur:
+def tomar_lote_spool(db):
+    ahora = time.time()
+    db.execute("BEGIN IMMEDIATE")
+    filas = db.execute("""
+        SELECT recibo, campana_id, datos, created_at FROM spool
+        WHERE estado = 'pendiente' OR (estado = 'procesando' AND tomado_hasta < ?)
+        ORDER BY created_at LIMIT ?
+    """, (ahora, SPOOL_LOTE)).fetchall()
+    db.executemany("""
+        UPDATE spool SET estado = 'procesando', tomado_hasta = ?, intentos = intentos + 1
+        WHERE recibo = ?
+    """, [(ahora + SPOOL_TOMA_SEG, f["recibo"]) for f in filas])
+    db.execute("COMMIT")
+    return filas
+
+
+def fila_spool_a_postulante(fila):
+    datos = json.loads(fila["datos"])
+    return tuple(datos.get(c) or "" for c in CAMPOS_POSTULACION) + (
+        fila["created_at"], fila["campana_id"], fila["recibo"])
+
+
+def volcar_lote_spool(filas):
+    # Devuelve {recibo: (estado, postulante_id, error)}
+    resultados = {}
+    columnas = ", ".join(CAMPOS_POSTULACION) + ", created_at, campana_id, recibo, validado"
+    valores = [fila_spool_a_postulante(f) + (0,) for f in filas]
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            try:
+                insertados = execute_values(cur, f"""
+                    INSERT INTO postulantes ({columnas}) VALUES %s
+                    ON CONFLICT (numero_documento, tipo_documento, campana_id) DO NOTHING
+                    RETURNING id, recibo
+                """, valores, fetch=True)
+            except (psycopg2.IntegrityError, psycopg2.DataError):
+                # Un registro inválido no debe bloquear al resto: se reintenta uno por uno
+                conn.rollback()
+                insertados = []
+                for v in valores:
+                    cur.execute("SAVEPOINT fila")
+                    try:
+                        insertados += execute_values(cur, f"""
+                            INSERT INTO postulantes ({columnas}) VALUES %s
+                            ON CONFLICT (numero_documento, tipo_documento, campana_id) DO NOTHING
+                            RETURNING id, recibo
+                        """, [v], fetch=True)
+                    except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT fila")
+                        resultados[v[-2]] = ("rechazado", None, str(e).strip().splitlines()[0])
+            for r in insertados:
+                resultados[r["recibo"]] = ("aceptado", r["id"], None)
+
+            # Conflictos: puede ser un reintento de este mismo recibo o un duplicado real
+            faltantes = [v for v in valores if v[-2] not in resultados]
+            if faltantes:
                 cur.execute("""
-                    SELECT convocatoria, area FROM postulantes
-                    WHERE numero_documento = %s AND tipo_documento = %s
-                    LIMIT 1
-                """, (numero_documento, tipo_documento))
-                existe = cur.fetchone()
+                    SELECT id, recibo, convocatoria, numero_documento, tipo_documento, campana_id
+                    FROM postulantes
+                    WHERE (numero_documento, tipo_documento, campana_id) IN %s
+                """, (tuple((v[5], v[4], v[-3]) for v in faltantes),))
+                existentes = {(e["numero_documento"], e["tipo_documento"], e["campana_id"]): e
+                              for e in cur.fetchall()}
+                for v in faltantes:
+                    e = existentes.get((v[5], v[4], v[-3]))
+                    if e and e["recibo"] == v[-2]:
+                        resultados[v[-2]] = ("aceptado", e["id"], None)
+                    else:
+                        convocatoria = e["convocatoria"] if e else ""
+                        resultados[v[-2]] = ("rechazado", None,
+                            f"El {v[4]} {v[5]} ya está registrado en: {convocatoria}")
+            conn.commit()
+    return resultados
+
+
+def marcar_lote_spool(db, resultados):
+    procesado = now_peru()
+    db.execute("BEGIN IMMEDIATE")
+    db.executemany("""
+        UPDATE spool SET estado = ?, postulante_id = ?, error = ?, procesado_at = ?, tomado_hasta = NULL
+        WHERE recibo = ?
+    """, [(estado, pid, error, procesado, recibo) for recibo, (estado, pid, error) in resultados.items()])
+    db.execute("COMMIT")
+
+
+def liberar_lote_spool(db, filas):
+    db.executemany("""
+        UPDATE spool SET estado = 'pendiente', tomado_hasta = NULL
+        WHERE recibo = ? AND estado = 'procesando'
+    """, [(f["recibo"],) for f in filas])
+
+
+def purgar_spool(db):
+    limite = (datetime.now(TIMEZONE) - timedelta(days=SPOOL_RETENCION_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    db.execute("DELETE FROM spool WHERE estado IN ('aceptado', 'rechazado') AND procesado_at < ?", (limite,))
+
+
+def drenar_spool():
+    espera = 1
+    ultima_purga = 0.0
+    while True:
+        _spool_evento.wait(timeout=espera)
+        _spool_evento.clear()
+        filas = []
+        try:
+            with SpoolConn() as db:
+                filas = tomar_lote_spool(db)
+                if time.time() - ultima_purga > 3600:
+                    purgar_spool(db)
+                    ultima_purga = time.time()
+            if not filas:
+                espera = 1
+                continue
+            resultados = volcar_lote_spool(filas)
+            with SpoolConn() as db:
+                marcar_lote_spool(db, resultados)
+            log_evento(logging.INFO, "spool_volcado", "Spool volcado a PostgreSQL", registros=len(resultados))
+            # Lote lleno: probablemente hay más esperando
+            espera = 0 if len(filas) == SPOOL_LOTE else 1
+        except Exception as e:
+            log_evento(logging.ERROR, "spool_fallido", f"Error drenando spool: {e}", exc_info=True,
+                       registros=len(filas))
+            if filas:
+                try:
+                    with SpoolConn() as db:
+                        liberar_lote_spool(db, filas)
+                except Exception:
+                    pass
+            espera = min(max(espera, 1) * 2, 30)
+
+
+@app.get("/api/submit/estado/<recibo>")
+def estado_recibo(recibo):
+    if not INGESTA_SPOOL:
+        return jsonify({"ok": False, "error": "Recibo no encontrado"}), 404
+    with SpoolConn() as db:
+        fila = db.execute("SELECT estado, error FROM spool WHERE recibo = ?", (recibo,)).fetchone()
+    if not fila:
+        return jsonify({"ok": False, "error": "Recibo no encontrado"}), 404
+    estado = "pendiente" if fila["estado"] == "procesando" else fila["estado"]
+    return jsonify({"ok": True, "recibo": recibo, "estado": estado, "error": fila["error"]})
+
+
+@app.get("/api/ingesta/estado")
+def estado_ingesta():
+    err = require_rol("admin")
+    if err: return err
+    if not INGESTA_SPOOL:
+        return jsonify({"ok": True, "activo": False})
+    with SpoolConn() as db:
+        conteos = {r["estado"]: r["n"] for r in db.execute(
+            "SELECT estado, COUNT(*) AS n FROM spool GROUP BY estado")}
+        antiguo = db.execute(
+            "SELECT MIN(created_at) AS f FROM spool WHERE estado IN ('pendiente', 'procesando')").fetchone()["f"]
+    return jsonify({"ok": True, "activo": True, "conteos": conteos, "pendiente_desde": antiguo})
+
+
+if INGESTA_SPOOL:
+    init_spool()
+    threading.Thread(target=drenar_spool, name="drenar-spool", daemon=True).start()
+
+
+# ===============================
+# IDEMPOTENCIA — reintentos de /api/submit
+# ===============================
+# El cliente envía Idempotency-Key; la respuesta final se guarda por clave y se repite
+# tal cual en los reintentos. Con IDEMPOTENCIA_COMPARTIDA=1 también se guarda en la base
+# para que un reintento que cae en otro worker la encuentre.
+IDEMPOTENCIA_TTL_SEG = 10 * 60
+IDEMPOTENCIA_MAX = 5000
+IDEMPOTENCIA_ESPERA_SEG = 30
+IDEMPOTENCIA_COMPARTIDA = os.getenv("IDEMPOTENCIA_COMPARTIDA") == "1"
+IDEMPOTENCIA_CLAVE_RE = re.compile(r"^[A-Za-z0-9_-]{8,100}$")
+_idempotencia = OrderedDict()
+_idempotencia_lock = threading.Lock()
+
+
+def init_idempotencia():
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS idempotencia (
+              clave TEXT PRIMARY KEY,
+              huella TEXT NOT NULL,
+              status INTEGER,
+              cuerpo TEXT,
+              created_at TEXT NOT NULL
+            );
+            """)
+            conn.commit()
+
+
+def respuesta_repetida(status, cuerpo):
+    resp = Response(cuerpo, status=status, mimetype="application/json")
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def reclamar_clave_compartida(clave, huella):
+    # Devuelve None si esta petición se queda con la clave, o la fila existente
+    limite = (datetime.now(TIMEZONE) - timedelta(seconds=IDEMPOTENCIA_TTL_SEG)).strftime("%Y-%m-%d %H:%M:%S")
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM idempotencia WHERE clave = %s AND created_at < %s", (clave, limite))
+            cur.execute("""
+                INSERT INTO idempotencia (clave, huella, created_at) VALUES (%s, %s, %s)
+                ON CONFLICT (clave) DO NOTHING
+            """, (clave, huella, now_peru()))
+            if cur.rowcount:
+                # De paso se limpian claves vencidas de otros
+                cur.execute("DELETE FROM idempotencia WHERE created_at < %s", (limite,))
+                conn.commit()
+                return None
+            cur.execute("SELECT huella, status, cuerpo FROM idempotencia WHERE clave = %s", (clave,))
+            fila = cur.fetchone()
+            conn.commit()
+            return fila
+
+
+def cerrar_clave_compartida(clave, status, cuerpo):
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            if status is None:
+                cur.execute("DELETE FROM idempotencia WHERE clave = %s", (clave,))
+            else:
+                cur.execute("UPDATE idempotencia SET status = %s, cuerpo = %s WHERE clave = %s",
+                            (status, cuerpo, clave))
+            conn.commit()
+
+
+def responder_idempotente(funcion):
+    clave = request.headers.get("Idempotency-Key", "").strip()
+    if not clave:
+        return funcion()
+    if not IDEMPOTENCIA_CLAVE_RE.match(clave):
+        return jsonify({"ok": False, "error": "Idempotency-Key inválida"}), 400
+    huella = hashlib.sha256(request.get_data()).hexdigest()
+
+    # Una sola petición por clave dentro del worker; las concurrentes esperan su resultado
+    while True:
+        with _idempotencia_lock:
+            ahora = time.time()
+            while _idempotencia and next(iter(_idempotencia.values()))["ts"] < ahora - IDEMPOTENCIA_TTL_SEG:
+                _idempotencia.popitem(last=False)
+            entrada = _idempotencia.get(clave)
+            if entrada is None:
+                entrada = _idempotencia[clave] = {
+                    "ts": ahora, "huella": huella, "evento": threading.Event(), "respuesta": None}
+                while len(_idempotencia) > IDEMPOTENCIA_MAX:
+                    _idempotencia.popitem(last=False)
+                break
+        if entrada["huella"] != huella:
+            return jsonify({"ok": False, "error": "Idempotency-Key ya usada con otros datos"}), 422
+        if entrada["respuesta"] is None:
+            entrada["evento"].wait(IDEMPOTENCIA_ESPERA_SEG)
+        if entrada["respuesta"] is not None:
+            return respuesta_repetida(*entrada["respuesta"])
+        # La primera petición falló sin respuesta final: esta la reintenta
+        with _idempotencia_lock:
+            if _idempotencia.get(clave) is entrada:
+                del _idempotencia[clave]
+
+    if IDEMPOTENCIA_COMPARTIDA:
+        try:
+            fila = reclamar_clave_compartida(clave, huella)
+        except Exception as e:
+            log_evento(logging.ERROR, "idempotencia_caida", f"Idempotencia compartida no disponible: {e}")
+            fila = None
+        if fila is not None:
+            with _idempotencia_lock:
+                _idempotencia.pop(clave, None)
+            entrada["evento"].set()
+            if fila["huella"] != huella:
+                return jsonify({"ok": False, "error": "Idempotency-Key ya usada con otros datos"}), 422
+            if fila["status"] is None:
+                return jsonify({"ok": False, "error": "La solicitud anterior aún se está procesando"}), 409
+            return respuesta_repetida(fila["status"], fila["cuerpo"])
+
+    status = cuerpo = None
+    try:
+        resp = app.make_response(funcion())
+        # Los 5xx no se guardan: el reintento debe poder volver a intentarlo
+        if resp.status_code < 500:
+            status, cuerpo = resp.status_code, resp.get_data(as_text=True)
+        return resp
+    finally:
+        with _idempotencia_lock:
+            if status is None:
+                _idempotencia.pop(clave, None)
+            else:
+                entrada["respuesta"] = (status, cuerpo)
+        entrada["evento"].set()
+        if IDEMPOTENCIA_COMPARTIDA:
+            try:
+                cerrar_clave_compartida(clave, status, cuerpo)
+            except Exception as e:
+                log_evento(logging.ERROR, "idempotencia_caida", f"Idempotencia compartida no disponible: {e}")
+
+
+if IDEMPOTENCIA_COMPARTIDA:
+    init_idempotencia()
+
+
+@app.post("/api/submit")
+@con_plazo(8000)
+def submit():
+    return responder_idempotente(registrar_postulacion)
+
+
+def registrar_postulacion():
+    try:
+        campana = campana_abierta_cache()
+    except Exception as e:
+        log_evento(logging.ERROR, "convocatoria_fallida", f"Error verificando estado convocatoria: {e}",
+                   exc_info=True)
+        return jsonify({"ok": False, "error": "No se pudo verificar el estado de la convocatoria"}), 500
+
+    if not campana:
+        return jsonify({"ok": False, "cerrado": True,
+                        "error": "La convocatoria ha finalizado. Ya no se aceptan registros."}), 403
+
+    data = request.get_json(silent=True) or {}
+
+    area = (data.get("area") or "").strip()
+    convocatoria = (data.get("convocatoria") or "").strip()
+    apellidos = (data.get("apellidos") or "").strip().upper()
+    nombres = (data.get("nombres") or "").strip().upper()
+    tipo_documento = (data.get("tipo_documento") or "").strip()
+    numero_documento = (data.get("numero_documento") or "").strip()
+    fecha_nacimiento = (data.get("fecha_nacimiento") or "").strip()
+    sexo = (data.get("sexo") or "").strip()
+    celular = (data.get("celular") or "").strip()
+    correo = (data.get("correo") or "").strip()
+    fuerzas_armadas = (data.get("fuerzas_armadas") or "").strip()
+    tiene_discapacidad = (data.get("tiene_discapacidad") or "").strip()
+    tipo_discapacidad = (data.get("tipo_discapacidad") or "").strip()
+
+    if not all([area, convocatoria, apellidos, nombres, tipo_documento,
+                numero_documento, fecha_nacimiento,
+                sexo, celular, correo, fuerzas_armadas, tiene_discapacidad]):
+        return jsonify({"ok": False, "error": "Completa todos los campos"}), 400
+
+    if not EMAIL_RE.match(correo):
+        return jsonify({"ok": False, "error": "Correo inválido"}), 400
+
+    if not fecha_valida(fecha_nacimiento):
+        return jsonify({"ok": False, "error": "Fecha de nacimiento inválida (YYYY-MM-DD)"}), 400
+
+    registrado = indice_documentos.buscar(campana["id"], tipo_documento, numero_documento)
+
+    if INGESTA_SPOOL:
+        if registrado:
+            return jsonify({
+                "ok": False,
+                "error": f"El {tipo_documento} {numero_documento} ya está registrado en: {registrado[0]}"
+            }), 400
+        return encolar_postulacion(campana["id"], {
+            "area": area, "convocatoria": convocatoria, "apellidos": apellidos, "nombres": nombres,
+            "tipo_documento": tipo_documento, "numero_documento": numero_documento,
+            "fecha_nacimiento": fecha_nacimiento, "sexo": sexo, "celular": celular, "correo": correo,
+            "fuerzas_armadas": fuerzas_armadas, "tiene_discapacidad": tiene_discapacidad,
+            "tipo_discapacidad": tipo_discapacidad,
+        })
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                # Solo si el índice no descarta el documento se confirma contra la base
+                existe = None
+                if registrado is not None:
+                    cur.execute("""
+                        SELECT convocatoria, area FROM postulantes
+                        WHERE numero_documento = %s AND tipo_documento = %s AND campana_id = %s
+                        LIMIT 1
+                    """, (numero_documento, tipo_documento, campana["id"]))
+                    existe = cur.fetchone()
 
                 if existe:
                     return jsonify({
@@ -509,50 +2265,104 @@ def submit():
                   INSERT INTO postulantes
                   (created_at, area, convocatoria, apellidos, nombres, tipo_documento,
                    numero_documento, fecha_nacimiento, sexo, celular, correo,
-                   fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, validado)
-                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0)
+                   fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, validado, campana_id)
+                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0, %s)
                 """, (
                     now_peru(), area, convocatoria, apellidos, nombres, tipo_documento,
                     numero_documento, fecha_nacimiento, sexo, celular, correo,
-                    fuerzas_armadas, tiene_discapacidad, tipo_discapacidad
+                    fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, campana["id"]
                 ))
                 conn.commit()
-                print(f"✅ Postulante registrado: {apellidos}, {nombres}")
+                log_evento(logging.INFO, "postulante_registrado", f"Postulante registrado: {apellidos}, {nombres}",
+                           muestreo=LOG_MUESTREO, area=area, campana_id=campana["id"])
 
         return jsonify({"ok": True})
 
+    except psycopg2.errors.UniqueViolation:
+        # Registrado por otra petición entre la consulta al índice y el INSERT
+        return jsonify({
+            "ok": False,
+            "error": f"El {tipo_documento} {numero_documento} ya está registrado"
+        }), 400
     except Exception as e:
-        print(f"❌ Error al registrar: {str(e)}")
+        log_evento(logging.ERROR, "registro_fallido", f"Error al registrar: {e}", exc_info=True)
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
 # -----------------------------------------------
 # POLLING
 # -----------------------------------------------
+# Columnas de pocos valores distintos: en formato columnar van como diccionario + índices
+COLUMNAS_DICCIONARIO = {
+    "area", "convocatoria", "sexo", "tipo_documento", "fuerzas_armadas",
+    "tiene_discapacidad", "tipo_discapacidad", "usuario_atendio",
+}
+
+
+def lista_columnar(sql, params=(), orden="t.id"):
+    # {"columnas": {"id": [...], "area": {"dic": ["GGRD", ...], "idx": [0, 0, 1, ...]}, ...}}
+    with PooledConn() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(f"SELECT * FROM ({sql}) t ORDER BY {orden}", params)
+            nombres = [d[0] for d in cur.description]
+            filas = cur.fetchall()
+
+    columnas = {}
+    valores_por_columna = zip(*filas) if filas else [()] * len(nombres)
+    for nombre, valores in zip(nombres, valores_por_columna):
+        if nombre in COLUMNAS_DICCIONARIO:
+            dic = {}
+            idx = [dic.setdefault(v, len(dic)) for v in valores]
+            columnas[nombre] = {"dic": list(dic), "idx": idx}
+        else:
+            columnas[nombre] = list(valores)
+    cuerpo = json.dumps({"ok": True, "formato": "columnar", "n": len(filas), "columnas": columnas},
+                        ensure_ascii=False, separators=(",", ":"))
+    return Response(cuerpo.encode("utf-8"), mimetype="application/json")
+
+
+def lista_json(sql, params=(), orden="t.id"):
+    # Postgres arma el cuerpo {"ok":true,"items":[...]} y lo entrega como bytes UTF-8:
+    # en Python no se crea un dict por fila ni se vuelve a serializar.
+    if request.args.get("formato") == "columnar":
+        return lista_columnar(sql, params, orden)
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT convert_to(
+                  '{{"ok":true,"items":[' || COALESCE(string_agg(row_to_json(t)::text, ',' ORDER BY {orden}), '') || ']}}',
+                  'UTF8') AS cuerpo
+                FROM ({sql}) t
+            """, params)
+            cuerpo = cur.fetchone()["cuerpo"]
+    return Response(bytes(cuerpo), mimetype="application/json")
+
+
 @app.get("/api/postulantes/pendientes-nuevos")
+@solo_lectura
+@con_plazo(2000, descartable=True, poll_ms=3000)
 def postulantes_pendientes_nuevos():
     err = require_rol("admin", "usuario")
     if err: return err
 
     after_id = request.args.get("after_id", 0, type=int)
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                       numero_documento, fecha_nacimiento, sexo, celular, correo,
-                       fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
-                FROM postulantes
-                WHERE id > %s AND usuario_atendio IS NULL
-                ORDER BY id ASC
-            """, (after_id,))
-            rows = cur.fetchall()
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
 
-    items = [dict(r) for r in rows]
-    return jsonify({"ok": True, "items": items})
+    return con_etag(lista_json("""
+        SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+               numero_documento, fecha_nacimiento, sexo, celular, correo,
+               fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
+        FROM postulantes
+        WHERE id > %s AND usuario_atendio IS NULL
+    """, (after_id,), orden="t.id ASC"), etag)
 
 
 @app.post("/api/postulantes/datos-atendidos")
+@solo_lectura
+@con_plazo(2000, descartable=True, poll_ms=3000)
 def datos_atendidos():
     err = require_rol("admin", "usuario")
     if err: return err
@@ -568,24 +2378,19 @@ def datos_atendidos():
     except (ValueError, TypeError):
         return jsonify({"ok": False, "error": "IDs inválidos"}), 400
 
-    placeholders = ','.join(['%s'] * len(ids))
-
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                       numero_documento, fecha_nacimiento, sexo, celular, correo,
-                       fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
-                       created_at, usuario_atendio, fecha_atencion
-                FROM postulantes
-                WHERE id IN ({placeholders}) AND usuario_atendio IS NOT NULL
-            """, tuple(ids))
-            rows = cur.fetchall()
-
-    return jsonify({"ok": True, "items": [dict(r) for r in rows]})
+    return lista_json("""
+        SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+               numero_documento, fecha_nacimiento, sexo, celular, correo,
+               fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
+               created_at, usuario_atendio, fecha_atencion
+        FROM postulantes
+        WHERE id = ANY(%s) AND usuario_atendio IS NOT NULL
+    """, (ids,))
 
 
 @app.get("/api/postulantes/atendidos-ids")
+@solo_lectura
+@con_plazo(2000, descartable=True, poll_ms=3000)
 def postulantes_atendidos_ids():
     err = require_rol("admin", "usuario")
     if err: return err
@@ -593,7 +2398,7 @@ def postulantes_atendidos_ids():
     after_id = request.args.get("after_id", 0, type=int)
 
     with PooledConn() as conn:
-        with conn.cursor() as cur:
+        with conn.cursor(cursor_factory=CURSOR_TUPLAS) as cur:
             cur.execute("""
                 SELECT id, usuario_atendio
                 FROM postulantes
@@ -601,94 +2406,395 @@ def postulantes_atendidos_ids():
             """, (after_id,))
             rows = cur.fetchall()
 
-    items = [{"id": r["id"], "usuario_atendio": r["usuario_atendio"]} for r in rows]
+    items = [{"id": i, "usuario_atendio": u} for i, u in rows]
     return jsonify({"ok": True, "items": items})
 
 
 @app.get("/api/postulantes/atendidos-nuevos")
+@solo_lectura
+@con_plazo(2000, descartable=True, poll_ms=4000)
 def postulantes_atendidos_nuevos():
     err = require_rol("admin")
     if err: return err
 
     after_id = request.args.get("after_id", 0, int)
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                       numero_documento, fecha_nacimiento, sexo, celular, correo,
-                       fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
-                       created_at, usuario_atendio, fecha_atencion
-                FROM postulantes
-                WHERE id > %s AND usuario_atendio IS NOT NULL
-                ORDER BY id ASC
-            """, (after_id,))
-            rows = cur.fetchall()
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
 
-    items = [dict(r) for r in rows]
-    return jsonify({"ok": True, "items": items})
+    return con_etag(lista_json("""
+        SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+               numero_documento, fecha_nacimiento, sexo, celular, correo,
+               fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
+               created_at, usuario_atendio, fecha_atencion
+        FROM postulantes
+        WHERE id > %s AND usuario_atendio IS NOT NULL
+    """, (after_id,), orden="t.id ASC"), etag)
 
 
 @app.get("/api/postulantes/registrados")
+@solo_lectura
+@con_plazo(5000, descartable=True)
 def postulantes_registrados():
     err = require_rol("admin", "usuario")
     if err: return err
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                       numero_documento, fecha_nacimiento, sexo, celular, correo,
-                       fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
-                FROM postulantes
-                WHERE usuario_atendio IS NULL
-                ORDER BY created_at DESC
-            """)
-            rows = cur.fetchall()
-
-    items = [dict(r) for r in rows]
-    return jsonify({"ok": True, "items": items})
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
+    return con_etag(lista_json("""
+        SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+               numero_documento, fecha_nacimiento, sexo, celular, correo,
+               fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
+        FROM postulantes
+        WHERE usuario_atendio IS NULL
+    """, orden="t.created_at DESC"), etag)
+
+
+def leer_estadisticas(cur):
+    cur.execute("""
+        SELECT
+            COUNT(*) FILTER (WHERE usuario_atendio IS NULL AND sexo = 'Femenino')  AS reg_mujeres,
+            COUNT(*) FILTER (WHERE usuario_atendio IS NULL AND sexo = 'Masculino') AS reg_hombres,
+            COUNT(*) FILTER (WHERE usuario_atendio IS NOT NULL AND sexo = 'Femenino')  AS rec_mujeres,
+            COUNT(*) FILTER (WHERE usuario_atendio IS NOT NULL AND sexo = 'Masculino') AS rec_hombres
+        FROM postulantes
+    """)
+    totales = cur.fetchone()
+
+    cur.execute("""
+        SELECT area, COUNT(*) as total FROM postulantes
+        WHERE area IS NOT NULL AND area != ''
+        GROUP BY area ORDER BY total DESC
+    """)
+    por_area = {row["area"]: row["total"] for row in cur.fetchall()}
+
+    return {
+        "registrados_mujeres": int(totales["reg_mujeres"]),
+        "registrados_hombres": int(totales["reg_hombres"]),
+        "recibidos_mujeres": int(totales["rec_mujeres"]),
+        "recibidos_hombres": int(totales["rec_hombres"]),
+        "por_area": por_area
+    }
 
 
 @app.get("/api/estadisticas")
+@solo_lectura
+@con_plazo(3000, descartable=True, poll_ms=5000)
 def estadisticas():
     err = require_rol("admin")
     if err: return err
 
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT
-                        COUNT(*) FILTER (WHERE usuario_atendio IS NULL AND sexo = 'Femenino')  AS reg_mujeres,
-                        COUNT(*) FILTER (WHERE usuario_atendio IS NULL AND sexo = 'Masculino') AS reg_hombres,
-                        COUNT(*) FILTER (WHERE usuario_atendio IS NOT NULL AND sexo = 'Femenino')  AS rec_mujeres,
-                        COUNT(*) FILTER (WHERE usuario_atendio IS NOT NULL AND sexo = 'Masculino') AS rec_hombres
+                datos = leer_estadisticas(cur)
+        return con_etag(jsonify({"ok": True, **datos}), etag)
+
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+SERIE_GRANULARIDADES = {"hora": 13, "dia": 10}
+SERIE_DIMENSIONES = ("area", "usuario")
+FECHA_SERIE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}( \d{2})?$")
+
+
+@app.get("/api/estadisticas/serie")
+@solo_lectura
+@con_plazo(5000, descartable=True)
+def estadisticas_serie():
+    err = require_rol("admin")
+    if err: return err
+
+    granularidad = request.args.get("granularidad", "hora")
+    if granularidad not in SERIE_GRANULARIDADES:
+        return jsonify({"ok": False, "error": "Granularidad inválida (hora, dia)"}), 400
+
+    ahora = datetime.now(TIMEZONE)
+    desde = (request.args.get("desde") or (ahora - timedelta(days=1)).strftime("%Y-%m-%d %H")).strip()
+    hasta = (request.args.get("hasta") or ahora.strftime("%Y-%m-%d %H")).strip()
+    if not all(FECHA_SERIE_RE.match(f) and fecha_valida(f[:10]) for f in (desde, hasta)):
+        return jsonify({"ok": False, "error": "Fechas inválidas (YYYY-MM-DD o YYYY-MM-DD HH)"}), 400
+    if len(hasta) == 10:
+        hasta += " 23"
+
+    por = [d for d in (request.args.get("por") or "area").split(",") if d]
+    if any(d not in SERIE_DIMENSIONES for d in por):
+        return jsonify({"ok": False, "error": "Dimensión inválida (area, usuario)"}), 400
+
+    filtros, params = ["hora >= %s", "hora <= %s"], [desde, hasta]
+    for campo in ("evento", "area", "usuario"):
+        valor = (request.args.get(campo) or "").strip()
+        if valor:
+            filtros.append(f"{campo} = %s")
+            params.append(valor)
+
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
+    largo = SERIE_GRANULARIDADES[granularidad]
+    columnas = "".join(f", {d}" for d in por)
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                cur.execute(f"""
+                    SELECT left(hora, {largo}) AS periodo, evento{columnas}, SUM(total) AS total
+                    FROM (
+                      SELECT hora, evento, area, usuario, total FROM estadisticas_hora
+                      UNION ALL
+                      SELECT hora, evento, area, usuario, 1 FROM estadisticas_delta
+                    ) AS e
+                    WHERE {" AND ".join(filtros)}
+                    GROUP BY periodo, evento{columnas}
+                    ORDER BY periodo, evento{columnas}
+                """, tuple(params))
+                rows = cur.fetchall()
+
+        items = [{**r._asdict(), "total": int(r.total)} for r in rows]
+        return con_etag(jsonify({"ok": True, "granularidad": granularidad, "items": items}), etag)
+
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# Dimensiones permitidas para el pivot -> expresión SQL sobre postulantes
+PIVOT_DIMENSIONES = {
+    "area": "NULLIF(area, '')",
+    "sexo": "sexo",
+    "convocatoria": "convocatoria",
+    "tiene_discapacidad": "NULLIF(tiene_discapacidad, '')",
+    "fuerzas_armadas": "NULLIF(fuerzas_armadas, '')",
+    # Filas viejas pueden traer fechas imposibles (2000-13-45): el cast ::date abortaría toda la
+    # consulta, así que antes se descartan por formato y por días del mes
+    "rango_edad": """CASE
+        WHEN fecha_nacimiento !~ '^(19|20)\\d{2}-(0[1-9]|1[0-2])-(0[1-9]|[12]\\d|3[01])$' THEN NULL
+        WHEN right(fecha_nacimiento, 2)::int > date_part('day',
+             (left(fecha_nacimiento, 7) || '-01')::date + interval '1 month - 1 day') THEN NULL
+        WHEN date_part('year', age(fecha_nacimiento::date)) < 25 THEN '18-24'
+        WHEN date_part('year', age(fecha_nacimiento::date)) < 35 THEN '25-34'
+        WHEN date_part('year', age(fecha_nacimiento::date)) < 45 THEN '35-44'
+        WHEN date_part('year', age(fecha_nacimiento::date)) < 55 THEN '45-54'
+        WHEN date_part('year', age(fecha_nacimiento::date)) < 65 THEN '55-64'
+        ELSE '65+' END""",
+    "estado": "CASE WHEN usuario_atendio IS NULL THEN 'registrado' ELSE 'recibido' END",
+}
+PIVOT_CACHE_MAX = 64
+_pivot_cache = OrderedDict()
+_pivot_lock = threading.Lock()
+
+
+def calcular_pivot(dims, conjuntos=None, filtros=None, version=None):
+    # Una sola pasada: GROUP BY CUBE(dims) o los GROUPING SETS pedidos.
+    # GROUPING() distingue "todas" (dimensión agregada) de un valor NULL real.
+    filtros = filtros or {}
+    clave = (tuple(dims), tuple(map(tuple, conjuntos)) if conjuntos else None, tuple(sorted(filtros.items())))
+    if version is not None:
+        with _pivot_lock:
+            guardado = _pivot_cache.get(clave)
+            if guardado and guardado[0] == version:
+                _pivot_cache.move_to_end(clave)
+                return guardado[1]
+
+    columnas = ", ".join(f"{PIVOT_DIMENSIONES[d]} AS {d}" for d in dims)
+    if conjuntos is None:
+        agrupar = f"CUBE ({', '.join(dims)})"
+    else:
+        agrupar = "GROUPING SETS (" + ", ".join(f"({', '.join(c)})" for c in conjuntos) + ")"
+    where, params = "", []
+    if filtros:
+        where = "WHERE " + " AND ".join(f"{PIVOT_DIMENSIONES[d]} = %s" for d in filtros)
+        params = list(filtros.values())
+
+    with PooledConn() as conn:
+        with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+            cur.execute(f"""
+                SELECT {', '.join(dims)}, GROUPING({', '.join(dims)}) AS agregado, COUNT(*) AS total
+                FROM (SELECT {columnas} FROM postulantes {where}) p
+                GROUP BY {agrupar}
+                ORDER BY agregado DESC, {', '.join(dims)}
+            """, tuple(params))
+            rows = cur.fetchall()
+
+    items = []
+    for r in rows:
+        item = {}
+        for i, d in enumerate(dims):
+            if not r.agregado & (1 << (len(dims) - 1 - i)):
+                item[d] = getattr(r, d)
+        item["total"] = int(r.total)
+        items.append(item)
+
+    if version is not None:
+        with _pivot_lock:
+            _pivot_cache[clave] = (version, items)
+            _pivot_cache.move_to_end(clave)
+            while len(_pivot_cache) > PIVOT_CACHE_MAX:
+                _pivot_cache.popitem(last=False)
+    return items
+
+
+@app.get("/api/estadisticas/pivot")
+@solo_lectura
+@con_plazo(5000, descartable=True)
+def estadisticas_pivot():
+    err = require_rol("admin")
+    if err: return err
+
+    dims = [d for d in (request.args.get("dims") or "").split(",") if d]
+    if not dims or len(set(dims)) != len(dims) or any(d not in PIVOT_DIMENSIONES for d in dims):
+        return jsonify({"ok": False, "error": f"dims inválidas. Usa: {', '.join(PIVOT_DIMENSIONES)}"}), 400
+
+    # sets=area,sexo;area;  (grupo vacío = total general). Sin sets se usa CUBE.
+    conjuntos = None
+    if request.args.get("sets") is not None:
+        conjuntos = [[d for d in g.split(",") if d] for g in request.args["sets"].split(";")]
+        if any(d not in dims for g in conjuntos for d in g):
+            return jsonify({"ok": False, "error": "Los sets solo pueden usar dimensiones de dims"}), 400
+
+    filtros = {d: request.args[d] for d in PIVOT_DIMENSIONES if request.args.get(d)}
+
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
+    try:
+        items = calcular_pivot(dims, conjuntos, filtros, version=etag)
+        return con_etag(jsonify({"ok": True, "dims": dims, "items": items}), etag)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# ===============================
+# REPORTES — productividad por usuario
+# ===============================
+# Recibidos por usuario_atendio, periodo (hora o día de fecha_atencion), área y sexo, con la
+# mediana de espera (created_at -> fecha_atencion). Todas las columnas salen de
+# idx_atencion_reporte, así Postgres agrega con un index-only scan sin tocar la tabla.
+# Además del detalle vienen los subtotales (usuario, periodo) y (usuario); como en el pivot,
+# la dimensión agregada no aparece en el item.
+REPORTE_DIMENSIONES = ("usuario", "periodo", "area", "sexo")
+REPORTE_CACHE_MAX = 32
+_reporte_cache = OrderedDict()
+_reporte_lock = threading.Lock()
+
+
+def calcular_reporte_atencion(granularidad, desde=None, hasta=None, filtros=None, version=None):
+    filtros = filtros or {}
+    clave = (granularidad, desde, hasta, tuple(sorted(filtros.items())))
+    if version is not None:
+        with _reporte_lock:
+            guardado = _reporte_cache.get(clave)
+            if guardado and guardado[0] == version:
+                _reporte_cache.move_to_end(clave)
+                return guardado[1]
+
+    where, params = ["usuario_atendio IS NOT NULL"], []
+    if desde:
+        where.append("fecha_atencion >= %s")
+        params.append(desde)
+    if hasta:
+        where.append("fecha_atencion <= %s")
+        params.append(hasta)
+    if filtros.get("usuario"):
+        where.append("usuario_atendio = %s")
+        params.append(filtros["usuario"])
+    if filtros.get("area"):
+        where.append("area = %s")
+        params.append(filtros["area"])
+
+    largo = SERIE_GRANULARIDADES[granularidad]
+    with PooledConn() as conn:
+        with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+            cur.execute(f"""
+                SELECT usuario, periodo, area, sexo,
+                       GROUPING(usuario, periodo, area, sexo) AS agregado,
+                       COUNT(*) AS total,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY espera) AS mediana
+                FROM (
+                    SELECT usuario_atendio AS usuario, left(fecha_atencion, {largo}) AS periodo,
+                           NULLIF(area, '') AS area, sexo,
+                           EXTRACT(EPOCH FROM fecha_atencion::timestamp - created_at::timestamp) AS espera
                     FROM postulantes
-                """)
-                totales = cur.fetchone()
+                    WHERE {" AND ".join(where)}
+                ) p
+                GROUP BY GROUPING SETS ((usuario, periodo, area, sexo), (usuario, periodo), (usuario))
+                ORDER BY usuario, periodo NULLS FIRST, agregado DESC, area, sexo
+            """, tuple(params))
+            rows = cur.fetchall()
 
-                cur.execute("""
-                    SELECT area, COUNT(*) as total FROM postulantes
-                    WHERE area IS NOT NULL AND area != ''
-                    GROUP BY area ORDER BY total DESC
-                """)
-                rows_area = cur.fetchall()
-                por_area = {row["area"]: row["total"] for row in rows_area}
+    items = []
+    for r in rows:
+        item = {}
+        for i, d in enumerate(REPORTE_DIMENSIONES):
+            if not r.agregado & (1 << (len(REPORTE_DIMENSIONES) - 1 - i)):
+                item[d] = getattr(r, d)
+        item["total"] = int(r.total)
+        item["mediana_espera_seg"] = int(r.mediana) if r.mediana is not None else None
+        items.append(item)
+
+    if version is not None:
+        with _reporte_lock:
+            _reporte_cache[clave] = (version, items)
+            _reporte_cache.move_to_end(clave)
+            while len(_reporte_cache) > REPORTE_CACHE_MAX:
+                _reporte_cache.popitem(last=False)
+    return items
+
+
+@app.get("/api/reportes/atencion")
+@solo_lectura
+@con_plazo(5000, descartable=True)
+def reporte_atencion():
+    err = require_rol("admin")
+    if err: return err
 
-        return jsonify({
-            "ok": True,
-            "registrados_mujeres": int(totales["reg_mujeres"]),
-            "registrados_hombres": int(totales["reg_hombres"]),
-            "recibidos_mujeres": int(totales["rec_mujeres"]),
-            "recibidos_hombres": int(totales["rec_hombres"]),
-            "por_area": por_area
-        })
+    granularidad = request.args.get("granularidad", "hora")
+    if granularidad not in SERIE_GRANULARIDADES:
+        return jsonify({"ok": False, "error": "Granularidad inválida (hora, dia)"}), 400
+
+    ahora = datetime.now(TIMEZONE)
+    desde = (request.args.get("desde") or (ahora - timedelta(days=1)).strftime("%Y-%m-%d %H")).strip()
+    hasta = (request.args.get("hasta") or ahora.strftime("%Y-%m-%d %H")).strip()
+    if not all(FECHA_SERIE_RE.match(f) and fecha_valida(f[:10]) for f in (desde, hasta)):
+        return jsonify({"ok": False, "error": "Fechas inválidas (YYYY-MM-DD o YYYY-MM-DD HH)"}), 400
+    # fecha_atencion es texto "YYYY-MM-DD HH:MM:SS": el límite superior se completa hasta el último segundo
+    hasta += " 23:59:59" if len(hasta) == 10 else ":59:59"
 
+    filtros = {c: request.args[c].strip() for c in ("usuario", "area") if (request.args.get(c) or "").strip()}
+
+    etag = etag_recursos("postulantes")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
+    try:
+        items = calcular_reporte_atencion(granularidad, desde, hasta, filtros, version=etag)
+        return con_etag(jsonify({"ok": True, "granularidad": granularidad, "items": items}), etag)
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+# Reconciliación de las series por hora: el trigger no descuenta bajas ni cambios de área
+ESTADISTICAS_RECALCULO_SEG = int(os.getenv("ESTADISTICAS_RECALCULO_SEG", str(24 * 60 * 60)))
+ESTADISTICAS_MARGEN_SEG = 15 * 60
+ESTADISTICAS_CONSOLIDACION_SEG = int(os.getenv("ESTADISTICAS_CONSOLIDACION_SEG", "60"))
+
+
+@app.cli.command("rellenar-estadisticas")
+def rellenar_estadisticas_cmd():
+    with PooledConn() as conn:
+        insertadas = rellenar_estadisticas_hora(conn)
+    print(f"✅ Series por hora recalculadas ({insertadas} filas)")
+
+
 @app.post("/api/eliminar/<int:pid>")
 def api_eliminar(pid):
     err = require_rol("admin", "usuario")
@@ -696,16 +2802,23 @@ def api_eliminar(pid):
     err2 = require_csrf()
     if err2: return err2
 
+    # Borrado y registro en logs en una sola sentencia
     with PooledConn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT apellidos, nombres FROM postulantes WHERE id = %s", (pid,))
-            p = cur.fetchone()
-            cur.execute("DELETE FROM postulantes WHERE id=%s", (pid,))
+            cur.execute("""
+                WITH borrado AS (
+                    DELETE FROM postulantes WHERE id = %(id)s
+                    RETURNING id, apellidos, nombres, campana_id
+                ), log AS (
+                    INSERT INTO logs (fecha, usuario, accion, campana_id)
+                    SELECT %(fecha)s, %(usuario)s,
+                           'Eliminó a ' || apellidos || ', ' || nombres || ' (ID: ' || id || ')', campana_id
+                    FROM borrado
+                )
+                SELECT count(*) AS n FROM borrado
+            """, {"id": pid, "fecha": now_peru(), "usuario": session.get("usuario", "?")})
             conn.commit()
 
-    if p:
-        registrar_log(session.get("usuario", "?"), f"Eliminó a {p['apellidos']}, {p['nombres']} (ID: {pid})")
-
     return jsonify({"ok": True})
 
 
@@ -742,63 +2855,93 @@ def editar_postulante():
     if not EMAIL_RE.match(correo):
         return jsonify({"ok": False, "error": "Correo inválido"}), 400
 
+    if not fecha_valida(fecha_nacimiento):
+        return jsonify({"ok": False, "error": "Fecha de nacimiento inválida (YYYY-MM-DD)"}), 400
+
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT usuario_atendio FROM postulantes WHERE id = %s", (postulante_id,))
-                postulante = cur.fetchone()
+                # Validación, UPDATE y log en una sola sentencia; los conflictos se leen del resultado
+                cur.execute("""
+                    WITH objetivo AS (
+                        SELECT id, campana_id, usuario_atendio FROM postulantes WHERE id = %(id)s
+                    ), duplicado AS (
+                        SELECT 1 FROM postulantes d, objetivo o
+                        WHERE d.numero_documento = %(numero_documento)s AND d.tipo_documento = %(tipo_documento)s
+                          AND d.campana_id = o.campana_id AND d.id != o.id
+                        LIMIT 1
+                    ), actualizado AS (
+                        UPDATE postulantes p
+                        SET area = %(area)s, convocatoria = %(convocatoria)s, apellidos = %(apellidos)s,
+                            nombres = %(nombres)s, tipo_documento = %(tipo_documento)s,
+                            numero_documento = %(numero_documento)s, fecha_nacimiento = %(fecha_nacimiento)s,
+                            sexo = %(sexo)s, celular = %(celular)s, correo = %(correo)s,
+                            fuerzas_armadas = %(fuerzas_armadas)s, tiene_discapacidad = %(tiene_discapacidad)s,
+                            tipo_discapacidad = %(tipo_discapacidad)s
+                        FROM objetivo o
+                        WHERE p.id = o.id AND p.campana_id = o.campana_id
+                          AND p.usuario_atendio IS NULL
+                          AND NOT EXISTS (SELECT 1 FROM duplicado)
+                        RETURNING p.id, p.apellidos, p.nombres, p.campana_id
+                    ), log AS (
+                        INSERT INTO logs (fecha, usuario, accion, campana_id)
+                        SELECT %(fecha)s, %(usuario)s,
+                               'Editó datos de ' || apellidos || ', ' || nombres || ' (ID: ' || id || ')', campana_id
+                        FROM actualizado
+                    )
+                    SELECT o.usuario_atendio,
+                           EXISTS (SELECT 1 FROM duplicado) AS duplicado,
+                           EXISTS (SELECT 1 FROM actualizado) AS actualizado
+                    FROM objetivo o
+                """, {
+                    "id": postulante_id, "area": area, "convocatoria": convocatoria,
+                    "apellidos": apellidos, "nombres": nombres, "tipo_documento": tipo_documento,
+                    "numero_documento": numero_documento, "fecha_nacimiento": fecha_nacimiento,
+                    "sexo": sexo, "celular": celular, "correo": correo,
+                    "fuerzas_armadas": fuerzas_armadas, "tiene_discapacidad": tiene_discapacidad,
+                    "tipo_discapacidad": tipo_discapacidad,
+                    "fecha": now_peru(), "usuario": session.get("usuario"),
+                })
+                r = cur.fetchone()
+                conn.commit()
 
-                if not postulante:
+                if not r:
                     return jsonify({"ok": False, "error": "Postulante no encontrado"}), 404
 
-                if postulante["usuario_atendio"] is not None:
+                if r["usuario_atendio"] is not None:
                     return jsonify({
                         "ok": False,
                         "error": "No se puede editar un postulante que ya fue atendido"
                     }), 400
 
-                cur.execute("""
-                    SELECT id FROM postulantes
-                    WHERE numero_documento = %s AND tipo_documento = %s AND id != %s
-                    LIMIT 1
-                """, (numero_documento, tipo_documento, postulante_id))
-
-                if cur.fetchone():
+                if r["duplicado"]:
                     return jsonify({
                         "ok": False,
                         "error": f"El {tipo_documento} {numero_documento} ya está registrado en otro postulante"
                     }), 400
 
-                cur.execute("""
-                    UPDATE postulantes
-                    SET area = %s, convocatoria = %s, apellidos = %s, nombres = %s,
-                        tipo_documento = %s, numero_documento = %s, fecha_nacimiento = %s,
-                        sexo = %s, celular = %s, correo = %s, fuerzas_armadas = %s,
-                        tiene_discapacidad = %s, tipo_discapacidad = %s
-                    WHERE id = %s AND usuario_atendio IS NULL
-                """, (
-                    area, convocatoria, apellidos, nombres, tipo_documento,
-                    numero_documento, fecha_nacimiento, sexo, celular, correo,
-                    fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
-                    postulante_id
-                ))
-                conn.commit()
-
-                if cur.rowcount == 0:
+                if not r["actualizado"]:
                     return jsonify({
                         "ok": False,
                         "error": "No se pudo actualizar. El postulante puede haber sido atendido."
                     }), 400
 
-                registrar_log(session.get("usuario"), f"Editó datos de {apellidos}, {nombres} (ID: {postulante_id})")
                 return jsonify({"ok": True})
 
+    except psycopg2.errors.UniqueViolation:
+        # Otro postulante tomó el documento entre la lectura y el UPDATE
+        return jsonify({
+            "ok": False,
+            "error": f"El {tipo_documento} {numero_documento} ya está registrado en otro postulante"
+        }), 400
+
     except Exception as e:
-        print(f"❌ Error al editar postulante: {str(e)}")
+        log_evento(logging.ERROR, "edicion_fallida", f"Error al editar postulante: {e}", exc_info=True)
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
 @app.post("/api/recibir-postulante")
+@con_plazo(5000)
 def recibir_postulante():
     err = require_rol("usuario")
     if err: return err
@@ -817,30 +2960,50 @@ def recibir_postulante():
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT apellidos, nombres FROM postulantes WHERE id = %s", (postulante_id,))
-                postulante = cur.fetchone()
-
-                if not postulante:
-                    return jsonify({"ok": False, "error": "Postulante no encontrado"}), 404
-
+                # UPDATE y log en una sola sentencia; "objetivo" ve la fila antes del UPDATE
+                # y sirve para explicar por qué no se pudo recibir. FOR UPDATE espera a quien
+                # la está recibiendo y devuelve la versión que confirmó (quién la recibió),
+                # no la del snapshot de la sentencia
                 cur.execute("""
-                    UPDATE postulantes
-                    SET usuario_atendio = %s, fecha_atencion = %s
-                    WHERE id = %s AND usuario_atendio IS NULL
-                """, (usuario_actual, fecha_actual, postulante_id))
+                    WITH objetivo AS (
+                        SELECT id, usuario_atendio, reservado_por FROM postulantes WHERE id = %(id)s
+                        FOR UPDATE
+                    ), recibido AS (
+                        UPDATE postulantes
+                        SET usuario_atendio = %(usuario)s, fecha_atencion = %(fecha)s,
+                            reservado_por = NULL, reservado_hasta = NULL
+                        WHERE id = %(id)s AND usuario_atendio IS NULL
+                          AND (reservado_por IS NULL OR reservado_por = %(usuario)s OR reservado_hasta < %(fecha)s)
+                        RETURNING apellidos, nombres, campana_id
+                    ), log AS (
+                        INSERT INTO logs (fecha, usuario, accion, campana_id)
+                        SELECT %(fecha)s, %(usuario)s, 'Recibió a ' || apellidos || ', ' || nombres, campana_id
+                        FROM recibido
+                    )
+                    SELECT o.usuario_atendio, o.reservado_por,
+                           EXISTS (SELECT 1 FROM recibido) AS recibido
+                    FROM objetivo o
+                """, {"id": postulante_id, "usuario": usuario_actual, "fecha": fecha_actual})
+                r = cur.fetchone()
                 conn.commit()
 
-                if cur.rowcount == 0:
-                    cur.execute("SELECT usuario_atendio FROM postulantes WHERE id = %s", (postulante_id,))
-                    row = cur.fetchone()
-                    quien = row["usuario_atendio"] if row else "otro usuario"
-                    return jsonify({
-                        "ok": False,
-                        "ya_tomado": True,
-                        "error": f"Ya fue recibido por {quien}"
-                    }), 409
+        if not r:
+            return jsonify({"ok": False, "error": "Postulante no encontrado"}), 404
+
+        if not r["recibido"]:
+            if r["usuario_atendio"] is None and r["reservado_por"]:
+                return jsonify({
+                    "ok": False,
+                    "reservado": True,
+                    "error": f"Está reservado por {r['reservado_por']}"
+                }), 409
+            quien = r["usuario_atendio"] or "otro usuario"
+            return jsonify({
+                "ok": False,
+                "ya_tomado": True,
+                "error": f"Ya fue recibido por {quien}"
+            }), 409
 
-        registrar_log(usuario_actual, f"Recibió a {postulante['apellidos']}, {postulante['nombres']}")
         return jsonify({"ok": True})
 
     except Exception as e:
@@ -848,53 +3011,149 @@ def recibir_postulante():
 
 
 # ===============================
-# USUARIOS
+# COLA DE ATENCIÓN — reservas
 # ===============================
-@app.post("/api/activar-usuario")
-def activar_usuario():
-    err = require_rol("admin")
-    if err: return err
-    err2 = require_csrf()
-    if err2: return err2
+RESERVA_TTL_SEG = 2 * 60
+COLA_MAX_LOTE = 20
 
-    data = request.get_json()
-    username = data.get("username")
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("UPDATE usuarios SET activo = 1 WHERE username = %s", (username,))
-            conn.commit()
-    return jsonify({"ok": True})
 
+def vencimiento_reserva():
+    return (datetime.now(TIMEZONE) + timedelta(seconds=RESERVA_TTL_SEG)).strftime("%Y-%m-%d %H:%M:%S")
 
-@app.post("/api/desactivar-usuario")
-def desactivar_usuario():
-    err = require_rol("admin")
+
+# Reserva los N pendientes más antiguos (opcionalmente por área) para el usuario actual.
+# SKIP LOCKED hace que dos usuarios simultáneos reciban filas distintas en vez de chocar.
+@app.post("/api/cola/siguiente")
+@con_plazo(5000)
+def cola_siguiente():
+    err = require_rol("usuario")
     if err: return err
     err2 = require_csrf()
     if err2: return err2
 
-    data = request.get_json()
-    username = data.get("username")
-    if username == "admin":
-        return jsonify({"ok": False, "error": "No se puede desactivar admin"}), 400
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("UPDATE usuarios SET activo = 0 WHERE username = %s", (username,))
+    area = (request.args.get("area") or "").strip()
+    n = max(1, min(request.args.get("n", 1, type=int), COLA_MAX_LOTE))
+
+    usuario_actual = session.get("usuario")
+    ahora = now_peru()
+    hasta = vencimiento_reserva()
+
+    filtro_area = "AND area = %s" if area else ""
+    params = [usuario_actual, hasta, ahora, usuario_actual]
+    if area:
+        params.append(area)
+    params.append(n)
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    UPDATE postulantes p
+                    SET reservado_por = %s, reservado_hasta = %s
+                    FROM (
+                        SELECT id FROM postulantes
+                        WHERE usuario_atendio IS NULL
+                          AND (reservado_por IS NULL OR reservado_hasta < %s OR reservado_por = %s)
+                          {filtro_area}
+                        ORDER BY id ASC
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    ) libres
+                    WHERE p.id = libres.id
+                    RETURNING p.id, p.area, p.convocatoria, p.apellidos, p.nombres, p.tipo_documento,
+                              p.numero_documento, p.fecha_nacimiento, p.sexo, p.celular, p.correo,
+                              p.fuerzas_armadas, p.tiene_discapacidad, p.tipo_discapacidad,
+                              p.created_at, p.reservado_hasta
+                """, tuple(params))
+                rows = cur.fetchall()
             conn.commit()
-    return jsonify({"ok": True})
 
+        items = sorted((dict(r) for r in rows), key=lambda r: r["id"])
+        return jsonify({"ok": True, "items": items, "ttl": RESERVA_TTL_SEG})
 
-@app.post("/api/crear-usuario")
-def crear_usuario():
-    err = require_rol("admin")
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/cola/liberar")
+def cola_liberar():
+    err = require_rol("usuario")
     if err: return err
     err2 = require_csrf()
     if err2: return err2
 
-    data = request.get_json()
-    username = data.get("username", "").strip()
-    password = data.get("password", "").strip()
-    rol = data.get("rol", "usuario")
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = [int(i) for i in data.get("ids", [])]
+    except (ValueError, TypeError):
+        return jsonify({"ok": False, "error": "IDs inválidos"}), 400
+
+    if not ids:
+        return jsonify({"ok": True, "liberados": 0})
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE postulantes
+                    SET reservado_por = NULL, reservado_hasta = NULL
+                    WHERE id = ANY(%s) AND reservado_por = %s AND usuario_atendio IS NULL
+                """, (ids, session.get("usuario")))
+                liberados = cur.rowcount
+            conn.commit()
+        return jsonify({"ok": True, "liberados": liberados})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# ===============================
+# USUARIOS
+# ===============================
+@app.post("/api/activar-usuario")
+def activar_usuario():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json()
+    username = data.get("username")
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE usuarios SET activo = 1 WHERE username = %s", (username,))
+            conn.commit()
+    return jsonify({"ok": True})
+
+
+@app.post("/api/desactivar-usuario")
+def desactivar_usuario():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json()
+    username = data.get("username")
+    if username == "admin":
+        return jsonify({"ok": False, "error": "No se puede desactivar admin"}), 400
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE usuarios SET activo = 0 WHERE username = %s", (username,))
+            conn.commit()
+    return jsonify({"ok": True})
+
+
+@app.post("/api/crear-usuario")
+def crear_usuario():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json()
+    username = data.get("username", "").strip()
+    password = data.get("password", "").strip()
+    rol = data.get("rol", "usuario")
     if not username or not password:
         return jsonify({"ok": False, "error": "Datos incompletos"}), 400
     try:
@@ -963,6 +3222,8 @@ def cambiar_password():
 
 
 @app.get("/api/logs")
+@solo_lectura
+@con_plazo(3000, descartable=True)
 def api_logs():
     err = require_rol("admin")
     if err: return err
@@ -975,28 +3236,28 @@ def api_logs():
 
     try:
         with PooledConn() as conn:
-            with conn.cursor() as cur:
+            with conn.cursor(cursor_factory=cursor_de(FilaLog)) as filas, conn.cursor() as cur:
                 if buscar:
-                    cur.execute("""
-                        SELECT fecha, usuario, accion FROM logs
+                    filas.execute("""
+                        SELECT id, fecha, usuario, accion FROM logs
                         WHERE LOWER(usuario) LIKE %s OR LOWER(accion) LIKE %s
                         ORDER BY id DESC LIMIT %s OFFSET %s
                     """, (f"%{buscar}%", f"%{buscar}%", tam, offset))
-                    rows = cur.fetchall()
+                    rows = filas.fetchall()
                     cur.execute("""
                         SELECT COUNT(*) as total FROM logs
                         WHERE LOWER(usuario) LIKE %s OR LOWER(accion) LIKE %s
                     """, (f"%{buscar}%", f"%{buscar}%"))
                 else:
-                    cur.execute("""
-                        SELECT fecha, usuario, accion FROM logs
+                    filas.execute("""
+                        SELECT id, fecha, usuario, accion FROM logs
                         ORDER BY id DESC LIMIT %s OFFSET %s
                     """, (tam, offset))
-                    rows = cur.fetchall()
+                    rows = filas.fetchall()
                     cur.execute("SELECT COUNT(*) as total FROM logs")
                 total = cur.fetchone()["total"]
 
-        return jsonify({"ok": True, "items": [dict(r) for r in rows], "total": total})
+        return jsonify({"ok": True, "items": [r._asdict() for r in rows], "total": total})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1019,29 +3280,146 @@ def limpiar_logs():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+LOGS_RETENCION_DIAS = int(os.getenv("LOGS_RETENCION_DIAS", "365"))
+LOGS_RECORTE_SEG = 6 * 60 * 60
+LOGS_RECORTE_LOTE = 5000
+
+
+def recortar_logs(conn):
+    limite = (datetime.now(TIMEZONE) - timedelta(days=LOGS_RETENCION_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    eliminados = 0
+    with conn.cursor() as cur:
+        # Los logs de campañas sin archivar se conservan: el archivo frío los guarda con sus postulantes
+        cur.execute("SELECT min(created_at) AS desde FROM campanas WHERE archivada = 0")
+        desde = cur.fetchone()["desde"]
+        if desde:
+            limite = min(limite, desde)
+        # Por lotes, para no retener bloqueos sobre logs mientras se registran acciones
+        while True:
+            cur.execute("""
+                DELETE FROM logs WHERE id IN (
+                    SELECT id FROM logs WHERE fecha < %s ORDER BY id LIMIT %s
+                )
+            """, (limite, LOGS_RECORTE_LOTE))
+            eliminados += cur.rowcount
+            conn.commit()
+            if cur.rowcount < LOGS_RECORTE_LOTE:
+                break
+    return {"eliminados": eliminados, "antes_de": limite}
+
+
 # ===============================
 # EXPORTACIONES
 # ===============================
-@app.get("/admin/export/csv")
-def export_csv():
-    if not sesion_activa("admin"):
-        return redirect("/login")
+# Cada generador recibe progreso(hechas, total) y la versión de postulantes que reflejará
+# el archivo. Devuelven (contenido, mimetype, nombre de descarga).
+COLUMNAS_EXPORT = ", ".join(FilaPostulante._fields)
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Conjuntos de filas que leen los exportadores -> filtro
+CONJUNTOS_EXPORT = {
+    "recibidos":  "usuario_atendio IS NOT NULL",
+    "pendientes": "usuario_atendio IS NULL",
+}
+
+# Snapshots por versión de postulantes:
+#  - _filas_export[conjunto]: filas (FilaPostulante) por id y la huella de cada una (xmin de la
+#    fila: cambia con cada UPDATE, sin recalcular nada). Si la versión cambió, se listan id y
+#    xmin y solo se leen completas las filas nuevas o modificadas. Es un LRU por worker con un
+#    tope de bytes estimado (EXPORT_CACHE_BYTES); un conjunto más grande que el tope no se guarda.
+#  - El último archivo generado de cada tipo queda en disco (EXPORT_DIR) con su versión en el
+#    nombre: lo comparten todos los workers del host y no ocupa memoria.
+EXPORT_CACHE_BYTES = int(os.getenv("EXPORT_CACHE_BYTES", str(64 * 1024 * 1024)))
+EXPORT_CACHE_BYTES_FILA = 150  # entradas de los dicts por id y la huella
+_filas_export = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+
+def sello_export():
+    return datetime.now(TIMEZONE).strftime('%Y%m%d_%H%M%S')
 
+
+HUELLA_SQL = "xmin::text"
+
+
+def tamano_snapshot(filas):
+    # Tamaño medio de una muestra por la cantidad de filas
+    muestra = list(itertools.islice(filas.values(), 200))
+    if not muestra:
+        return 0
+    medio = sum(sys.getsizeof(f) + sum(sys.getsizeof(v) for v in f) for f in muestra) / len(muestra)
+    return int(len(filas) * (medio + EXPORT_CACHE_BYTES_FILA))
+
+
+def guardar_snapshot_export(conjunto, snap):
+    with _snapshot_lock:
+        _filas_export.pop(conjunto, None)
+        if snap["bytes"] > EXPORT_CACHE_BYTES:
+            return
+        _filas_export[conjunto] = snap
+        while sum(s["bytes"] for s in _filas_export.values()) > EXPORT_CACHE_BYTES:
+            _filas_export.popitem(last=False)
+
+
+def guardar_filas_export(cur, filas, huellas):
+    # Cada fila llega como (huella, columnas de FilaPostulante...)
+    for f in cur:
+        fila = FilaPostulante._make(f[1:])
+        filas[fila.id] = fila
+        huellas[fila.id] = f[0]
+
+
+def leer_para_export(conjunto, progreso, version=None):
+    filtro = CONJUNTOS_EXPORT[conjunto]
+    with _snapshot_lock:
+        snap = _filas_export.get(conjunto)
+        if snap:
+            _filas_export.move_to_end(conjunto)
+    if snap and version and snap["version"] == version:
+        progreso(0, len(snap["filas"]))
+        return list(snap["filas"].values())
+
+    with PooledConn() as conn:
+        with conn.cursor(cursor_factory=CURSOR_TUPLAS) as cur:
+            if snap:
+                cur.execute(f"SELECT id, {HUELLA_SQL} FROM postulantes WHERE {filtro}")
+                actuales = dict(cur.fetchall())
+                guardadas = snap["huellas"]
+                # Se conservan las filas con el mismo xmin; salen las que dejaron el conjunto
+                filas = {i: f for i, f in snap["filas"].items() if actuales.get(i) == guardadas[i]}
+                huellas = {i: guardadas[i] for i in filas}
+                cambiados = [i for i in actuales if i not in filas]
+                if cambiados:
+                    cur.execute(f"""
+                        SELECT {HUELLA_SQL}, {COLUMNAS_EXPORT}
+                        FROM postulantes WHERE {filtro} AND id = ANY(%s)
+                    """, (cambiados,))
+                    guardar_filas_export(cur, filas, huellas)
+            else:
+                cur.execute(f"SELECT {HUELLA_SQL}, {COLUMNAS_EXPORT} FROM postulantes WHERE {filtro}")
+                filas, huellas = {}, {}
+                guardar_filas_export(cur, filas, huellas)
+        conn.commit()
+
+    if version:
+        guardar_snapshot_export(conjunto, {"version": version, "filas": filas, "huellas": huellas,
+                                           "bytes": tamano_snapshot(filas)})
+    progreso(0, len(filas))
+    return list(filas.values())
+
+
+def ordenar_export(filas, *campos, desc=False):
+    # Igual que ORDER BY en Postgres: los NULL van al final en ASC y al inicio en DESC
+    return sorted(filas, key=lambda p: tuple((getattr(p, c) is None, getattr(p, c) or '') for c in campos) + (p.id,),
+                  reverse=desc)
+
+
+def generar_csv_recibidos(progreso, version=None):
     import csv
     from io import StringIO
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-              SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                     numero_documento, fecha_nacimiento, sexo, celular, correo,
-                     fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
-                     created_at, usuario_atendio, fecha_atencion
-              FROM postulantes
-              WHERE usuario_atendio IS NOT NULL
-              ORDER BY fecha_atencion DESC
-            """)
-            postulantes = cur.fetchall()
+    postulantes = ordenar_export(leer_para_export("recibidos", progreso, version),
+                                 "fecha_atencion", desc=True)
 
     output = StringIO()
     writer = csv.writer(output)
@@ -1051,22 +3429,17 @@ def export_csv():
         'Discapacidad', 'Tipo Discapacidad', 'Fecha Registro',
         'Usuario Atendió', 'Fecha Atención'
     ])
-    for p in postulantes:
+    for i, p in enumerate(postulantes, 1):
         writer.writerow([
-            p['id'], p['area'] or '', p['convocatoria'], p['apellidos'], p['nombres'],
-            p['tipo_documento'], p['numero_documento'], p['fecha_nacimiento'],
-            p['sexo'], p['celular'], p['correo'], p['fuerzas_armadas'],
-            p['tiene_discapacidad'], p['tipo_discapacidad'] or '',
-            p['created_at'], p['usuario_atendio'], p['fecha_atencion']
+            p.id, p.area or '', p.convocatoria, p.apellidos, p.nombres,
+            p.tipo_documento, p.numero_documento, p.fecha_nacimiento,
+            p.sexo, p.celular, p.correo, p.fuerzas_armadas,
+            p.tiene_discapacidad, p.tipo_discapacidad or '',
+            p.created_at, p.usuario_atendio, p.fecha_atencion
         ])
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename=postulantes_{datetime.now(TIMEZONE).strftime('%Y%m%d_%H%M%S')}.csv"
-        }
-    )
+        if i % 1000 == 0:
+            progreso(i, len(postulantes))
+    return output.getvalue().encode("utf-8"), "text/csv", f"postulantes_{sello_export()}.csv"
 
 
 COLORES_AREA = {
@@ -1098,7 +3471,7 @@ def aplicar_estilo_excel(ws, postulantes, headers, col_area_idx=1):
 
     row_align = Alignment(horizontal="left", vertical="center")
     for row_num, p in enumerate(postulantes, 2):
-        area_val = p.get('area') or ''
+        area_val = p.area or ''
         cfg = COLORES_AREA.get(area_val, {'fondo': 'FFFFFF', 'letra': '1F2937'})
         row_fill = PatternFill(start_color=cfg['fondo'], end_color=cfg['fondo'], fill_type="solid")
         row_font = Font(color=cfg['letra'], size=9)
@@ -1124,7 +3497,7 @@ def aplicar_estilo_excel(ws, postulantes, headers, col_area_idx=1):
 
     areas_count = {}
     for p in postulantes:
-        a = p.get('area') or 'Sin área'
+        a = p.area or 'Sin área'
         areas_count[a] = areas_count.get(a, 0) + 1
 
     nota = " | ".join(f"{k}: {v}" for k, v in sorted(areas_count.items()))
@@ -1135,26 +3508,13 @@ def aplicar_estilo_excel(ws, postulantes, headers, col_area_idx=1):
     ws.freeze_panes = "A2"
 
 
-@app.get("/admin/export/excel")
-def export_excel():
-    if not sesion_activa("admin"):
-        return redirect("/login")
-    try:
-        from openpyxl import Workbook
-        from io import BytesIO
-    except ImportError:
-        return jsonify({"ok": False, "error": "openpyxl no está instalado"}), 500
+def generar_excel_recibidos(progreso, version=None):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from io import BytesIO
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-              SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                     numero_documento, fecha_nacimiento, sexo, celular, correo,
-                     fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
-                     created_at, usuario_atendio, fecha_atencion
-              FROM postulantes WHERE usuario_atendio IS NOT NULL ORDER BY area, fecha_atencion
-            """)
-            postulantes = cur.fetchall()
+    postulantes = ordenar_export(leer_para_export("recibidos", progreso, version),
+                                 "area", "fecha_atencion")
 
     wb = Workbook()
     ws = wb.active
@@ -1168,19 +3528,20 @@ def export_excel():
 
     for row_num, p in enumerate(postulantes, 2):
         vals = [
-            p['id'], p['area'] or '', p['convocatoria'], p['apellidos'], p['nombres'],
-            p['tipo_documento'], p['numero_documento'], p['fecha_nacimiento'],
-            p['sexo'], p['celular'], p['correo'], p['fuerzas_armadas'] or '',
-            p['tiene_discapacidad'] or '', p['tipo_discapacidad'] or '',
-            p['created_at'], p['usuario_atendio'], p['fecha_atencion']
+            p.id, p.area or '', p.convocatoria, p.apellidos, p.nombres,
+            p.tipo_documento, p.numero_documento, p.fecha_nacimiento,
+            p.sexo, p.celular, p.correo, p.fuerzas_armadas or '',
+            p.tiene_discapacidad or '', p.tipo_discapacidad or '',
+            p.created_at, p.usuario_atendio, p.fecha_atencion
         ]
         for col_num, val in enumerate(vals, 1):
             ws.cell(row=row_num, column=col_num, value=val)
+        if (row_num - 1) % 1000 == 0:
+            progreso(row_num - 1, len(postulantes))
 
     aplicar_estilo_excel(ws, postulantes, headers)
 
     ws_res = wb.create_sheet("Resumen por Área")
-    from openpyxl.styles import Font, PatternFill, Alignment
     ws_res.column_dimensions['A'].width = 35
     ws_res.column_dimensions['B'].width = 12
     ws_res.column_dimensions['C'].width = 12
@@ -1193,13 +3554,16 @@ def export_excel():
         c.alignment = Alignment(horizontal="center")
 
     resumen = {}
-    for p in postulantes:
-        a = p['area'] or 'Sin área'
-        if a not in resumen:
-            resumen[a] = {'total': 0, 'h': 0, 'm': 0}
-        resumen[a]['total'] += 1
-        if p['sexo'] == 'Masculino': resumen[a]['h'] += 1
-        else: resumen[a]['m'] += 1
+    for fila in calcular_pivot(["area", "sexo"], [["area"], ["area", "sexo"]],
+                               {"estado": "recibido"}, version=version or etag_recursos("postulantes")):
+        a = fila['area'] or 'Sin área'
+        datos = resumen.setdefault(a, {'total': 0, 'h': 0, 'm': 0})
+        if 'sexo' not in fila:
+            datos['total'] += fila['total']
+        elif fila['sexo'] == 'Masculino':
+            datos['h'] += fila['total']
+    for datos in resumen.values():
+        datos['m'] = datos['total'] - datos['h']
 
     NOMBRES_AREA = {
         'GGRD': 'Gestión del Riesgo de Desastres',
@@ -1219,32 +3583,15 @@ def export_excel():
 
     output = BytesIO()
     wb.save(output)
-    output.seek(0)
-    return send_file(output,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        as_attachment=True,
-        download_name=f"recibidos_{datetime.now(TIMEZONE).strftime('%Y%m%d_%H%M%S')}.xlsx")
+    return output.getvalue(), MIME_XLSX, f"recibidos_{sello_export()}.xlsx"
 
 
-@app.get("/admin/export/excel-pendientes")
-def export_excel_pendientes():
-    if not sesion_activa("admin"):
-        return redirect("/login")
-    try:
-        from openpyxl import Workbook
-        from io import BytesIO
-    except ImportError:
-        return jsonify({"ok": False, "error": "openpyxl no está instalado"}), 500
+def generar_excel_pendientes(progreso, version=None):
+    from openpyxl import Workbook
+    from io import BytesIO
 
-    with PooledConn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-              SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
-                     numero_documento, fecha_nacimiento, sexo, celular, correo,
-                     fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
-              FROM postulantes WHERE usuario_atendio IS NULL ORDER BY area, created_at
-            """)
-            postulantes = cur.fetchall()
+    postulantes = ordenar_export(leer_para_export("pendientes", progreso, version),
+                                 "area", "created_at")
 
     wb = Workbook()
     ws = wb.active
@@ -1258,37 +3605,317 @@ def export_excel_pendientes():
 
     for row_num, p in enumerate(postulantes, 2):
         vals = [
-            p['id'], p['area'] or '', p['convocatoria'], p['apellidos'], p['nombres'],
-            p['tipo_documento'], p['numero_documento'], p['fecha_nacimiento'],
-            p['sexo'], p['celular'], p['correo'], p['fuerzas_armadas'] or '',
-            p['tiene_discapacidad'] or '', p['tipo_discapacidad'] or '', p['created_at']
+            p.id, p.area or '', p.convocatoria, p.apellidos, p.nombres,
+            p.tipo_documento, p.numero_documento, p.fecha_nacimiento,
+            p.sexo, p.celular, p.correo, p.fuerzas_armadas or '',
+            p.tiene_discapacidad or '', p.tipo_discapacidad or '', p.created_at
         ]
         for col_num, val in enumerate(vals, 1):
             ws.cell(row=row_num, column=col_num, value=val)
+        if (row_num - 1) % 1000 == 0:
+            progreso(row_num - 1, len(postulantes))
 
     aplicar_estilo_excel(ws, postulantes, headers)
 
     output = BytesIO()
     wb.save(output)
-    output.seek(0)
-    return send_file(output,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        as_attachment=True,
-        download_name=f"registrados_{datetime.now(TIMEZONE).strftime('%Y%m%d_%H%M%S')}.xlsx")
+    return output.getvalue(), MIME_XLSX, f"registrados_{sello_export()}.xlsx"
+
+
+def generar_csv_reporte_atencion(progreso, version=None):
+    import csv
+    from io import StringIO
+
+    # Todo el historial por día; los subtotales llevan "(todas)" en la dimensión agregada
+    items = calcular_reporte_atencion("dia", version=version or etag_recursos("postulantes"))
+    progreso(0, len(items))
+
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Usuario', 'Día', 'Área', 'Sexo', 'Recibidos', 'Mediana espera (min)'])
+    for it in items:
+        mediana = it["mediana_espera_seg"]
+        writer.writerow([
+            it["usuario"], it.get("periodo", "(todas)"), it.get("area", "(todas)") or '',
+            it.get("sexo", "(todas)") or '', it["total"],
+            round(mediana / 60, 1) if mediana is not None else ''
+        ])
+    return output.getvalue().encode("utf-8"), "text/csv", f"atencion_por_usuario_{sello_export()}.csv"
+
+
+# tipo -> (generador, necesita openpyxl)
+EXPORTADORES = {
+    "csv":              (generar_csv_recibidos, False),
+    "reporte-atencion": (generar_csv_reporte_atencion, False),
+    "excel":            (generar_excel_recibidos, True),
+    "excel-pendientes": (generar_excel_pendientes, True),
+}
+
+
+def exportar(tipo, progreso):
+    # La versión se lee antes que los datos: si algo cambia en medio, el snapshot
+    # queda con una versión vieja y la próxima vez se vuelve a comprobar
+    version = etag_recursos("postulantes")
+    if version:
+        previo = leer_archivo_export(tipo, version)
+        if previo:
+            return previo
+
+    generador, _ = EXPORTADORES[tipo]
+    contenido, mimetype, nombre = generador(progreso, version)
+    if version:
+        guardar_archivo_export(tipo, version, contenido, mimetype, nombre)
+    return contenido, mimetype, nombre
+
+
+def ruta_archivo_export(tipo, version, ext):
+    digest = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(EXPORT_DIR, f"cache-{tipo}-{digest}.{ext}")
+
+
+def leer_archivo_export(tipo, version):
+    # El .json se escribe después del .bin: si existe, el archivo está completo
+    try:
+        with open(ruta_archivo_export(tipo, version, "json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(ruta_archivo_export(tipo, version, "bin"), "rb") as f:
+            contenido = f.read()
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != version:
+        return None
+    return contenido, meta["mimetype"], meta["nombre"]
+
+
+def guardar_archivo_export(tipo, version, contenido, mimetype, nombre):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    meta = json.dumps({"version": version, "mimetype": mimetype, "nombre": nombre}).encode("utf-8")
+    sufijo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    for ext, datos in (("bin", contenido), ("json", meta)):
+        destino = ruta_archivo_export(tipo, version, ext)
+        with open(destino + sufijo, "wb") as f:
+            f.write(datos)
+        os.replace(destino + sufijo, destino)
+    # Las versiones anteriores de este tipo ya no se van a pedir
+    actuales = {os.path.basename(ruta_archivo_export(tipo, version, ext)) for ext in ("bin", "json")}
+    anteriores = re.compile(rf"^cache-{re.escape(tipo)}-[0-9a-f]{{16}}\.(bin|json)$")
+    for nombre_archivo in os.listdir(EXPORT_DIR):
+        if anteriores.match(nombre_archivo) and nombre_archivo not in actuales:
+            try:
+                os.remove(os.path.join(EXPORT_DIR, nombre_archivo))
+            except OSError:
+                pass
+
+
+def openpyxl_disponible():
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ===============================
+# EXPORTACIONES EN SEGUNDO PLANO
+# ===============================
+# Los archivos se generan en un pool acotado de hilos, fuera del hilo de la petición:
+# con un solo worker síncrono un Excel grande ya no congela el polling del resto.
+# El resultado queda en EXPORT_DIR hasta EXPORT_TTL_SEG; junto al archivo se guarda
+# un .json con sus datos para que cualquier worker del mismo host pueda servirlo.
+# Pedidos idénticos (mismo tipo y misma versión de postulantes) comparten un trabajo.
+EXPORT_DIR = os.getenv("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "cas-exportaciones")
+EXPORT_TTL_SEG = int(os.getenv("EXPORT_TTL_SEG", str(30 * 60)))
+EXPORT_HILOS = int(os.getenv("EXPORT_HILOS", "2"))
+EXPORT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,32}$")
+_export_pool = ThreadPoolExecutor(max_workers=EXPORT_HILOS, thread_name_prefix="exportacion")
+_exportaciones = {}
+_export_claves = {}
+_export_lock = threading.Lock()
+
+
+def ruta_exportacion(export_id, ext):
+    return os.path.join(EXPORT_DIR, f"{export_id}.{ext}")
+
+
+def estado_exportacion(trabajo):
+    datos = {k: trabajo.get(k) for k in ("id", "tipo", "estado", "progreso", "error", "nombre", "creado")}
+    if trabajo["estado"] == "listo":
+        datos["descarga"] = f"/api/exportaciones/{trabajo['id']}/descarga"
+    return datos
+
+
+def leer_exportacion(export_id):
+    with _export_lock:
+        trabajo = _exportaciones.get(export_id)
+        if trabajo:
+            return dict(trabajo)
+    # Terminada en otro worker: se lee el .json que dejó junto al archivo
+    try:
+        with open(ruta_exportacion(export_id, "json"), encoding="utf-8") as f:
+            trabajo = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() > trabajo.get("expira", 0):
+        return None
+    return trabajo
+
+
+def purgar_exportaciones():
+    ahora = time.time()
+    with _export_lock:
+        vencidos = [i for i, t in _exportaciones.items()
+                    if t["estado"] in ("listo", "error") and t["expira"] < ahora]
+        for i in vencidos:
+            t = _exportaciones.pop(i)
+            if _export_claves.get(t["clave"]) == i:
+                _export_claves.pop(t["clave"], None)
+    try:
+        nombres = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    for nombre in nombres:
+        ruta = os.path.join(EXPORT_DIR, nombre)
+        try:
+            if os.path.getmtime(ruta) + EXPORT_TTL_SEG < ahora:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def ejecutar_exportacion(export_id):
+    with _export_lock:
+        trabajo = _exportaciones[export_id]
+        trabajo["estado"] = "procesando"
+    def progreso(hechas, total):
+        # El 10% final queda para estilos y guardado del archivo
+        with _export_lock:
+            trabajo["progreso"] = int(90 * hechas / total) if total else 90
+
+    try:
+        with leer_de_replica(trabajo["replica"] and replica_disponible()):
+            contenido, mimetype, nombre = exportar(trabajo["tipo"], progreso)
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp = ruta_exportacion(export_id, "tmp")
+        with open(tmp, "wb") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta_exportacion(export_id, "bin"))
+        with _export_lock:
+            trabajo.update(estado="listo", progreso=100, nombre=nombre, mimetype=mimetype,
+                           expira=time.time() + EXPORT_TTL_SEG)
+            meta = dict(trabajo)
+        with open(ruta_exportacion(export_id, "json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except Exception as e:
+        log_evento(logging.ERROR, "exportacion_fallida", f"Exportación {export_id} falló: {e}", exc_info=True,
+                   export_id=export_id)
+        with _export_lock:
+            trabajo.update(estado="error", error=str(e), expira=time.time() + EXPORT_TTL_SEG)
+
+
+def iniciar_exportacion(tipo, usuario):
+    purgar_exportaciones()
+    clave = f"{tipo}:{etag_recursos('postulantes')}"
+    with _export_lock:
+        previo = _exportaciones.get(_export_claves.get(clave))
+        if previo and previo["estado"] != "error" and time.time() < previo["expira"]:
+            return previo, True
+        export_id = secrets.token_urlsafe(16)
+        trabajo = {
+            "id": export_id, "tipo": tipo, "clave": clave, "usuario": usuario,
+            "estado": "pendiente", "progreso": 0, "error": None, "nombre": None,
+            "mimetype": None, "creado": now_peru(),
+            # Se decide en la petición (atraso y escrituras de la sesión) y se revalida al correr
+            "replica": getattr(_ruta_lectura, "replica", False),
+            # Mientras corre no vence; al terminar se fija la expiración real
+            "expira": float("inf"),
+        }
+        _exportaciones[export_id] = trabajo
+        _export_claves[clave] = export_id
+    _export_pool.submit(ejecutar_exportacion, export_id)
+    return trabajo, False
+
+
+@app.post("/api/exportaciones")
+@solo_lectura
+def crear_exportacion():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json(silent=True) or {}
+    tipo = data.get("tipo")
+    if tipo not in EXPORTADORES:
+        return jsonify({"ok": False, "error": "Tipo de exportación inválido"}), 400
+    if EXPORTADORES[tipo][1] and not openpyxl_disponible():
+        return jsonify({"ok": False, "error": "openpyxl no está instalado"}), 500
+
+    trabajo, reutilizado = iniciar_exportacion(tipo, session.get("usuario"))
+    with _export_lock:
+        datos = estado_exportacion(trabajo)
+    return jsonify({"ok": True, "reutilizado": reutilizado, **datos}), 202
+
+
+@app.get("/api/exportaciones/<export_id>")
+def ver_exportacion(export_id):
+    err = require_rol("admin")
+    if err: return err
+
+    trabajo = leer_exportacion(export_id) if EXPORT_ID_RE.match(export_id) else None
+    if not trabajo:
+        return jsonify({"ok": False, "error": "Exportación no encontrada o vencida"}), 404
+    return jsonify({"ok": True, **estado_exportacion(trabajo)})
+
+
+@app.get("/api/exportaciones/<export_id>/descarga")
+def descargar_exportacion(export_id):
+    if not sesion_activa("admin"):
+        return redirect("/login")
+
+    trabajo = leer_exportacion(export_id) if EXPORT_ID_RE.match(export_id) else None
+    if not trabajo or trabajo["estado"] != "listo":
+        return jsonify({"ok": False, "error": "Exportación no disponible"}), 404
+    try:
+        return send_file(ruta_exportacion(export_id, "bin"), mimetype=trabajo["mimetype"],
+                         as_attachment=True, download_name=trabajo["nombre"])
+    except FileNotFoundError:
+        return jsonify({"ok": False, "error": "Exportación vencida"}), 404
+
+
+# Descarga directa (síncrona) que se mantiene para enlaces y scripts existentes
+@app.get("/admin/export/<tipo>")
+@solo_lectura
+def export_directo(tipo):
+    if not sesion_activa("admin"):
+        return redirect("/login")
+    if tipo not in EXPORTADORES:
+        return jsonify({"ok": False, "error": "Tipo de exportación inválido"}), 404
+    if EXPORTADORES[tipo][1] and not openpyxl_disponible():
+        return jsonify({"ok": False, "error": "openpyxl no está instalado"}), 500
+
+    contenido, mimetype, nombre = exportar(tipo, lambda hechas, total: None)
+    return Response(contenido, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={nombre}"})
 
 
 # ===============================
-# CONVOCATORIA — abrir / cerrar
+# CONVOCATORIA — abrir / cerrar (campaña vigente más reciente)
 # ===============================
 @app.get("/api/convocatoria/estado")
 def get_estado_convocatoria():
+    etag = etag_recursos("campanas")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT valor FROM configuracion WHERE clave = 'convocatoria_activa'")
-                row = cur.fetchone()
-                activa = (row['valor'] == 'true') if row else True
-        return jsonify({"ok": True, "activa": activa})
+                campana = campana_abierta(cur)
+        return con_etag(jsonify({
+            "ok": True,
+            "activa": campana is not None,
+            "campana": campana["nombre"] if campana else None,
+        }), etag)
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1302,27 +3929,449 @@ def set_estado_convocatoria():
 
     data = request.get_json(silent=True) or {}
     activa = data.get("activa", True)
-    valor = 'true' if activa else 'false'
 
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO configuracion (clave, valor) VALUES ('convocatoria_activa', %s)
-                    ON CONFLICT (clave) DO UPDATE SET valor = EXCLUDED.valor
-                """, (valor,))
+                    UPDATE campanas SET abierta = %s
+                    WHERE id = (SELECT MAX(id) FROM campanas WHERE vigente = 1)
+                    RETURNING nombre
+                """, (1 if activa else 0,))
+                row = cur.fetchone()
                 conn.commit()
+        _campana_cache["ts"] = 0.0
+        if not row:
+            return jsonify({"ok": False, "error": "No hay una campaña vigente"}), 409
         accion = "Abrió la convocatoria" if activa else "Cerró la convocatoria"
-        registrar_log(session.get("usuario", "admin"), accion)
+        registrar_log(session.get("usuario", "admin"), f"{accion} {row['nombre']}")
         return jsonify({"ok": True, "activa": activa})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+# ===============================
+# CAMPAÑAS — alta, apertura y finalización
+# ===============================
+@app.get("/api/campanas")
+@solo_lectura
+def listar_campanas():
+    err = require_rol("admin")
+    if err: return err
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                # Solo las particiones adjuntas aportan conteos; las finalizadas quedan fuera
+                cur.execute("""
+                    SELECT c.id, c.nombre, c.abierta, c.vigente, c.archivada, c.created_at, c.cerrada_at,
+                           COALESCE(t.total, 0) AS total,
+                           COALESCE(t.pendientes, 0) AS pendientes
+                    FROM campanas c
+                    LEFT JOIN (
+                        SELECT campana_id, COUNT(*) AS total,
+                               COUNT(*) FILTER (WHERE usuario_atendio IS NULL) AS pendientes
+                        FROM postulantes GROUP BY campana_id
+                    ) t ON t.campana_id = c.id
+                    ORDER BY c.id DESC
+                """)
+                campanas = cur.fetchall()
+        return jsonify({"ok": True, "campanas": campanas})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/campanas")
+def crear_campana():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json(silent=True) or {}
+    nombre = (data.get("nombre") or "").strip()
+    abierta = 1 if data.get("abierta") else 0
+    if not nombre:
+        return jsonify({"ok": False, "error": "El nombre de la campaña es obligatorio"}), 400
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO campanas (nombre, abierta, vigente, created_at)
+                    VALUES (%s, %s, 1, %s)
+                    ON CONFLICT (nombre) DO NOTHING
+                    RETURNING id
+                """, (nombre, abierta, now_peru()))
+                row = cur.fetchone()
+                if not row:
+                    conn.rollback()
+                    return jsonify({"ok": False, "error": "Ya existe una campaña con ese nombre"}), 409
+                crear_particion(cur, row["id"])
+                conn.commit()
+        _campana_cache["ts"] = 0.0
+        registrar_log(session.get("usuario", "admin"), f"Creó la campaña {nombre}")
+        return jsonify({"ok": True, "id": row["id"]})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/campanas/<int:campana_id>/estado")
+def estado_campana(campana_id):
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json(silent=True) or {}
+    abierta = 1 if data.get("abierta") else 0
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE campanas SET abierta = %s
+                    WHERE id = %s AND vigente = 1
+                    RETURNING nombre
+                """, (abierta, campana_id))
+                row = cur.fetchone()
+                conn.commit()
+        _campana_cache["ts"] = 0.0
+        if not row:
+            return jsonify({"ok": False, "error": "Campaña no encontrada o finalizada"}), 404
+        accion = "Abrió" if abierta else "Cerró"
+        registrar_log(session.get("usuario", "admin"), f"{accion} la campaña {row['nombre']}")
+        return jsonify({"ok": True, "abierta": bool(abierta)})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/campanas/<int:campana_id>/finalizar")
+def finalizar_campana(campana_id):
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json(silent=True) or {}
+    forzar = bool(data.get("forzar"))
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT nombre, vigente FROM campanas WHERE id = %s FOR UPDATE", (campana_id,))
+                campana = cur.fetchone()
+                if not campana or not campana["vigente"]:
+                    conn.rollback()
+                    return jsonify({"ok": False, "error": "Campaña no encontrada o ya finalizada"}), 404
+
+                cur.execute("""
+                    SELECT COUNT(*) AS n FROM postulantes
+                    WHERE campana_id = %s AND usuario_atendio IS NULL
+                """, (campana_id,))
+                pendientes = cur.fetchone()["n"]
+                if pendientes and not forzar:
+                    conn.rollback()
+                    return jsonify({"ok": False, "pendientes": pendientes,
+                                    "error": f"La campaña tiene {pendientes} postulantes sin recibir"}), 409
+
+                # La partición deja de formar parte de postulantes: las consultas diarias ya no la recorren
+                cur.execute(f"ALTER TABLE postulantes DETACH PARTITION {nombre_particion(campana_id)}")
+                avisar_recarga_indice(cur)
+                # DETACH no dispara los triggers de versión: los ETag de postulantes deben invalidarse igual
+                cur.execute("INSERT INTO versiones_cambios (recurso) VALUES ('postulantes')")
+                cur.execute("""
+                    UPDATE campanas SET abierta = 0, vigente = 0, cerrada_at = %s
+                    WHERE id = %s
+                """, (now_peru(), campana_id))
+                conn.commit()
+        _campana_cache["ts"] = 0.0
+        registrar_log(session.get("usuario", "admin"), f"Finalizó la campaña {campana['nombre']}")
+        return jsonify({"ok": True})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# ===============================
+# ARCHIVO FRÍO — campañas finalizadas fuera de PostgreSQL
+# ===============================
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR", os.path.join(BASE_DIR, "archivo"))
+ARCHIVO_FILAS_POR_BLOQUE = 5000
+ARCHIVO_COLUMNAS = COLUMNAS_POSTULANTES + ("campana_id",)
+ARCHIVO_COLUMNAS_LOG = ("id", "fecha", "usuario", "accion", "campana_id")
+# Días tras la finalización para archivar una campaña automáticamente (0 = solo a mano)
+ARCHIVO_AUTOMATICO_DIAS = int(os.getenv("ARCHIVO_AUTOMATICO_DIAS", "0"))
+ARCHIVO_AUTOMATICO_SEG = 6 * 60 * 60
+
+
+def carpeta_archivo(campana_id):
+    return os.path.join(ARCHIVO_DIR, f"campana_{int(campana_id)}")
+
+
+def leer_indice_archivo(campana_id):
+    ruta = os.path.join(carpeta_archivo(campana_id), "indice.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def escribir_bloque(ruta, columnas, filas):
+    # Primera línea: columnas; luego una lista por fila (sin repetir claves).
+    # Las filas son tuplas con los valores en el orden de `columnas`.
+    with gzip.open(ruta, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(list(columnas), ensure_ascii=False) + "\n")
+        for fila in filas:
+            f.write(json.dumps(list(fila), ensure_ascii=False) + "\n")
+
+
+def leer_bloque(ruta):
+    with gzip.open(ruta, "rt", encoding="utf-8") as f:
+        columnas = json.loads(next(f))
+        for linea in f:
+            yield dict(zip(columnas, json.loads(linea)))
+
+
+def archivar_campana(conn, campana_id):
+    tabla = nombre_particion(campana_id)
+    carpeta = carpeta_archivo(campana_id)
+    temporal = carpeta + ".tmp"
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM campanas WHERE id = %s FOR UPDATE", (campana_id,))
+        campana = cur.fetchone()
+        if not campana:
+            raise ValueError("Campaña no encontrada")
+        if campana["vigente"]:
+            raise ValueError("Solo se archivan campañas finalizadas")
+        if campana["archivada"]:
+            raise ValueError("La campaña ya está archivada")
+        cur.execute(f"LOCK TABLE {tabla} IN ACCESS EXCLUSIVE MODE")
+
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    # Cursor de servidor: la campaña se recorre por bloques sin cargarla completa en memoria
+    bloques = []
+    with conn.cursor(name=f"archivo_c{int(campana_id)}", cursor_factory=NamedTupleCursor) as origen:
+        origen.itersize = ARCHIVO_FILAS_POR_BLOQUE
+        # Orden por bytes (COLLATE "C"), el mismo que usa Python al comparar doc_min/doc_max
+        origen.execute(f"""
+            SELECT {', '.join(ARCHIVO_COLUMNAS)} FROM {tabla}
+            ORDER BY numero_documento COLLATE "C", id
+        """)
+        while True:
+            filas = origen.fetchmany(ARCHIVO_FILAS_POR_BLOQUE)
+            if not filas:
+                break
+            nombre = f"postulantes-{len(bloques):04d}.jsonl.gz"
+            escribir_bloque(os.path.join(temporal, nombre), ARCHIVO_COLUMNAS, filas)
+            bloques.append({
+                "archivo": nombre,
+                "filas": len(filas),
+                "doc_min": filas[0].numero_documento,
+                "doc_max": filas[-1].numero_documento,
+                "areas": sorted({f.area or "" for f in filas}),
+            })
+
+    # Solo los logs marcados con esta campaña; los anteriores a logs.campana_id (NULL) se quedan
+    with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+        cur.execute(f"""
+            SELECT {', '.join(ARCHIVO_COLUMNAS_LOG)} FROM logs
+            WHERE campana_id = %s
+            ORDER BY id
+        """, (campana_id,))
+        logs = cur.fetchall()
+    escribir_bloque(os.path.join(temporal, "logs.jsonl.gz"), ARCHIVO_COLUMNAS_LOG, logs)
+
+    indice = {
+        "campana": {k: campana[k] for k in ("id", "nombre", "created_at", "cerrada_at")},
+        "archivado_at": now_peru(),
+        "columnas": list(ARCHIVO_COLUMNAS),
+        "total": sum(b["filas"] for b in bloques),
+        "logs": len(logs),
+        "bloques": bloques,
+    }
+    with open(os.path.join(temporal, "indice.json"), "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(carpeta, ignore_errors=True)
+    os.replace(temporal, carpeta)
+
+    # Los archivos ya están completos: recién ahora se libera el espacio en la base
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE {tabla}")
+        if logs:
+            cur.execute("DELETE FROM logs WHERE id = ANY(%s)", ([l.id for l in logs],))
+        cur.execute("UPDATE campanas SET archivada = 1 WHERE id = %s", (campana_id,))
+    conn.commit()
+    return indice
+
+
+def archivar_campanas_vencidas(conn):
+    limite = (datetime.now(TIMEZONE) - timedelta(days=ARCHIVO_AUTOMATICO_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id FROM campanas
+            WHERE vigente = 0 AND archivada = 0 AND cerrada_at < %s
+            ORDER BY id
+        """, (limite,))
+        ids = [r["id"] for r in cur.fetchall()]
+    conn.commit()
+    archivadas = []
+    for campana_id in ids:
+        indice = archivar_campana(conn, campana_id)
+        archivadas.append({"campana": campana_id, "total": indice["total"]})
+    return {"archivadas": archivadas}
+
+
+def restaurar_campana(conn, campana_id, adjuntar=False):
+    indice = leer_indice_archivo(campana_id)
+    if not indice:
+        raise ValueError("No existe archivo para esta campaña")
+    tabla = nombre_particion(campana_id)
+    carpeta = carpeta_archivo(campana_id)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT archivada FROM campanas WHERE id = %s FOR UPDATE", (campana_id,))
+        campana = cur.fetchone()
+        if not campana or not campana["archivada"]:
+            raise ValueError("La campaña no está archivada")
+
+        cur.execute(f"CREATE TABLE {tabla} (LIKE postulantes INCLUDING DEFAULTS)")
+        cur.execute(f"ALTER TABLE {tabla} ADD PRIMARY KEY (id, campana_id)")
+        # Columnas agregadas después del archivado quedan con su valor por defecto
+        columnas = ", ".join(indice["columnas"])
+        marcadores = ", ".join(["%s"] * len(indice["columnas"]))
+        for bloque in indice["bloques"]:
+            filas = [tuple(f[c] for c in indice["columnas"])
+                     for f in leer_bloque(os.path.join(carpeta, bloque["archivo"]))]
+            cur.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})", filas)
+
+        # Archivos previos a logs.campana_id no traen la columna: sus logs son de esta campaña
+        logs = [tuple(l.get(c, campana_id) for c in ARCHIVO_COLUMNAS_LOG)
+                for l in leer_bloque(os.path.join(carpeta, "logs.jsonl.gz"))]
+        cur.executemany("""
+            INSERT INTO logs (id, fecha, usuario, accion, campana_id) VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (id) DO NOTHING
+        """, logs)
+
+        if adjuntar:
+            cur.execute(f"ALTER TABLE postulantes ATTACH PARTITION {tabla} FOR VALUES IN ({int(campana_id)})")
+            avisar_recarga_indice(cur)
+            cur.execute("UPDATE campanas SET archivada = 0, vigente = 1 WHERE id = %s", (campana_id,))
+            cur.execute("INSERT INTO versiones_cambios (recurso) VALUES ('postulantes')")
+        else:
+            cur.execute("UPDATE campanas SET archivada = 0 WHERE id = %s", (campana_id,))
+    conn.commit()
+    shutil.rmtree(carpeta, ignore_errors=True)
+    return indice["total"]
+
+
+def buscar_en_archivo(campana_id, documento=None, texto=None, area=None, limite=None):
+    indice = leer_indice_archivo(campana_id)
+    if not indice:
+        return
+    carpeta = carpeta_archivo(campana_id)
+    texto = (texto or "").upper()
+    encontrados = 0
+    for bloque in indice["bloques"]:
+        # Los bloques están ordenados por documento: se descartan sin abrirlos
+        if documento and not (bloque["doc_min"] <= documento <= bloque["doc_max"]):
+            continue
+        if area and area not in bloque["areas"]:
+            continue
+        for fila in leer_bloque(os.path.join(carpeta, bloque["archivo"])):
+            if documento and fila["numero_documento"] != documento:
+                continue
+            if area and fila["area"] != area:
+                continue
+            if texto and texto not in f"{fila['apellidos']} {fila['nombres']}".upper():
+                continue
+            yield fila
+            encontrados += 1
+            if limite and encontrados >= limite:
+                return
+
+
+@app.get("/api/archivo/<int:campana_id>/buscar")
+def api_buscar_archivo(campana_id):
+    err = require_rol("admin")
+    if err: return err
+
+    indice = leer_indice_archivo(campana_id)
+    if not indice:
+        return jsonify({"ok": False, "error": "Campaña no archivada"}), 404
+    try:
+        limite = min(max(int(request.args.get("limite", 100)), 1), 1000)
+    except ValueError:
+        return jsonify({"ok": False, "error": "limite inválido"}), 400
+
+    postulantes = list(buscar_en_archivo(
+        campana_id,
+        documento=(request.args.get("documento") or "").strip() or None,
+        texto=(request.args.get("q") or "").strip() or None,
+        area=(request.args.get("area") or "").strip() or None,
+        limite=limite,
+    ))
+    return jsonify({"ok": True, "campana": indice["campana"], "total": indice["total"],
+                    "postulantes": postulantes})
+
+
+@app.get("/admin/export/archivo/<int:campana_id>")
+def export_archivo_csv(campana_id):
+    err = require_rol("admin")
+    if err: return err
+
+    indice = leer_indice_archivo(campana_id)
+    if not indice:
+        return jsonify({"ok": False, "error": "Campaña no archivada"}), 404
+
+    import csv
+    from io import StringIO
+
+    def generar():
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(indice["columnas"])
+        for fila in buscar_en_archivo(campana_id, area=(request.args.get("area") or None)):
+            writer.writerow(["" if fila[c] is None else fila[c] for c in indice["columnas"]])
+            if output.tell() > 64 * 1024:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+
+    _conteo.stream = True
+    return Response(
+        stream_with_context(generar()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=campana_{campana_id}_archivo.csv"}
+    )
+
+
+@app.cli.command("archivar-campana")
+@click.argument("campana_id", type=int)
+def archivar_campana_cmd(campana_id):
+    with PooledConn() as conn:
+        indice = archivar_campana(conn, campana_id)
+    print(f"✅ Campaña {campana_id} archivada: {indice['total']} postulantes, "
+          f"{len(indice['bloques'])} bloques en {carpeta_archivo(campana_id)}")
+
+
+@app.cli.command("restaurar-campana")
+@click.argument("campana_id", type=int)
+@click.option("--adjuntar", is_flag=True, help="Vuelve a adjuntar la partición como campaña vigente")
+def restaurar_campana_cmd(campana_id, adjuntar):
+    with PooledConn() as conn:
+        total = restaurar_campana(conn, campana_id, adjuntar)
+    print(f"✅ Campaña {campana_id} restaurada: {total} postulantes")
+
+
 # ===============================
 # HEARTBEAT — usuarios conectados
 # ===============================
 @app.post("/api/heartbeat")
+@con_plazo(1000, descartable=True, poll_ms=30000)
 def heartbeat():
     err = require_rol("admin", "usuario")
     if err: return err
@@ -1341,45 +4390,786 @@ def heartbeat():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+USUARIOS_ACTIVOS_TRAMO_SEG = 10
+# El panel muestra latidos de los últimos 90 s; los de hace más de PRESENCIA_RETENCION_SEG se borran
+PRESENCIA_RETENCION_SEG = 10 * 60
+PRESENCIA_LIMPIEZA_SEG = int(os.getenv("PRESENCIA_LIMPIEZA_SEG", "60"))
+
+
+def limpiar_presencia(conn):
+    limite = (datetime.now(TIMEZONE) - timedelta(seconds=PRESENCIA_RETENCION_SEG)).strftime("%Y-%m-%d %H:%M:%S")
+    with conn.cursor() as cur:
+        # El trigger de versión es por sentencia: un DELETE vacío también invalidaría los ETag
+        cur.execute("SELECT 1 FROM sesiones_activas WHERE ultimo_latido < %s LIMIT 1", (limite,))
+        if not cur.fetchone():
+            conn.commit()
+            return {"eliminadas": 0}
+        cur.execute("DELETE FROM sesiones_activas WHERE ultimo_latido < %s", (limite,))
+        eliminadas = cur.rowcount
+    conn.commit()
+    return {"eliminadas": eliminadas}
+
+
+def leer_usuarios_activos(cur):
+    cur.execute("""
+        SELECT s.username, s.ultimo_latido, u.rol
+        FROM sesiones_activas s
+        JOIN usuarios u ON u.username = s.username
+        WHERE u.activo = 1
+        ORDER BY s.ultimo_latido DESC
+    """)
+    rows = cur.fetchall()
+
+    ahora = datetime.now(TIMEZONE)
+    activos = []
+    for r in rows:
+        try:
+            ultimo = datetime.strptime(r['ultimo_latido'], "%Y-%m-%d %H:%M:%S")
+            ultimo = TIMEZONE.localize(ultimo)
+            segundos = (ahora - ultimo).total_seconds()
+            if segundos <= 90:
+                activos.append({
+                    "username": r['username'],
+                    "rol": r['rol'],
+                    "ultimo_latido": r['ultimo_latido'],
+                    "segundos_inactivo": int(segundos)
+                })
+        except Exception:
+            pass
+    return activos
+
+
 @app.get("/api/usuarios-activos")
+@solo_lectura
+@con_plazo(1000, descartable=True, poll_ms=10000)
 def usuarios_activos():
     err = require_rol("admin")
     if err: return err
 
+    # segundos_inactivo avanza con el reloj: el ETag cambia al menos cada USUARIOS_ACTIVOS_TRAMO_SEG
+    tramo = int(time.time() // USUARIOS_ACTIVOS_TRAMO_SEG)
+    etag = etag_recursos("sesiones_activas", "usuarios", extra=f"-{tramo}")
+    sin_cambios = no_modificado(etag)
+    if sin_cambios: return sin_cambios
+
     try:
         with PooledConn() as conn:
             with conn.cursor() as cur:
+                activos = leer_usuarios_activos(cur)
+
+        return con_etag(jsonify({"ok": True, "activos": activos}), etag)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# ===============================
+# PANEL ADMIN — snapshot único para el polling
+# ===============================
+# Junta en una respuesta lo que el panel pedía por separado (pendientes nuevos, recibidos
+# nuevos, estadísticas, usuarios conectados y estado de la convocatoria): una conexión y una
+# transacción REPEATABLE READ de solo lectura, así todas las partes salen del mismo instante.
+#   since           -> id del último pendiente que tiene el panel
+#   atendidos_desde -> fecha_atencion más reciente que tiene el panel. Por fecha y no por id:
+#                      se recibe en cualquier orden. La fecha se asigna antes del commit, así
+#                      que una recepción lenta puede confirmarse con una fecha anterior al
+#                      cursor: se vuelve a pedir SNAPSHOT_MARGEN_SEG hacia atrás y el cliente
+#                      descarta los repetidos por id.
+SNAPSHOT_RECURSOS = ("postulantes", "sesiones_activas", "usuarios", "campanas")
+# Holgura sobre el plazo de /api/recibir-postulante (espera del pool + sentencia + commit)
+SNAPSHOT_MARGEN_SEG = 30
+FECHA_ATENCION_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+
+
+@app.get("/api/admin/snapshot")
+@solo_lectura
+@con_plazo(3000, descartable=True, poll_ms=3000)
+def admin_snapshot():
+    err = require_rol("admin")
+    if err: return err
+
+    since = request.args.get("since", 0, type=int)
+    atendidos_desde = request.args.get("atendidos_desde", "")
+    desde_consulta = ""
+    if atendidos_desde:
+        try:
+            if not FECHA_ATENCION_RE.match(atendidos_desde):
+                raise ValueError
+            desde_consulta = (datetime.strptime(atendidos_desde, "%Y-%m-%d %H:%M:%S")
+                              - timedelta(seconds=SNAPSHOT_MARGEN_SEG)).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return jsonify({"ok": False, "error": "atendidos_desde inválido"}), 400
+
+    # segundos_inactivo avanza con el reloj, igual que en /api/usuarios-activos
+    tramo = int(time.time() // USUARIOS_ACTIVOS_TRAMO_SEG)
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cur.execute(VERSION_SQL, {"recursos": list(SNAPSHOT_RECURSOS)})
+                etag = (f"snapshot-{cur.fetchone()['v']}-{tramo}-{since}-"
+                        f"{atendidos_desde.replace(' ', 'T')}")
+                sin_cambios = no_modificado(etag)
+                if sin_cambios: return sin_cambios
+
                 cur.execute("""
-                    SELECT s.username, s.ultimo_latido, u.rol
-                    FROM sesiones_activas s
-                    JOIN usuarios u ON u.username = s.username
-                    WHERE u.activo = 1
-                    ORDER BY s.ultimo_latido DESC
-                """)
-                rows = cur.fetchall()
+                    SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+                           numero_documento, fecha_nacimiento, sexo, celular, correo,
+                           fuerzas_armadas, tiene_discapacidad, tipo_discapacidad, created_at
+                    FROM postulantes
+                    WHERE id > %s AND usuario_atendio IS NULL
+                    ORDER BY id
+                """, (since,))
+                pendientes = cur.fetchall()
+
+                cur.execute("""
+                    SELECT id, area, convocatoria, apellidos, nombres, tipo_documento,
+                           numero_documento, fecha_nacimiento, sexo, celular, correo,
+                           fuerzas_armadas, tiene_discapacidad, tipo_discapacidad,
+                           created_at, usuario_atendio, fecha_atencion
+                    FROM postulantes
+                    WHERE usuario_atendio IS NOT NULL AND fecha_atencion >= %s
+                    ORDER BY fecha_atencion, id
+                """, (desde_consulta,))
+                atendidos = cur.fetchall()
+
+                estadisticas = leer_estadisticas(cur)
+                activos = leer_usuarios_activos(cur)
+                campana = campana_abierta(cur)
+
+        return con_etag(jsonify({
+            "ok": True,
+            "since": max([since] + [p["id"] for p in pendientes]),
+            "atendidos_desde": max([atendidos_desde] + [a["fecha_atencion"] for a in atendidos]),
+            "pendientes": pendientes,
+            "atendidos": atendidos,
+            "estadisticas": estadisticas,
+            "activos": activos,
+            "convocatoria": {"activa": campana is not None, "campana": campana["nombre"] if campana else None},
+        }), etag)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+# ===============================
+# DUPLICADOS — detección difusa en segundo plano
+# ===============================
+# idx_documento_unico solo ve documentos idénticos. Este trabajo busca a la misma persona
+# registrada con un DNI mal tipeado o con DNI y CE. Para no comparar todos contra todos,
+# cada postulante cae en bloques (primer apellido + nacimiento, correo, celular) y solo se
+# comparan pares del mismo bloque y campaña. Los pares se puntúan por similitud de trigramas
+# (como pg_trgm, calculada aquí para no depender de la extensión) y los que pasan
+# DEDUP_UMBRAL quedan en duplicados_sospechosos para que un admin los revise.
+# Las claves de bloque se guardan en duplicados_claves: cada corrida solo las calcula para
+# los postulantes nuevos desde la anterior y los que un trigger encoló en
+# duplicados_pendientes (editados o eliminados), y solo compara esos contra los bloques
+# donde caen.
+DEDUP_INTERVALO_SEG = int(os.getenv("DEDUP_INTERVALO_SEG", "600"))
+DEDUP_UMBRAL = 0.7
+# Bloques más grandes (un celular o correo de relleno compartido) no se comparan
+DEDUP_BLOQUE_MAX = 50
+# Ids que se vuelven a mirar por debajo del último procesado: un INSERT con id menor
+# puede confirmarse después de que la corrida anterior leyó uno mayor
+DEDUP_MARGEN_IDS = 500
+DEDUP_ESTADOS = ("pendiente", "confirmado", "descartado")
+
+
+def init_duplicados():
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS duplicados_sospechosos (
+              id SERIAL PRIMARY KEY,
+              id_a INTEGER NOT NULL,
+              id_b INTEGER NOT NULL,
+              campana_id INTEGER NOT NULL,
+              puntaje REAL NOT NULL,
+              similitud_nombre REAL NOT NULL,
+              similitud_documento REAL NOT NULL,
+              bloques TEXT NOT NULL,
+              estado TEXT NOT NULL DEFAULT 'pendiente',
+              detectado_at TEXT NOT NULL,
+              revisado_por TEXT,
+              revisado_at TEXT,
+              UNIQUE (id_a, id_b)
+            );
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS duplicados_corridas (
+              id SERIAL PRIMARY KEY,
+              inicio TEXT NOT NULL,
+              fin TEXT NOT NULL,
+              hasta_id INTEGER NOT NULL,
+              pares INTEGER NOT NULL,
+              marcados INTEGER NOT NULL
+            );
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_duplicados_estado
+                ON duplicados_sospechosos(estado, puntaje DESC)
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS duplicados_claves (
+              postulante_id INTEGER NOT NULL,
+              campana_id INTEGER NOT NULL,
+              bloque TEXT NOT NULL,
+              clave TEXT NOT NULL,
+              PRIMARY KEY (postulante_id, bloque)
+            );
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_duplicados_claves_bloque
+                ON duplicados_claves(campana_id, bloque, clave)
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS duplicados_pendientes (
+              postulante_id INTEGER PRIMARY KEY
+            );
+            """)
+            # Un cambio de campaña mueve la fila de partición: llega como DELETE
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION encolar_duplicados() RETURNS trigger AS $$
+                BEGIN
+                  INSERT INTO duplicados_pendientes (postulante_id) VALUES (OLD.id)
+                  ON CONFLICT (postulante_id) DO NOTHING;
+                  RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            conn.commit()
+
+        ensure_trigger(conn, "postulantes", "trg_duplicados_pendientes", """
+            CREATE TRIGGER trg_duplicados_pendientes
+            AFTER DELETE OR UPDATE OF apellidos, fecha_nacimiento, correo, celular, campana_id ON postulantes
+            FOR EACH ROW EXECUTE FUNCTION encolar_duplicados()
+        """)
+
+
+def trigramas(texto):
+    # Igual que pg_trgm: palabras alfanuméricas en minúsculas, dos espacios antes y uno después
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    tri = set()
+    for palabra in re.findall(r"[^\W_]+", texto):
+        p = f"  {palabra} "
+        tri.update(p[i:i + 3] for i in range(len(p) - 2))
+    return tri
 
-        ahora = datetime.now(TIMEZONE)
-        activos = []
-        for r in rows:
+
+def similitud(a, b):
+    ta, tb = trigramas(a), trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def puntuar_par(par):
+    nombre = similitud(par["nombre_a"], par["nombre_b"])
+    documento = similitud(par["doc_a"], par["doc_b"])
+    # Decide el nombre: el DNI y el CE de una misma persona no se parecen en nada, y los
+    # familiares que comparten correo o celular difieren justo en los nombres de pila.
+    # Documento parecido (un dígito mal tipeado) y más bloques en común solo suman un poco.
+    puntaje = min(1.0, nombre + 0.15 * documento + 0.05 * (len(par["bloques"]) - 1))
+    return round(puntaje, 3), round(nombre, 3), round(documento, 3)
+
+
+def detectar_duplicados(conn, completo=False):
+    # Una corrida por vez entre todos los workers; si otra está en curso se omite
+    inicio = now_peru()
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('detectar_duplicados')) AS tomado")
+        if not cur.fetchone()["tomado"]:
+            conn.rollback()
+            return None
+
+        cur.execute("""
+            SELECT COALESCE(MAX(hasta_id), 0) AS hasta,
+                   EXISTS (SELECT 1 FROM duplicados_claves) AS hay_claves
+            FROM duplicados_corridas
+        """)
+        previa = cur.fetchone()
+        # Sin claves guardadas (primera corrida o tabla recién creada) se arma todo
+        completo = completo or not previa["hay_claves"]
+        desde = 0 if completo else max(0, previa["hasta"] - DEDUP_MARGEN_IDS)
+        cur.execute("SELECT COALESCE(MAX(id), 0) AS maximo FROM postulantes")
+        hasta_id = cur.fetchone()["maximo"]
+        if completo:
+            cur.execute("DELETE FROM duplicados_pendientes")
+            revisar = []
+        else:
+            cur.execute("DELETE FROM duplicados_pendientes RETURNING postulante_id")
+            revisar = [r["postulante_id"] for r in cur.fetchall()]
+        params = {"bloque_max": DEDUP_BLOQUE_MAX, "desde": desde, "revisar": revisar}
+
+        # Claves de los nuevos y de los encolados; un eliminado solo pierde las suyas
+        cur.execute("""
+            DELETE FROM duplicados_claves
+            WHERE postulante_id > %(desde)s OR postulante_id = ANY(%(revisar)s)
+        """, params)
+        cur.execute("""
+            WITH base AS (
+                SELECT id, campana_id,
+                       split_part(regexp_replace(translate(upper(trim(apellidos)), 'ÁÉÍÓÚÜÑ', 'AEIOUUN'),
+                                                 '[^A-Z ]', '', 'g'), ' ', 1) AS apellido,
+                       fecha_nacimiento,
+                       lower(trim(correo)) AS correo,
+                       right(regexp_replace(celular, '[^0-9]', '', 'g'), 9) AS celular
+                FROM postulantes
+                WHERE id > %(desde)s OR id = ANY(%(revisar)s)
+            )
+            INSERT INTO duplicados_claves (postulante_id, campana_id, bloque, clave)
+            SELECT id, campana_id, 'apellido_nacimiento', apellido || '|' || fecha_nacimiento
+            FROM base WHERE apellido <> '' AND fecha_nacimiento <> ''
+            UNION ALL
+            SELECT id, campana_id, 'correo', correo FROM base WHERE correo <> ''
+            UNION ALL
+            SELECT id, campana_id, 'celular', celular FROM base WHERE length(celular) >= 7
+        """, params)
+
+        # Solo los bloques donde cayó una clave recién calculada, por el índice de claves
+        cur.execute("""
+            WITH tocadas AS (
+                SELECT DISTINCT campana_id, bloque, clave FROM duplicados_claves
+                WHERE postulante_id > %(desde)s OR postulante_id = ANY(%(revisar)s)
+            ), bloques AS (
+                SELECT c.campana_id, c.bloque, array_agg(c.postulante_id ORDER BY c.postulante_id) AS ids
+                FROM tocadas t
+                JOIN duplicados_claves c USING (campana_id, bloque, clave)
+                GROUP BY c.campana_id, c.bloque, c.clave
+                HAVING COUNT(*) BETWEEN 2 AND %(bloque_max)s
+            ), pares AS (
+                -- Al menos uno de los dos es nuevo (el de id mayor) o fue editado
+                SELECT a.id AS id_a, b.id AS id_b, bl.campana_id,
+                       array_agg(DISTINCT bl.bloque) AS bloques
+                FROM bloques bl, unnest(bl.ids) AS a(id), unnest(bl.ids) AS b(id)
+                WHERE a.id < b.id
+                  AND (b.id > %(desde)s OR a.id = ANY(%(revisar)s) OR b.id = ANY(%(revisar)s))
+                GROUP BY a.id, b.id, bl.campana_id
+            )
+            SELECT p.id_a, p.id_b, p.campana_id, p.bloques,
+                   x.apellidos || ' ' || x.nombres AS nombre_a, y.apellidos || ' ' || y.nombres AS nombre_b,
+                   x.numero_documento AS doc_a, y.numero_documento AS doc_b
+            FROM pares p
+            JOIN postulantes x ON x.id = p.id_a AND x.campana_id = p.campana_id
+            JOIN postulantes y ON y.id = p.id_b AND y.campana_id = p.campana_id
+        """, params)
+        pares = cur.fetchall()
+
+        marcados = []
+        for par in pares:
+            puntaje, nombre, documento = puntuar_par(par)
+            if puntaje >= DEDUP_UMBRAL:
+                marcados.append((par["id_a"], par["id_b"], par["campana_id"], puntaje, nombre,
+                                 documento, ",".join(sorted(par["bloques"])), inicio))
+        # Los pares ya marcados (o revisados) en corridas anteriores no se repiten
+        nuevos = execute_values(cur, """
+            INSERT INTO duplicados_sospechosos
+              (id_a, id_b, campana_id, puntaje, similitud_nombre, similitud_documento, bloques, detectado_at)
+            VALUES %s
+            ON CONFLICT (id_a, id_b) DO NOTHING
+            RETURNING id
+        """, marcados, fetch=True) if marcados else []
+
+        cur.execute("""
+            INSERT INTO duplicados_corridas (inicio, fin, hasta_id, pares, marcados)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (inicio, now_peru(), hasta_id, len(pares), len(nuevos)))
+        conn.commit()
+    return {"desde": desde, "hasta_id": hasta_id, "revisados": len(revisar),
+            "pares": len(pares), "marcados": len(nuevos)}
+
+
+init_duplicados()
+
+
+@app.cli.command("detectar-duplicados")
+@click.option("--completo", is_flag=True, help="Vuelve a comparar todos los postulantes, no solo los nuevos")
+def detectar_duplicados_cmd(completo):
+    with PooledConn() as conn:
+        resultado = detectar_duplicados(conn, completo)
+    if resultado is None:
+        print("⏳ Ya hay una detección de duplicados en curso")
+        return
+    print(f"✅ Duplicados: {resultado['pares']} pares comparados, {resultado['marcados']} marcados "
+          f"(ids {resultado['desde'] + 1}–{resultado['hasta_id']})")
+
+
+@app.get("/api/duplicados")
+@solo_lectura
+def listar_duplicados():
+    err = require_rol("admin")
+    if err: return err
+
+    estado = request.args.get("estado", "pendiente")
+    if estado not in DEDUP_ESTADOS:
+        return jsonify({"ok": False, "error": f"Estado inválido ({', '.join(DEDUP_ESTADOS)})"}), 400
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                # Pares cuyo postulante ya fue eliminado desaparecen con el JOIN
+                cur.execute("""
+                    SELECT d.id, d.puntaje, d.similitud_nombre, d.similitud_documento, d.bloques,
+                           d.estado, d.detectado_at, d.revisado_por, d.revisado_at,
+                           json_build_object('id', a.id, 'apellidos', a.apellidos, 'nombres', a.nombres,
+                               'tipo_documento', a.tipo_documento, 'numero_documento', a.numero_documento,
+                               'fecha_nacimiento', a.fecha_nacimiento, 'correo', a.correo,
+                               'celular', a.celular, 'usuario_atendio', a.usuario_atendio) AS a,
+                           json_build_object('id', b.id, 'apellidos', b.apellidos, 'nombres', b.nombres,
+                               'tipo_documento', b.tipo_documento, 'numero_documento', b.numero_documento,
+                               'fecha_nacimiento', b.fecha_nacimiento, 'correo', b.correo,
+                               'celular', b.celular, 'usuario_atendio', b.usuario_atendio) AS b
+                    FROM duplicados_sospechosos d
+                    JOIN postulantes a ON a.id = d.id_a AND a.campana_id = d.campana_id
+                    JOIN postulantes b ON b.id = d.id_b AND b.campana_id = d.campana_id
+                    WHERE d.estado = %s
+                    ORDER BY d.puntaje DESC, d.id
+                    LIMIT 500
+                """, (estado,))
+                items = cur.fetchall()
+                cur.execute("SELECT fin, pares, marcados FROM duplicados_corridas ORDER BY id DESC LIMIT 1")
+                ultima = cur.fetchone()
+        return jsonify({"ok": True, "items": items, "ultima_corrida": ultima})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/duplicados/analizar")
+def analizar_duplicados():
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    if DEDUP_INTERVALO_SEG <= 0:
+        return jsonify({"ok": False, "error": "La detección de duplicados está desactivada"}), 409
+    if not TAREAS_ACTIVAS:
+        # Sin planificador ningún líder atendería el pedido: la corrida va en esta petición
+        resultado, error = ejecutar_tarea("duplicados")
+        if error:
+            return jsonify({"ok": False, "error": error}), 500
+        if resultado is None:
+            return jsonify({"ok": False, "error": "Ya hay una detección de duplicados en curso"}), 409
+        return jsonify({"ok": True, "resultado": resultado})
+    try:
+        solicitar_tarea("duplicados")
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+    return jsonify({"ok": True}), 202
+
+
+@app.post("/api/duplicados/<int:dup_id>/revisar")
+def revisar_duplicado(dup_id):
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
+
+    data = request.get_json(silent=True) or {}
+    estado = data.get("estado")
+    if estado not in ("confirmado", "descartado"):
+        return jsonify({"ok": False, "error": "Estado inválido (confirmado, descartado)"}), 400
+
+    usuario = session.get("usuario", "admin")
+    fecha = now_peru()
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    WITH revisado AS (
+                        UPDATE duplicados_sospechosos
+                        SET estado = %(estado)s, revisado_por = %(usuario)s, revisado_at = %(fecha)s
+                        WHERE id = %(id)s
+                        RETURNING id_a, id_b
+                    ), log AS (
+                        INSERT INTO logs (fecha, usuario, accion)
+                        SELECT %(fecha)s, %(usuario)s,
+                               'Marcó como ' || %(estado)s || ' el posible duplicado ' || id_a || ' / ' || id_b
+                        FROM revisado
+                    )
+                    SELECT count(*) AS n FROM revisado
+                """, {"id": dup_id, "estado": estado, "usuario": usuario, "fecha": fecha})
+                n = cur.fetchone()["n"]
+                conn.commit()
+        if not n:
+            return jsonify({"ok": False, "error": "Par no encontrado"}), 404
+        return jsonify({"ok": True})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+
+# ===============================
+# TAREAS PERIÓDICAS — un solo worker las ejecuta
+# ===============================
+# Cada worker de gunicorn corre este hilo, pero solo el que obtiene el advisory lock de
+# sesión TAREAS_LOCK ejecuta las tareas. El lock vive en una conexión propia, fuera del
+# pool: si el worker líder muere, Postgres lo libera y otro worker lo toma en el siguiente
+# intento (TAREAS_REINTENTO_SEG). La última corrida y las métricas de cada tarea quedan en
+# tareas_estado, así un líder nuevo retoma el calendario en vez de correr todo de golpe.
+TAREAS_ACTIVAS = os.getenv("TAREAS_ACTIVAS", "1") == "1"
+TAREAS_LOCK = "tareas_lider"
+TAREAS_TICK_SEG = 1.0
+TAREAS_LATIDO_SEG = 5
+TAREAS_REINTENTO_SEG = 10
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# nombre -> (función(conn), intervalo en segundos, jitter como fracción del intervalo)
+TAREAS = {nombre: (funcion, intervalo, jitter) for nombre, funcion, intervalo, jitter in (
+    ("presencia", limpiar_presencia, PRESENCIA_LIMPIEZA_SEG, 0.2),
+    ("versiones", plegar_versiones, VERSIONES_PLIEGUE_SEG, 0.2),
+    ("duplicados", detectar_duplicados, DEDUP_INTERVALO_SEG, 0.1),
+    ("estadisticas", rellenar_estadisticas_hora, ESTADISTICAS_RECALCULO_SEG, 0.05),
+    ("estadisticas_delta", consolidar_estadisticas_hora, ESTADISTICAS_CONSOLIDACION_SEG, 0.2),
+    ("logs", recortar_logs, LOGS_RECORTE_SEG if LOGS_RETENCION_DIAS > 0 else 0, 0.1),
+    ("archivo", archivar_campanas_vencidas, ARCHIVO_AUTOMATICO_SEG if ARCHIVO_AUTOMATICO_DIAS > 0 else 0, 0.1),
+) if intervalo > 0}
+_tareas = {"lider": False}
+
+
+def init_tareas():
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS tareas_estado (
+                  nombre TEXT PRIMARY KEY,
+                  solicitada BOOLEAN NOT NULL DEFAULT FALSE,
+                  ultima_inicio TEXT,
+                  ultima_duracion_ms INTEGER,
+                  ultimo_worker TEXT,
+                  ultimo_resultado TEXT,
+                  ultimo_error TEXT,
+                  corridas INTEGER NOT NULL DEFAULT 0,
+                  fallas INTEGER NOT NULL DEFAULT 0,
+                  duracion_total_ms BIGINT NOT NULL DEFAULT 0,
+                  duracion_max_ms INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.commit()
+
+
+def solicitar_tarea(nombre):
+    # La corre el líder en su próximo latido, esté en este worker o en otro
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO tareas_estado (nombre, solicitada) VALUES (%s, TRUE)
+                ON CONFLICT (nombre) DO UPDATE SET solicitada = TRUE
+            """, (nombre,))
+            conn.commit()
+
+
+def ejecutar_tarea(nombre):
+    funcion = TAREAS[nombre][0]
+    inicio, inicio_txt = time.monotonic(), now_peru()
+    resultado = error = None
+    try:
+        with PooledConn() as conn:
+            resultado = funcion(conn)
+    except Exception as e:
+        error = str(e)
+        log_evento(logging.ERROR, "tarea_fallida", f"Tarea {nombre} falló: {e}", exc_info=True, tarea=nombre)
+    duracion_ms = int((time.monotonic() - inicio) * 1000)
+    registrar_corrida(nombre, inicio_txt, duracion_ms, resultado, error)
+    return resultado, error
+
+
+def registrar_corrida(nombre, inicio_txt, duracion_ms, resultado, error):
+    with PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO tareas_estado (nombre, ultima_inicio, ultima_duracion_ms, ultimo_worker,
+                  ultimo_resultado, ultimo_error, corridas, fallas, duracion_total_ms, duracion_max_ms)
+                VALUES (%(nombre)s, %(inicio)s, %(ms)s, %(worker)s, %(resultado)s, %(error)s,
+                        1, %(falla)s, %(ms)s, %(ms)s)
+                ON CONFLICT (nombre) DO UPDATE SET
+                  ultima_inicio = EXCLUDED.ultima_inicio,
+                  ultima_duracion_ms = EXCLUDED.ultima_duracion_ms,
+                  ultimo_worker = EXCLUDED.ultimo_worker,
+                  ultimo_resultado = EXCLUDED.ultimo_resultado,
+                  ultimo_error = EXCLUDED.ultimo_error,
+                  corridas = tareas_estado.corridas + 1,
+                  fallas = tareas_estado.fallas + EXCLUDED.fallas,
+                  duracion_total_ms = tareas_estado.duracion_total_ms + EXCLUDED.duracion_total_ms,
+                  duracion_max_ms = GREATEST(tareas_estado.duracion_max_ms, EXCLUDED.duracion_max_ms)
+            """, {"nombre": nombre, "inicio": inicio_txt, "ms": duracion_ms, "worker": WORKER_ID,
+                  "resultado": json.dumps(resultado, ensure_ascii=False, default=str),
+                  "error": error, "falla": 1 if error else 0})
+            conn.commit()
+
+
+def espera_tarea(nombre):
+    _, intervalo, jitter = TAREAS[nombre]
+    return intervalo * (1 + random.uniform(-jitter, jitter))
+
+
+def calendario_tareas(conn):
+    # Al asumir el liderazgo: cada tarea toca un intervalo después de su última corrida
+    with conn.cursor() as cur:
+        cur.execute("SELECT nombre, ultima_inicio FROM tareas_estado")
+        ultimas = dict(cur.fetchall())
+    ahora = time.time()
+    proximas = {}
+    for nombre in TAREAS:
+        if ultimas.get(nombre):
+            ultima = TIMEZONE.localize(datetime.strptime(ultimas[nombre], "%Y-%m-%d %H:%M:%S")).timestamp()
+            proximas[nombre] = max(ahora, ultima + espera_tarea(nombre))
+        else:
+            proximas[nombre] = ahora + random.uniform(0, TAREAS_LATIDO_SEG)
+    return proximas
+
+
+def planificar_tareas():
+    conn, proximas, ultimo_latido = None, {}, 0.0
+    while True:
+        try:
+            if conn is None:
+                conn = psycopg2.connect(DATABASE_URL, application_name=f"cas-tareas {WORKER_ID}")
+                conn.autocommit = True
+            if not _tareas["lider"]:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (TAREAS_LOCK,))
+                    if not cur.fetchone()[0]:
+                        time.sleep(TAREAS_REINTENTO_SEG)
+                        continue
+                    cur.execute("SET application_name = %s", (f"cas-tareas-lider {WORKER_ID}",))
+                _tareas["lider"] = True
+                proximas, ultimo_latido = calendario_tareas(conn), 0.0
+                log_evento(logging.INFO, "tareas_lider", f"Worker {WORKER_ID} ejecuta las tareas periódicas",
+                           worker=WORKER_ID, tareas=list(TAREAS))
+
+            # El latido comprueba que la conexión del lock sigue viva y recoge pedidos manuales
+            if time.time() - ultimo_latido >= TAREAS_LATIDO_SEG:
+                with conn.cursor() as cur:
+                    cur.execute("UPDATE tareas_estado SET solicitada = FALSE WHERE solicitada RETURNING nombre")
+                    for (nombre,) in cur.fetchall():
+                        if nombre in TAREAS:
+                            proximas[nombre] = 0.0
+                ultimo_latido = time.time()
+
+            for nombre in TAREAS:
+                if proximas[nombre] <= time.time():
+                    ejecutar_tarea(nombre)
+                    proximas[nombre] = time.time() + espera_tarea(nombre)
+            time.sleep(TAREAS_TICK_SEG)
+        except Exception as e:
+            # Sin conexión (o ante un error inesperado) se suelta el lock cerrando la sesión
+            if _tareas["lider"]:
+                log_evento(logging.WARNING, "tareas_sin_lider", f"Worker {WORKER_ID} deja las tareas periódicas: {e}",
+                           worker=WORKER_ID)
+            _tareas["lider"] = False
             try:
-                ultimo = datetime.strptime(r['ultimo_latido'], "%Y-%m-%d %H:%M:%S")
-                ultimo = TIMEZONE.localize(ultimo)
-                segundos = (ahora - ultimo).total_seconds()
-                if segundos <= 90:
-                    activos.append({
-                        "username": r['username'],
-                        "rol": r['rol'],
-                        "ultimo_latido": r['ultimo_latido'],
-                        "segundos_inactivo": int(segundos)
-                    })
+                if conn is not None:
+                    conn.close()
             except Exception:
                 pass
+            conn = None
+            time.sleep(TAREAS_REINTENTO_SEG)
+
+
+init_tareas()
+if TAREAS_ACTIVAS and TAREAS:
+    threading.Thread(target=planificar_tareas, name="tareas-periodicas", daemon=True).start()
+
+
+@app.get("/api/admin/tareas")
+def listar_tareas():
+    err = require_rol("admin")
+    if err: return err
+
+    try:
+        with PooledConn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM tareas_estado WHERE nombre = ANY(%s)", (list(TAREAS),))
+                estados = {r["nombre"]: r for r in cur.fetchall()}
+                cur.execute("""
+                    SELECT substr(application_name, length('cas-tareas-lider ') + 1) AS worker
+                    FROM pg_stat_activity WHERE application_name LIKE 'cas-tareas-lider %'
+                """)
+                lider = cur.fetchone()
+        tareas = []
+        for nombre, (_, intervalo, jitter) in TAREAS.items():
+            e = estados.get(nombre) or {}
+            corridas = e.get("corridas") or 0
+            tareas.append({
+                "nombre": nombre,
+                "intervalo_seg": intervalo,
+                "jitter": jitter,
+                "solicitada": bool(e.get("solicitada")),
+                "ultima_inicio": e.get("ultima_inicio"),
+                "ultima_duracion_ms": e.get("ultima_duracion_ms"),
+                "ultimo_worker": e.get("ultimo_worker"),
+                "ultimo_resultado": json.loads(e["ultimo_resultado"]) if e.get("ultimo_resultado") else None,
+                "ultimo_error": e.get("ultimo_error"),
+                "corridas": corridas,
+                "fallas": e.get("fallas") or 0,
+                "duracion_media_ms": int(e["duracion_total_ms"] / corridas) if corridas else None,
+                "duracion_max_ms": e.get("duracion_max_ms"),
+            })
+        return jsonify({"ok": True, "lider": lider["worker"] if lider else None, "tareas": tareas})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.post("/api/admin/tareas/<nombre>/ejecutar")
+def pedir_tarea(nombre):
+    err = require_rol("admin")
+    if err: return err
+    err2 = require_csrf()
+    if err2: return err2
 
-        return jsonify({"ok": True, "activos": activos})
+    if nombre not in TAREAS:
+        return jsonify({"ok": False, "error": "Tarea desconocida o desactivada"}), 404
+    try:
+        solicitar_tarea(nombre)
+        registrar_log(session.get("usuario", "admin"), f"Pidió ejecutar la tarea {nombre}")
+        return jsonify({"ok": True}), 202
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.cli.command("ejecutar-tarea")
+@click.argument("nombre")
+def ejecutar_tarea_cmd(nombre):
+    # Corre la tarea en este proceso, sin esperar al líder; queda registrada igual
+    if nombre not in TAREAS:
+        raise click.ClickException(f"Tarea desconocida o desactivada. Disponibles: {', '.join(TAREAS)}")
+    resultado, error = ejecutar_tarea(nombre)
+    if error:
+        raise click.ClickException(error)
+    print(f"✅ Tarea {nombre}: {json.dumps(resultado, ensure_ascii=False, default=str)}")
+
+
+# ===============================
+# CONTEO DE CONSULTAS — activación por petición
+# ===============================
+# Solo suma contadores: el log de la petición los publica y tests/test_presupuestos.py
+# los compara con el presupuesto de cada endpoint (lee _conteo.ultimo, con la latencia).
+@app.before_request
+def iniciar_conteo():
+    _conteo.activo = True
+    _conteo.consultas = 0
+    _conteo.conexiones = 0
+    _conteo.db_seg = 0.0
+    _conteo.stream = False
+    _conteo.t0 = time.perf_counter()
+
+
+@app.teardown_request
+def terminar_conteo(exc):
+    if not getattr(_conteo, "activo", False):
+        return
+    # Con stream_with_context Flask la corre dos veces: al devolver la respuesta y al cerrar
+    # el stream. Se cuenta hasta la segunda, con las consultas del generador incluidas
+    if _conteo.stream:
+        _conteo.stream = False
+        return
+    _conteo.activo = False
+    _conteo.ultimo = {"endpoint": request.endpoint, "consultas": _conteo.consultas,
+                      "conexiones": _conteo.conexiones,
+                      "latencia_ms": (time.perf_counter() - _conteo.t0) * 1000}
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print("🚀 SISTEMA DE REGISTRO DE POSTULANTES CAS 2026 - MML")
@@ -1389,6 +5179,8 @@ if __name__ == "__main__":
     print("✅ Protección CSRF — token por sesión en todas las mutaciones")
     print("✅ Timeout de sesión — cierre automático a las 8 horas")
     print("✅ UPDATE atómico en recepción — sin colisiones entre usuarios")
+    print("✅ Cola de atención con reservas (SKIP LOCKED) por área")
+    print("✅ Postulantes particionados por campaña")
     print("✅ Logout limpia sesiones activas inmediatamente")
     print("💾 Base de datos: PostgreSQL (Azure)")
     print("🌐 Acceso: http://localhost:5000")
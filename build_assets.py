@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import gzip
+import shutil
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFIESTO = os.path.join(DIST_DIR, "manifest.json")
+
+EXT_TEXTO = (".js", ".css")
+EXT_IMAGEN = (".png", ".jpg", ".jpeg", ".ico", ".svg")
+
+# Sin estas librerías el build no falla por su cuenta: saldría sin .br, con JS/CSS a medio
+# minificar y PNGs sin optimizar. Se exigen todas (están en requirements.txt).
+DEPENDENCIAS = {"brotli": brotli, "rjsmin": rjsmin, "rcssmin": rcssmin, "Pillow": Image}
+
+
+# ===============================
+# MINIFICACIÓN
+# ===============================
+def verificar_dependencias():
+    faltan = [nombre for nombre, modulo in DEPENDENCIAS.items() if modulo is None]
+    if faltan:
+        raise SystemExit(f"❌ Faltan dependencias del build: {', '.join(faltan)} "
+                         f"(pip install -r requirements.txt)")
+
+
+def minificar_css(texto):
+    return rcssmin.cssmin(texto)
+
+
+def minificar_js(texto):
+    return rjsmin.jsmin(texto)
+
+
+def optimizar_imagen(ruta):
+    with open(ruta, "rb") as f:
+        original = f.read()
+    if not ruta.lower().endswith(".png"):
+        return original
+    from io import BytesIO
+    salida = BytesIO()
+    with Image.open(ruta) as img:
+        img.save(salida, format="PNG", optimize=True)
+    optimizada = salida.getvalue()
+    return optimizada if len(optimizada) < len(original) else original
+
+
+# ===============================
+# BUILD
+# ===============================
+def nombre_con_hash(relativa, contenido):
+    digest = hashlib.sha256(contenido).hexdigest()[:10]
+    base, ext = os.path.splitext(relativa)
+    return f"{base}.{digest}{ext}"
+
+
+def escribir(relativa, contenido, comprimir):
+    destino = os.path.join(DIST_DIR, relativa)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(destino, "wb") as f:
+        f.write(contenido)
+    if not comprimir:
+        return
+    with open(destino + ".gz", "wb") as f:
+        f.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+    with open(destino + ".br", "wb") as f:
+        f.write(brotli.compress(contenido, quality=11))
+
+
+def fuentes():
+    for raiz, dirs, archivos in os.walk(STATIC_DIR):
+        if os.path.abspath(raiz).startswith(DIST_DIR):
+            continue
+        for nombre in sorted(archivos):
+            ruta = os.path.join(raiz, nombre)
+            yield os.path.relpath(ruta, STATIC_DIR).replace(os.sep, "/"), ruta
+
+
+def reescribir_urls(css, manifiesto):
+    # url('/static/img/x.png') -> url('/static/dist/img/x.<hash>.png')
+    def cambiar(m):
+        relativa = m.group(2)
+        if relativa in manifiesto:
+            return f"{m.group(1)}/static/dist/{manifiesto[relativa]}"
+        return m.group(0)
+    return re.sub(r"(url\(\s*['\"]?)/static/([^'\")\s]+)", cambiar, css)
+
+
+def build():
+    verificar_dependencias()
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    manifiesto = {}
+    archivos = list(fuentes())
+
+    # Primero imágenes: el CSS necesita sus nombres con hash
+    for relativa, ruta in archivos:
+        if relativa.lower().endswith(EXT_IMAGEN):
+            contenido = optimizar_imagen(ruta)
+            destino = nombre_con_hash(relativa, contenido)
+            escribir(destino, contenido, comprimir=relativa.endswith(".svg"))
+            manifiesto[relativa] = destino
+
+    for relativa, ruta in archivos:
+        if not relativa.endswith(EXT_TEXTO):
+            continue
+        with open(ruta, encoding="utf-8") as f:
+            texto = f.read()
+        if relativa.endswith(".css"):
+            texto = minificar_css(reescribir_urls(texto, manifiesto))
+        else:
+            texto = minificar_js(texto)
+        contenido = texto.encode("utf-8")
+        destino = nombre_con_hash(relativa, contenido)
+        escribir(destino, contenido, comprimir=True)
+        manifiesto[relativa] = destino
+
+    with open(MANIFIESTO, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    return manifiesto
+
+
+if __name__ == "__main__":
+    generado = build()
+    for origen, destino in sorted(generado.items()):
+        print(f"  {origen} -> dist/{destino}")
+    print(f"✅ {len(generado)} archivos en static/dist")
@@ -0,0 +1,826 @@
+// ==========================================
+// ÁREAS
+// ==========================================
+const AREAS_ADMIN = {
+  'GGRD':  'Gestión del Riesgo de Desastres',
+  'GSCGA': 'Servicios a la Ciudad y Gestión Ambiental',
+  'GFC':   'Fiscalización y Control',
+  'GSC':   'Seguridad Ciudadana',
+  'GDE':   'Desarrollo Económico'
+};
+
+(function poblarFiltrosArea() {
+  ['filtroAreaReg', 'filtroAreaRec'].forEach(id => {
+    const sel = document.getElementById(id);
+    if (!sel) return;
+    Object.entries(AREAS_ADMIN).forEach(([codigo]) => {
+      const opt = document.createElement('option');
+      opt.value = codigo;
+      opt.textContent = codigo;
+      sel.appendChild(opt);
+    });
+  });
+})();
+
+// ── CSRF helper
+function getCsrfToken() {
+  return document.querySelector('meta[name="csrf-token"]')?.content || '';
+}
+function csrfHeaders() {
+  return { 'Content-Type': 'application/json', 'X-CSRF-Token': getCsrfToken() };
+}
+
+// ── Peticiones condicionales: reenvía el ETag de la última respuesta de la misma URL.
+// Devuelve null cuando el servidor responde 304 (sin cambios).
+const _etags = new Map();
+// Formato columnar (?formato=columnar): columnas en arrays, las de pocos valores como {dic, idx}
+function decodificarLista(data){
+  if(!data||data.formato!=='columnar') return data;
+  const cols=Object.entries(data.columnas).map(([k,v])=>Array.isArray(v)?[k,v,null]:[k,v.idx,v.dic]);
+  const items=new Array(data.n);
+  for(let i=0;i<data.n;i++){
+    const o={};
+    for(const [k,vals,dic] of cols) o[k]=dic?dic[vals[i]]:vals[i];
+    items[i]=o;
+  }
+  data.items=items;
+  return data;
+}
+
+async function fetchCondicional(url){
+  const clave = url.split('?')[0];
+  const previo = _etags.get(clave);
+  const headers = previo && previo.url === url ? { 'If-None-Match': previo.etag } : {};
+  const res = await fetch(url, { headers });
+  registrarIntervalo(url, res);
+  if (res.status === 304) return null;
+  const etag = res.headers.get('ETag');
+  if (etag && res.ok) _etags.set(clave, { url, etag }); else _etags.delete(clave);
+  return decodificarLista(await res.json());
+}
+
+// ── Intervalo de polling: el servidor sugiere X-Poll-Interval-Ms y, si está ocupado (503),
+// Retry-After. Cada ciclo espera el mayor entre su intervalo base y el sugerido.
+const _intervalos = new Map();
+function registrarIntervalo(url, res){
+  const clave = url.split('?')[0];
+  const sugerido = Number(res.headers.get('X-Poll-Interval-Ms')) || 0;
+  const reintento = res.status === 503 ? (Number(res.headers.get('Retry-After')) || 0) * 1000 : 0;
+  const ms = Math.max(sugerido, reintento);
+  if (ms) _intervalos.set(clave, ms); else _intervalos.delete(clave);
+}
+function repetirPoll(fn, url, base){
+  const ciclo = async () => {
+    try { await fn(); }
+    finally {
+      const ms = Math.max(base, _intervalos.get(url) || 0);
+      setTimeout(ciclo, ms * (0.9 + Math.random() * 0.2));
+    }
+  };
+  setTimeout(ciclo, base);
+}
+
+// ==========================================
+// UTILIDADES GLOBALES
+// ==========================================
+function updateDateTime(){ document.getElementById('datetime').textContent = new Date().toLocaleString('es-PE'); }
+updateDateTime(); setInterval(updateDateTime, 1000);
+
+function esc(str){
+  if(str===null||str===undefined) return '-';
+  const d=document.createElement('div'); d.textContent=String(str); return d.innerHTML;
+}
+
+function setOnline(){ document.getElementById('statusDot').classList.remove('offline'); document.getElementById('statusText').textContent='En línea'; }
+function setOffline(){ document.getElementById('statusDot').classList.add('offline'); document.getElementById('statusText').textContent='Sin conexión'; }
+
+function showNotif(msg, type='success'){
+  const colors={success:'var(--success)',warning:'#d97706',error:'var(--danger)',info:'var(--blue-2)'};
+  const n=document.createElement('div');
+  n.style.cssText=`position:fixed;top:80px;right:20px;background:${colors[type]||colors.success};color:white;padding:14px 20px;border-radius:12px;box-shadow:0 8px 24px rgba(0,0,0,0.2);font-weight:700;font-size:13px;z-index:9999;transition:opacity 0.3s;`;
+  n.textContent=msg; document.body.appendChild(n);
+  setTimeout(()=>{n.style.opacity='0';setTimeout(()=>n.remove(),300);},3500);
+}
+
+function renderPag(containerId, pagActual, totalPag, onChange){
+  const c=document.getElementById(containerId); c.innerHTML='';
+  if(totalPag<=1) return;
+  const mk=(txt,pg,dis=false)=>{
+    const b=document.createElement('button');
+    b.className='page-btn'+(pg===pagActual?' active':'');
+    b.textContent=txt; b.disabled=dis; b.onclick=()=>onChange(pg); return b;
+  };
+  c.appendChild(mk('«',1,pagActual===1)); c.appendChild(mk('‹',pagActual-1,pagActual===1));
+  let s=Math.max(1,pagActual-2),e=Math.min(totalPag,s+4);
+  if(e-s<4) s=Math.max(1,e-4);
+  for(let i=s;i<=e;i++) c.appendChild(mk(i,i));
+  c.appendChild(mk('›',pagActual+1,pagActual===totalPag)); c.appendChild(mk('»',totalPag,pagActual===totalPag));
+}
+
+// TABS Y SUB-TABS
+document.querySelectorAll('.side-btn').forEach(b=>{
+  b.addEventListener('click',()=>{
+    document.querySelectorAll('.side-btn').forEach(x=>x.classList.remove('active'));
+    b.classList.add('active');
+    document.querySelectorAll('.tab').forEach(t=>t.hidden=(t.id!==b.dataset.tab));
+    if(['postulantes','stats','usuarios'].includes(b.dataset.tab)) pollSnapshot();
+    if(b.dataset.tab==='formulario'){ cargarEstadoConvocatoria(); cargarCampanas(); }
+    if(b.dataset.tab==='logs') cargarLogs();
+    if(b.dataset.tab==='duplicados') cargarDuplicados();
+  });
+});
+document.querySelectorAll('.sub-tab-btn').forEach(btn=>{
+  btn.addEventListener('click',()=>{
+    document.querySelectorAll('.sub-tab-btn').forEach(b=>b.classList.remove('active'));
+    btn.classList.add('active');
+    document.querySelectorAll('.sub-tab-content').forEach(c=>{c.hidden=(c.id!==btn.dataset.subtab);});
+  });
+});
+['tableWrapperRegistrados','tableWrapperRecibidos'].forEach(id=>{
+  const w=document.getElementById(id); if(!w) return;
+  w.addEventListener('wheel',(e)=>{ if(w.scrollWidth>w.clientWidth&&Math.abs(e.deltaX)<=Math.abs(e.deltaY)){e.preventDefault();w.scrollLeft+=e.deltaY;} },{passive:false});
+});
+document.addEventListener('visibilitychange', ()=>{
+  if(!document.hidden) pollSnapshot();
+});
+
+// MODAL
+const modalOverlay=document.getElementById('modalOverlay');
+const modalTitle=document.getElementById('modalTitle');
+const modalBody=document.getElementById('modalBody');
+const modalFooter=document.getElementById('modalFooter');
+function showModal(cfg){
+  return new Promise(resolve=>{
+    modalTitle.textContent=cfg.title||'Aviso';
+    const icons={success:'✓',error:'✕',warning:'⚠',info:'ℹ'};
+    let html=cfg.icon?`<div class="modal-icon ${cfg.type||'info'}">${icons[cfg.type]||'ℹ'}</div>`:'';
+    html+=`<div style="text-align:center">${cfg.message||''}</div>`;
+    modalBody.innerHTML=html; modalFooter.innerHTML='';
+    if(cfg.type==='confirm'){
+      const bc=document.createElement('button'); bc.className='modal-btn modal-btn-cancel'; bc.textContent=cfg.cancelText||'Cancelar'; bc.onclick=()=>{closeModal();resolve(false);};
+      const bo=document.createElement('button'); bo.className=`modal-btn modal-btn-${cfg.confirmClass||'confirm'}`; bo.textContent=cfg.confirmText||'Aceptar'; bo.onclick=()=>{closeModal();resolve(true);};
+      modalFooter.appendChild(bc); modalFooter.appendChild(bo);
+    } else {
+      const bo=document.createElement('button'); bo.className='modal-btn modal-btn-confirm'; bo.textContent='Aceptar'; bo.onclick=()=>{closeModal();resolve(true);};
+      modalFooter.appendChild(bo);
+    }
+    modalOverlay.classList.add('active');
+  });
+}
+function closeModal(){ modalOverlay.classList.remove('active'); }
+modalOverlay.addEventListener('click',e=>{if(e.target===modalOverlay) closeModal();});
+
+// REGISTRADOS Y RECIBIDOS: TablaVirtual (tabla.js) con datos en memoria y filtro en Worker
+const CAMPOS_BUSQUEDA_ADMIN=['apellidos','nombres','numero_documento'];
+const VACIO_REG='<tr><td colspan="16" style="text-align:center;padding:20px;color:var(--muted);">No hay postulantes pendientes</td></tr>';
+const VACIO_REC='<tr><td colspan="18" style="text-align:center;padding:20px;color:var(--muted);">No hay postulantes recibidos aún</td></tr>';
+
+function celdasPostulante(p){
+  return `
+    <td>${esc(p.area)}</td><td>${esc(p.convocatoria)}</td>
+    <td class="apellidos">${esc(p.apellidos)}</td><td class="nombres">${esc(p.nombres)}</td>
+    <td>${esc(p.tipo_documento)}</td><td class="num-doc">${esc(p.numero_documento)}</td>
+    <td>${esc(p.fecha_nacimiento)}</td><td>${esc(p.sexo)}</td>
+    <td>${esc(p.celular)}</td><td>${esc(p.correo)}</td>
+    <td>${esc(p.fuerzas_armadas)}</td><td>${esc(p.tiene_discapacidad)}</td>
+    <td>${esc(p.tipo_discapacidad)}</td><td>${esc(p.created_at)}</td>`;
+}
+
+function pieTabla(sufijo, badge){
+  return ({total,ini,fin,pag,totalPag})=>{
+    const t=sufijo==='Registrados'?tablaReg:tablaRec;
+    document.getElementById('count'+sufijo).textContent=`${total} resultado${total!==1?'s':''}`;
+    document.getElementById('info'+sufijo).textContent=total>0?`Mostrando ${ini+1}–${fin} de ${total}`:'Sin resultados';
+    document.getElementById(badge).textContent=t?t.total:0;
+    renderPag('botones'+sufijo,pag,totalPag,pg=>t.irPagina(pg));
+  };
+}
+
+// REGISTRADOS
+let maxIdReg=0;
+
+function buildRowReg(p, idx){
+  const tr=document.createElement('tr');
+  tr.dataset.id=p.id;
+  tr.innerHTML=`
+    <td class="td-num-reg">${idx}</td>${celdasPostulante(p)}
+    <td><button class="btn-delete js-del-registrado" data-id="${p.id}">✕</button></td>`;
+  return tr;
+}
+
+const tablaReg=new TablaVirtual({
+  tbody:document.getElementById('tbodyRegistrados'), columnas:16, fila:buildRowReg,
+  campos:CAMPOS_BUSQUEDA_ADMIN, claves:['sexo','area'], vacio:VACIO_REG,
+  alCambiar:pieTabla('Registrados','badgeRegistrados')
+});
+
+async function cargarRegistradosInicial(){
+  try{
+    const res=await fetch('/api/postulantes/registrados?formato=columnar');
+    const data=decodificarLista(await res.json());
+    if(!data.ok) return;
+    data.items.forEach(p=>{ if(p.id>maxIdReg) maxIdReg=p.id; });
+    tablaReg.cargar(data.items); setOnline();
+  }catch(e){console.error('Error carga registrados:',e); setOffline();}
+}
+
+function filtrarRegistrados(reset=true){
+  tablaReg.filtrar(document.getElementById('searchRegistrados').value,{
+    sexo:document.getElementById('filtroSexoReg').value,
+    area:document.getElementById('filtroAreaReg').value
+  },reset);
+}
+function limpiarFiltrosRegistrados(){ document.getElementById('searchRegistrados').value=''; document.getElementById('filtroSexoReg').value=''; document.getElementById('filtroAreaReg').value=''; filtrarRegistrados(); }
+function cambiarPagReg(){ tablaReg.tamPagina(parseInt(document.getElementById('pageSizeReg').value)); }
+
+
+// RECIBIDOS
+// fecha_atencion más reciente en pantalla: cursor del snapshot para los recibidos
+let atendidosDesde='';
+
+function buildRowRec(p, idx){
+  const tr=document.createElement('tr');
+  tr.dataset.id=p.id;
+  tr.innerHTML=`
+    <td class="td-num">${idx}</td>${celdasPostulante(p)}
+    <td>${esc(p.usuario_atendio)}</td><td>${esc(p.fecha_atencion)}</td>
+    <td><button class="btn-delete js-del-recibido" data-id="${p.id}">✕</button></td>`;
+  return tr;
+}
+
+const tablaRec=new TablaVirtual({
+  tbody:document.getElementById('tbodyRecibidos'), columnas:18, fila:buildRowRec,
+  campos:CAMPOS_BUSQUEDA_ADMIN, claves:['sexo','area'], vacio:VACIO_REC,
+  alCambiar:pieTabla('Recibidos','badgeRecibidos')
+});
+
+async function cargarRecibidosInicial(){
+  try{
+    const res=await fetch('/api/postulantes/atendidos-nuevos?after_id=0&formato=columnar');
+    const data=decodificarLista(await res.json());
+    const items=data.ok?data.items:[];
+    items.forEach(p=>{ if(p.fecha_atencion>atendidosDesde) atendidosDesde=p.fecha_atencion; });
+    tablaRec.cargar(items); setOnline();
+  }catch(e){console.error('Error carga recibidos:',e); setOffline();}
+}
+
+function filtrarRecibidos(reset=true){
+  tablaRec.filtrar(document.getElementById('searchRecibidos').value,{
+    sexo:document.getElementById('filtroSexoRec').value,
+    area:document.getElementById('filtroAreaRec').value
+  },reset);
+}
+function limpiarFiltrosRecibidos(){ document.getElementById('searchRecibidos').value=''; document.getElementById('filtroSexoRec').value=''; document.getElementById('filtroAreaRec').value=''; filtrarRecibidos(); }
+function cambiarPagRec(){ tablaRec.tamPagina(parseInt(document.getElementById('pageSizeRec').value)); }
+
+
+// ELIMINAR POSTULANTES
+document.addEventListener('click', async e=>{
+  const esReg=e.target.classList.contains('js-del-registrado');
+  if(!esReg&&!e.target.classList.contains('js-del-recibido')) return;
+  const tabla=esReg?tablaReg:tablaRec;
+  const id=e.target.dataset.id;
+  const p=tabla.obtener(id); if(!p) return;
+  const nombre=p.apellidos||'este postulante';
+  const ok=await showModal({title:'¿Eliminar postulante?',message:`¿Eliminar a <strong>${esc(nombre)}</strong>?`,icon:true,type:'confirm',confirmText:'Sí, eliminar',cancelText:'Cancelar',confirmClass:'danger'});
+  if(!ok) return;
+  const res=await fetch(`/api/eliminar/${id}`,{method:'POST',headers:csrfHeaders()});
+  const data=await res.json();
+  if(data.ok){
+    tabla.quitar(id);
+    await showModal({title:'Eliminado',message:`<strong>${esc(nombre)}</strong> eliminado.`,icon:true,type:'success'});
+  } else { await showModal({title:'Error',message:data.error||'No se pudo eliminar.',icon:true,type:'error'}); }
+});
+
+// EXPORTACIONES EN SEGUNDO PLANO: se crea el trabajo y se consulta su avance
+async function exportar(btn){
+  const tipo=btn.dataset.tipo, texto=btn.textContent;
+  btn.disabled=true; btn.textContent='⏳ 0%';
+  try{
+    const res=await fetch('/api/exportaciones',{method:'POST',headers:csrfHeaders(),body:JSON.stringify({tipo})});
+    let data=await res.json();
+    if(!data.ok) throw new Error(data.error||'No se pudo iniciar la exportación');
+    while(data.estado==='pendiente'||data.estado==='procesando'){
+      btn.textContent=`⏳ ${data.progreso||0}%`;
+      await new Promise(r=>setTimeout(r,1000));
+      data=await (await fetch(`/api/exportaciones/${data.id}`)).json();
+      if(!data.ok) throw new Error(data.error||'Exportación no disponible');
+    }
+    if(data.estado==='error') throw new Error(data.error||'La exportación falló');
+    window.location.href=data.descarga;
+  }catch(e){ showNotif(`❌ ${e.message}`,'error'); }
+  finally{ btn.disabled=false; btn.textContent=texto; }
+}
+document.querySelectorAll('.js-exportar').forEach(b=>b.addEventListener('click',()=>exportar(b)));
+
+// USUARIOS
+let filasUsr=[], filtUsr=[], pagUsr=1, tamUsr=10;
+function initUsuarios(){ filasUsr=Array.from(document.querySelectorAll('#tbodyUsuarios tr[data-username]')); filtUsr=[...filasUsr]; actualizarPagUsr(); }
+function filtrarUsuarios(){
+  const txt=document.getElementById('searchUsuarios').value.toLowerCase();
+  const rol=document.getElementById('filtroRolUsr').value;
+  filtUsr=filasUsr.filter(r=>{ const u=r.querySelector('.td-username')?.textContent.toLowerCase()||''; return(!txt||u.includes(txt))&&(!rol||r.dataset.rol===rol); });
+  pagUsr=1; actualizarPagUsr();
+}
+function limpiarFiltrosUsuarios(){ document.getElementById('searchUsuarios').value=''; document.getElementById('filtroRolUsr').value=''; filtrarUsuarios(); }
+function actualizarPagUsr(){
+  const total=filtUsr.length, totalPag=Math.ceil(total/tamUsr)||1;
+  if(pagUsr>totalPag) pagUsr=totalPag;
+  const ini=(pagUsr-1)*tamUsr, fin=Math.min(ini+tamUsr,total);
+  filasUsr.forEach(r=>r.style.display='none'); filtUsr.slice(ini,fin).forEach(r=>r.style.display='');
+  document.getElementById('countUsuarios').textContent=`${total} resultado${total!==1?'s':''}`;
+  document.getElementById('infoUsuarios').textContent=total>0?`Mostrando ${ini+1}–${fin} de ${total}`:'Sin resultados';
+  renderPag('botonesUsuarios',pagUsr,totalPag,pg=>{pagUsr=pg;actualizarPagUsr();});
+}
+function cambiarPagUsr(){ tamUsr=parseInt(document.getElementById('pageSizeUsr').value); pagUsr=1; actualizarPagUsr(); }
+initUsuarios();
+
+document.addEventListener('click', async e=>{
+  if(!e.target.classList.contains('js-del-usuario')) return;
+  const username=e.target.dataset.username; if(username==='admin') return;
+  const row=document.querySelector(`#tbodyUsuarios tr[data-username="${username}"]`);
+  const ok=await showModal({title:'¿Eliminar usuario?',message:`¿Eliminar a <strong>${esc(username)}</strong>?`,icon:true,type:'confirm',confirmText:'Sí, eliminar',cancelText:'Cancelar',confirmClass:'danger'});
+  if(!ok) return;
+  const res=await fetch('/api/eliminar-usuario',{method:'POST',headers:csrfHeaders(),body:JSON.stringify({username})});
+  const data=await res.json();
+  if(data.ok){ filasUsr=filasUsr.filter(r=>r.dataset.username!==username); row?.remove(); filtrarUsuarios(); await showModal({title:'Eliminado',message:`Usuario <strong>${esc(username)}</strong> eliminado.`,icon:true,type:'success'}); }
+  else { await showModal({title:'Error',message:data.error||'No se pudo eliminar.',icon:true,type:'error'}); }
+});
+
+document.getElementById('formUsuario').addEventListener('submit', async e=>{
+  e.preventDefault();
+  const f=e.target;
+  const btn=f.querySelector('button[type=submit]');
+  const username=f.username.value.trim(), password=f.password.value, rol=f.rol.value;
+  if(!rol){ await showModal({title:'Error',message:'Selecciona un rol.',icon:true,type:'error'}); return; }
+  btn.disabled=true;
+  const res=await fetch('/api/crear-usuario',{method:'POST',headers:csrfHeaders(),body:JSON.stringify({username,password,rol})});
+  btn.disabled=false;
+  const r=await res.json();
+  if(r.ok){
+    await showModal({title:'Usuario creado',message:`<strong>${esc(username)}</strong> creado exitosamente.`,icon:true,type:'success'});
+    const tbody=document.getElementById('tbodyUsuarios');
+    const newRow=document.createElement('tr');
+    newRow.dataset.username=username; newRow.dataset.rol=rol;
+    newRow.innerHTML=`
+      <td class="td-username"></td>
+      <td class="td-rol"></td>
+      <td class="td-estado"><span class="badge badge-ok">Activo</span></td>
+      <td class="td-conexion">
+        <div style="display:flex;align-items:center;gap:6px;">
+          <div class="conexion-dot" style="background:#f87171;" title="Desconectado"></div>
+          <span class="conexion-label" style="font-size:11px;color:var(--muted);">Desconectado</span>
+        </div>
+      </td>
+      <td><button class="btn" style="background:#7c3aed;color:white;" onclick="cambiarPassword('${username}')">🔑 Cambiar</button></td>
+      <td class="td-acciones">
+        <button class="btn btn-activar" style="background:var(--success);color:#fff;opacity:0.4" disabled>Activar</button>
+        <button class="btn btn-danger btn-desactivar">Desactivar</button>
+      </td>
+      <td><button class="btn-delete js-del-usuario" data-username=""></button></td>`;
+    newRow.querySelector('.td-username').textContent=username;
+    newRow.querySelector('.td-rol').textContent=rol;
+    newRow.querySelector('.btn-desactivar').onclick=()=>desactivarUsuario(username);
+    newRow.querySelector('.btn-activar').onclick=()=>activarUsuario(username);
+    const delBtn=newRow.querySelector('.js-del-usuario'); delBtn.dataset.username=username; delBtn.textContent='✕';
+    tbody.appendChild(newRow); filasUsr.push(newRow); filtrarUsuarios(); f.reset();
+  } else { await showModal({title:'Error',message:r.error||'No se pudo crear el usuario',icon:true,type:'error'}); }
+});
+
+async function cambiarPassword(username) {
+  const nueva = prompt(`Nueva contraseña para "${username}":`);
+  if (!nueva || !nueva.trim()) return;
+  const res = await fetch('/api/cambiar-password', {
+    method: 'POST',
+    headers: csrfHeaders(),
+    body: JSON.stringify({ username, password: nueva.trim() })
+  });
+  const data = await res.json();
+  if (data.ok) showNotif(`✅ Contraseña de ${username} actualizada`, 'success');
+  else await showModal({ title: 'Error', message: data.error || 'No se pudo cambiar.', icon: true, type: 'error' });
+}
+
+async function desactivarUsuario(username){
+  const ok=await showModal({title:'¿Desactivar?',message:`¿Desactivar a <strong>${esc(username)}</strong>?`,icon:true,type:'confirm',confirmText:'Desactivar',cancelText:'Cancelar',confirmClass:'danger'});
+  if(!ok) return;
+  const res=await fetch('/api/desactivar-usuario',{method:'POST',headers:csrfHeaders(),body:JSON.stringify({username})});
+  const r=await res.json();
+  if(r.ok){
+    const row=document.querySelector(`tr[data-username="${username}"]`);
+    if(row){ row.querySelector('.td-estado').innerHTML='<span class="badge badge-off">Inactivo</span>'; const ba=row.querySelector('.btn-activar'),bd=row.querySelector('.btn-desactivar'); if(ba){ba.disabled=false;ba.style.opacity='1';} if(bd){bd.disabled=true;bd.style.opacity='0.4';} }
+    await showModal({title:'Desactivado',message:`<strong>${esc(username)}</strong> desactivado.`,icon:true,type:'success'});
+  } else { await showModal({title:'Error',message:r.error||'No se pudo desactivar.',icon:true,type:'error'}); }
+}
+async function activarUsuario(username){
+  const ok=await showModal({title:'¿Activar?',message:`¿Activar a <strong>${esc(username)}</strong>?`,icon:true,type:'confirm',confirmText:'Activar',cancelText:'Cancelar',confirmClass:'success'});
+  if(!ok) return;
+  const res=await fetch('/api/activar-usuario',{method:'POST',headers:csrfHeaders(),body:JSON.stringify({username})});
+  const r=await res.json();
+  if(r.ok){
+    const row=document.querySelector(`tr[data-username="${username}"]`);
+    if(row){ row.querySelector('.td-estado').innerHTML='<span class="badge badge-ok">Activo</span>'; const ba=row.querySelector('.btn-activar'),bd=row.querySelector('.btn-desactivar'); if(ba){ba.disabled=true;ba.style.opacity='0.4';} if(bd){bd.disabled=false;bd.style.opacity='1';} }
+    await showModal({title:'Activado',message:`<strong>${esc(username)}</strong> activado.`,icon:true,type:'success'});
+  } else { await showModal({title:'Error',message:r.error||'No se pudo activar.',icon:true,type:'error'}); }
+}
+
+// LOGS — cargados via API con paginación servidor
+let pagLog=1, tamLog=25, totalLogs=0, busquedaLog='', _logTimer=null;
+
+async function cargarLogs(reset=true){
+  if(reset) pagLog=1;
+  const tbody=document.getElementById('tbodyLogs');
+  tbody.innerHTML='<tr><td colspan="3" style="text-align:center;padding:18px;color:var(--muted);">⏳ Cargando...</td></tr>';
+  try{
+    const params=new URLSearchParams({pagina:pagLog,tam:tamLog,buscar:busquedaLog});
+    const res=await fetch('/api/logs?'+params);
+    const data=await res.json();
+    if(!data.ok) return;
+    totalLogs=data.total;
+    tbody.innerHTML='';
+    if(!data.items.length){
+      tbody.innerHTML='<tr><td colspan="3" style="text-align:center;padding:18px;color:var(--muted);">No hay logs</td></tr>';
+    } else {
+      data.items.forEach(l=>{
+        const tr=document.createElement('tr');
+        tr.innerHTML=`<td>${esc(l.fecha)}</td><td>${esc(l.usuario)}</td><td>${esc(l.accion)}</td>`;
+        tbody.appendChild(tr);
+      });
+    }
+    const total=totalLogs;
+    const totalPag=Math.ceil(total/tamLog)||1;
+    const ini=(pagLog-1)*tamLog+1, fin=Math.min(pagLog*tamLog,total);
+    document.getElementById('countLogs').textContent=`${total} resultado${total!==1?'s':''}`;
+    document.getElementById('infoLogs').textContent=total>0?`Mostrando ${ini}–${fin} de ${total}`:'Sin resultados';
+    renderPag('botonesLogs',pagLog,totalPag,pg=>{pagLog=pg;cargarLogs(false);});
+  }catch(e){console.error('Error logs:',e);}
+}
+
+function buscarLogs(){
+  clearTimeout(_logTimer);
+  _logTimer=setTimeout(()=>{ busquedaLog=document.getElementById('searchLogs').value.trim(); cargarLogs(); },400);
+}
+function limpiarFiltrosLogs(){ document.getElementById('searchLogs').value=''; busquedaLog=''; cargarLogs(); }
+function cambiarPagLog(){ tamLog=parseInt(document.getElementById('pageSizeLog').value); cargarLogs(); }
+
+cargarLogs();
+
+document.getElementById('btnLimpiarLogs').addEventListener('click', async()=>{
+  const ok=await showModal({title:'¿Eliminar todos los logs?',message:'⚠️ Se eliminarán TODOS los logs. No se puede deshacer.',icon:true,type:'confirm',confirmText:'Sí, eliminar todo',cancelText:'Cancelar',confirmClass:'danger'});
+  if(!ok) return;
+  const res=await fetch('/api/limpiar-logs',{method:'POST',headers:csrfHeaders()});
+  const data=await res.json();
+  if(data.ok){
+    await showModal({title:'Logs eliminados',message:`Se eliminaron <strong>${data.eliminados}</strong> registro(s).`,icon:true,type:'success'});
+    busquedaLog=''; document.getElementById('searchLogs').value=''; cargarLogs();
+  }
+});
+
+// DUPLICADOS
+const BLOQUES_DUP={apellido_nacimiento:'Apellido y nacimiento',correo:'Correo',celular:'Celular'};
+
+function celdaDuplicado(p){
+  const atendido=p.usuario_atendio?`<br><span style="font-size:10px;color:var(--success);">Recibido por ${esc(p.usuario_atendio)}</span>`:'';
+  return `<td><strong>${esc(p.apellidos)}, ${esc(p.nombres)}</strong> <span style="color:var(--muted);">#${p.id}</span><br>
+    <span style="font-size:11px;">${esc(p.tipo_documento)} ${esc(p.numero_documento)} · ${esc(p.fecha_nacimiento)}</span><br>
+    <span style="font-size:11px;color:var(--muted);">${esc(p.correo)} · ${esc(p.celular)}</span>${atendido}</td>`;
+}
+
+async function cargarDuplicados(){
+  const tbody=document.getElementById('tbodyDuplicados');
+  const estado=document.getElementById('filtroEstadoDup').value;
+  try{
+    const res=await fetch('/api/duplicados?estado='+estado);
+    const data=await res.json();
+    if(!data.ok) return;
+    const u=data.ultima_corrida;
+    document.getElementById('infoDuplicados').textContent=`${data.items.length} par(es)`+(u?` · último análisis ${u.fin}`:' · aún sin analizar');
+    if(!data.items.length){
+      tbody.innerHTML='<tr><td colspan="5" style="text-align:center;padding:18px;color:var(--muted);">No hay pares en este estado</td></tr>';
+      return;
+    }
+    tbody.innerHTML=data.items.map(d=>{
+      const bloques=d.bloques.split(',').map(b=>BLOQUES_DUP[b]||b).join(', ');
+      const acciones=d.estado==='pendiente'
+        ?`<button class="btn js-revisar-dup" data-id="${d.id}" data-estado="confirmado" style="background:var(--danger);color:#fff;">Es duplicado</button>
+          <button class="btn js-revisar-dup" data-id="${d.id}" data-estado="descartado">Son distintos</button>`
+        :`<span style="font-size:11px;color:var(--muted);">${esc(d.revisado_por)} · ${esc(d.revisado_at)}</span>`;
+      return `<tr><td><strong>${Math.round(d.puntaje*100)}%</strong><br><span style="font-size:10px;color:var(--muted);">nombre ${Math.round(d.similitud_nombre*100)}% · doc ${Math.round(d.similitud_documento*100)}%</span></td>
+        ${celdaDuplicado(d.a)}${celdaDuplicado(d.b)}<td>${esc(bloques)}</td><td>${acciones}</td></tr>`;
+    }).join('');
+  }catch(e){console.error('Error duplicados:',e);}
+}
+
+document.addEventListener('click', async e=>{
+  if(!e.target.classList.contains('js-revisar-dup')) return;
+  const {id,estado}=e.target.dataset;
+  const res=await fetch(`/api/duplicados/${id}/revisar`,{method:'POST',headers:csrfHeaders(),body:JSON.stringify({estado})});
+  const data=await res.json();
+  if(data.ok){ showNotif(estado==='confirmado'?'Marcado como duplicado':'Marcados como personas distintas','success'); cargarDuplicados(); }
+  else showNotif(data.error||'No se pudo guardar','error');
+});
+
+document.getElementById('btnAnalizarDuplicados').addEventListener('click', async()=>{
+  const res=await fetch('/api/duplicados/analizar',{method:'POST',headers:csrfHeaders()});
+  const data=await res.json();
+  if(!data.ok){ showNotif(data.error||'No se pudo iniciar el análisis','error'); return; }
+  // 200: el servidor ya corrió el análisis (sin tareas en segundo plano); 202: queda pedido
+  if(res.status===200){ showNotif(`🔁 Análisis listo: ${data.resultado.marcados} par(es) nuevo(s)`,'success'); cargarDuplicados(); return; }
+  showNotif('🔁 Análisis en curso; la lista se actualiza en unos segundos','info');
+  setTimeout(cargarDuplicados, 5000);
+});
+
+// ESTADÍSTICAS
+const AREA_CFG={
+  GGRD: {nombre:'Gestión del Riesgo de Desastres',icon:'🚨',bg:'linear-gradient(135deg,#fee2e2,#fecaca)',primary:'#dc2626',secondary:'#991b1b'},
+  GSCGA:{nombre:'Servicios a la Ciudad y Gestión Ambiental',icon:'🌿',bg:'linear-gradient(135deg,#d1fae5,#a7f3d0)',primary:'#10b981',secondary:'#047857'},
+  GFC:  {nombre:'Fiscalización y Control',icon:'👮',bg:'linear-gradient(135deg,#dbeafe,#bfdbfe)',primary:'#3b82f6',secondary:'#1e40af'},
+  GSC:  {nombre:'Seguridad Ciudadana',icon:'🛡️',bg:'linear-gradient(135deg,#ede9fe,#ddd6fe)',primary:'#8b5cf6',secondary:'#6d28d9'},
+  GDE:  {nombre:'Desarrollo Económico',icon:'💼',bg:'linear-gradient(135deg,#fef3c7,#fde68a)',primary:'#f59e0b',secondary:'#d97706'}
+};
+
+function mostrarEstadisticas(data){
+  document.getElementById('statMujeresRegistradas').textContent=data.registrados_mujeres||0;
+  document.getElementById('statHombresRegistrados').textContent=data.registrados_hombres||0;
+  document.getElementById('statMujeresRecibidas').textContent=data.recibidos_mujeres||0;
+  document.getElementById('statHombresRecibidos').textContent=data.recibidos_hombres||0;
+  if(data.por_area){
+    const container=document.getElementById('statsAreas'); container.innerHTML='';
+    Object.entries(data.por_area).forEach(([codigo,total])=>{
+      const cfg=AREA_CFG[codigo]||{nombre:codigo,icon:'📋',bg:'linear-gradient(135deg,#f3f4f6,#e5e7eb)',primary:'#6b7280',secondary:'#374151'};
+      const card=document.createElement('div');
+      card.style.cssText=`background:${cfg.bg};border-radius:16px;padding:24px;box-shadow:0 4px 12px rgba(0,0,0,0.1);`;
+      card.innerHTML=`<div style="display:flex;align-items:center;gap:12px;margin-bottom:16px;"><div style="width:48px;height:48px;background:${cfg.primary};border-radius:12px;display:flex;align-items:center;justify-content:center;font-size:24px;color:white;">${cfg.icon}</div><div><div class="area-nombre" style="font-size:13px;font-weight:700;color:${cfg.secondary};"></div><div style="font-size:11px;color:${cfg.primary};">Total postulantes</div></div></div><div style="font-size:36px;font-weight:800;color:${cfg.primary};">${Number(total)}</div>`;
+      card.querySelector('.area-nombre').textContent=cfg.nombre;
+      container.appendChild(card);
+    });
+  }
+}
+
+// CONVOCATORIA
+let convActiva = true;
+
+async function cargarEstadoConvocatoria() {
+  try {
+    const data = await fetchCondicional('/api/convocatoria/estado');
+    if (data && data.ok) aplicarEstadoConvocatoria(data.activa);
+  } catch(e) { console.error('Error cargando estado convocatoria:', e); }
+}
+
+function aplicarEstadoConvocatoria(activa) {
+  convActiva = activa;
+  const dot    = document.getElementById('convDot');
+  const label  = document.getElementById('convEstadoLabel');
+  const desc   = document.getElementById('convDesc');
+  const card   = document.getElementById('convCard');
+  const btnCerrar = document.getElementById('btnCerrarConv');
+  const btnAbrir  = document.getElementById('btnAbrirConv');
+
+  if (activa) {
+    dot.style.background = '#22c55e';
+    dot.style.boxShadow  = '0 0 0 4px rgba(34,197,94,0.2)';
+    label.textContent    = 'CONVOCATORIA ABIERTA';
+    label.style.color    = '#15803d';
+    desc.textContent     = 'El formulario público está activo. Los ciudadanos pueden registrar su postulación.';
+    card.style.boxShadow = '0 12px 40px rgba(0,0,0,0.15)';
+    btnCerrar.style.display = '';
+    btnAbrir.style.display  = 'none';
+  } else {
+    dot.style.background = '#b00020';
+    dot.style.boxShadow  = '0 0 0 4px rgba(176,0,32,0.2)';
+    label.textContent    = 'CONVOCATORIA CERRADA';
+    label.style.color    = '#b00020';
+    desc.textContent     = 'El formulario público está desactivado. Ningún ciudadano puede registrarse en este momento.';
+    card.style.boxShadow = '0 12px 40px rgba(176,0,32,0.2)';
+    btnCerrar.style.display = 'none';
+    btnAbrir.style.display  = '';
+  }
+  const ahora = new Date().toLocaleString('es-PE');
+  document.getElementById('convUltimoUpdate').textContent = ahora;
+}
+
+async function cambiarEstadoConvocatoria(nuevoEstado) {
+  const msg = nuevoEstado
+    ? '¿Deseas <strong>ABRIR</strong> la convocatoria?<br><br>Los ciudadanos podrán registrarse nuevamente.'
+    : '¿Deseas <strong>CERRAR</strong> la convocatoria?<br><br>Ningún ciudadano podrá registrarse hasta que la vuelvas a abrir.';
+
+  const ok = await showModal({
+    title: nuevoEstado ? '🔓 Abrir convocatoria' : '🔒 Cerrar convocatoria',
+    message: msg, icon: true, type: 'confirm',
+    confirmText: nuevoEstado ? 'Sí, abrir' : 'Sí, cerrar',
+    cancelText: 'Cancelar',
+    confirmClass: nuevoEstado ? 'success' : 'danger'
+  });
+  if (!ok) return;
+
+  try {
+    const res = await fetch('/api/convocatoria/estado', {
+      method: 'POST', headers: csrfHeaders(),
+      body: JSON.stringify({ activa: nuevoEstado })
+    });
+    const data = await res.json();
+    if (data.ok) {
+      aplicarEstadoConvocatoria(data.activa);
+      showNotif(
+        nuevoEstado ? '✅ Convocatoria abierta — el formulario está activo' : '🔒 Convocatoria cerrada — el formulario está desactivado',
+        nuevoEstado ? 'success' : 'warning'
+      );
+    } else {
+      await showModal({ title: 'Error', message: data.error || 'No se pudo cambiar el estado.', icon: true, type: 'error' });
+    }
+  } catch(e) {
+    await showModal({ title: 'Error', message: 'Error de conexión.', icon: true, type: 'error' });
+  }
+}
+
+// CAMPAÑAS
+async function cargarCampanas() {
+  try {
+    const res = await fetch('/api/campanas');
+    const data = await res.json();
+    if (!data.ok) return;
+    document.getElementById('tbodyCampanas').innerHTML = data.campanas.map(c => {
+      const estado = c.archivada ? '<span class="badge badge-off">Archivada</span>'
+        : !c.vigente ? '<span class="badge badge-off">Finalizada</span>'
+        : c.abierta ? '<span class="badge badge-ok">Abierta</span>'
+        : '<span class="badge badge-off">Cerrada</span>';
+      const acciones = c.archivada ? `<a class="btn" style="background:var(--blue-2);color:#fff;" href="/admin/export/archivo/${c.id}">📦 CSV archivo</a>`
+        : !c.vigente ? '—' : `
+        <button class="btn" style="background:${c.abierta ? '#b00020' : '#0f9d58'};color:#fff;" onclick="cambiarEstadoCampana(${c.id}, ${c.abierta ? 'false' : 'true'})">${c.abierta ? '🔒 Cerrar' : '🔓 Abrir'}</button>
+        <button class="btn btn-danger" onclick="finalizarCampana(${c.id})">🏁 Finalizar</button>`;
+      return `<tr><td>${esc(c.nombre)}</td><td>${estado}</td>
+        <td>${c.vigente ? c.total : '—'}</td><td>${c.vigente ? c.pendientes : '—'}</td>
+        <td>${esc(c.created_at)}</td><td>${acciones}</td></tr>`;
+    }).join('');
+  } catch(e) { console.error('Error cargando campañas:', e); }
+}
+
+async function cambiarEstadoCampana(id, abierta) {
+  const res = await fetch(`/api/campanas/${id}/estado`, {
+    method: 'POST', headers: csrfHeaders(), body: JSON.stringify({ abierta })
+  });
+  const data = await res.json();
+  if (!data.ok) return showModal({ title: 'Error', message: data.error || 'No se pudo cambiar el estado.', icon: true, type: 'error' });
+  cargarCampanas();
+  cargarEstadoConvocatoria();
+}
+
+async function finalizarCampana(id, forzar = false) {
+  const ok = await showModal({
+    title: '🏁 Finalizar campaña',
+    message: forzar
+      ? 'La campaña aún tiene postulantes sin recibir.<br><br>¿Finalizarla de todos modos?'
+      : '¿Deseas <strong>FINALIZAR</strong> la campaña?<br><br>Se cerrará el registro y sus postulantes dejarán de aparecer en las listas.',
+    icon: true, type: 'confirm', confirmText: 'Sí, finalizar', cancelText: 'Cancelar', confirmClass: 'danger'
+  });
+  if (!ok) return;
+  const res = await fetch(`/api/campanas/${id}/finalizar`, {
+    method: 'POST', headers: csrfHeaders(), body: JSON.stringify({ forzar })
+  });
+  const data = await res.json();
+  if (!data.ok && data.pendientes && !forzar) return finalizarCampana(id, true);
+  if (!data.ok) return showModal({ title: 'Error', message: data.error || 'No se pudo finalizar.', icon: true, type: 'error' });
+  showNotif('🏁 Campaña finalizada', 'success');
+  cargarCampanas();
+  cargarEstadoConvocatoria();
+}
+
+document.getElementById('formCampana').addEventListener('submit', async e => {
+  e.preventDefault();
+  const nombre = e.target.nombre.value.trim();
+  if (!nombre) return;
+  const res = await fetch('/api/campanas', {
+    method: 'POST', headers: csrfHeaders(), body: JSON.stringify({ nombre })
+  });
+  const data = await res.json();
+  if (!data.ok) return showModal({ title: 'Error', message: data.error || 'No se pudo crear la campaña.', icon: true, type: 'error' });
+  e.target.reset();
+  showNotif('✅ Campaña creada', 'success');
+  cargarCampanas();
+});
+
+// ==========================================
+// USUARIOS CONECTADOS — heartbeat + polling
+// Actualiza indicadores en tabla Y sidebar
+// ==========================================
+
+async function sendHeartbeat() {
+  try {
+    const res = await fetch('/api/heartbeat', { method: 'POST', headers: csrfHeaders() });
+    registrarIntervalo('/api/heartbeat', res);
+  } catch(e) { /* silencioso */ }
+}
+
+// Actualiza los puntos verde/rojo en la tabla de usuarios
+function actualizarDotsTabla(activos) {
+  const activosSet = new Set(activos.map(u => u.username));
+  document.querySelectorAll('#tbodyUsuarios tr[data-username]').forEach(row => {
+    const username = row.dataset.username;
+    const dot = row.querySelector('.conexion-dot');
+    const label = row.querySelector('.conexion-label');
+    if (!dot) return;
+    const conectado = activosSet.has(username);
+    dot.style.background = conectado ? '#22c55e' : '#f87171';
+    dot.title = conectado ? 'Conectado' : 'Desconectado';
+    if (label) {
+      label.textContent = conectado ? 'Conectado' : 'Desconectado';
+      label.style.color = conectado ? '#15803d' : 'var(--muted)';
+    }
+  });
+}
+
+// Actualiza el mini-panel de la sidebar
+function actualizarSidebar(activos) {
+  const lista  = document.getElementById('sidebarListaActivos');
+  const badge  = document.getElementById('sidebarBadgeActivos');
+  if (!lista || !badge) return;
+
+  badge.textContent = activos.length;
+
+  if (activos.length === 0) {
+    lista.innerHTML = '<span style="font-size:11px;color:var(--muted);font-style:italic;">Nadie conectado</span>';
+    return;
+  }
+
+  lista.innerHTML = activos.map(u => {
+    const esAdmin = u.rol === 'admin';
+    const color = esAdmin ? '#f59e0b' : '#3b82f6';
+    return `<div style="display:flex;align-items:center;gap:6px;padding:5px 8px;background:#f8fafc;border-radius:8px;border:1px solid var(--border);">
+      <div style="width:8px;height:8px;border-radius:50%;background:#22c55e;flex-shrink:0;"></div>
+      <span style="font-size:11px;font-weight:700;color:var(--text);flex:1;overflow:hidden;text-overflow:ellipsis;white-space:nowrap;">${esc(u.username)}</span>
+      <span style="background:${color};color:white;padding:1px 5px;border-radius:4px;font-size:9px;font-weight:700;">${u.rol}</span>
+    </div>`;
+  }).join('');
+}
+
+function mostrarUsuariosActivos(activos) {
+  // Actualizar panel principal (pestaña Usuarios)
+  const lista  = document.getElementById('listaActivos');
+  const badge  = document.getElementById('badgeActivos');
+  badge.textContent = activos.length;
+
+  if (activos.length === 0) {
+    lista.innerHTML = '<span style="font-size:12px;color:#6b7280;font-style:italic;">Ningún usuario activo en este momento</span>';
+  } else {
+    lista.innerHTML = activos.map(u => {
+      const rolColor = u.rol === 'admin'
+        ? { bg: '#fef3c7', border: '#f59e0b', text: '#92400e', badge: '#f59e0b' }
+        : { bg: '#e0f2fe', border: '#38bdf8', text: '#0369a1', badge: '#0284c7' };
+      const segs = u.segundos_inactivo;
+      const tiempoStr = segs < 10 ? 'activo ahora' : `hace ${segs}s`;
+      return `<div style="display:inline-flex;align-items:center;gap:8px;padding:8px 14px;border-radius:99px;background:${rolColor.bg};border:1px solid ${rolColor.border};font-size:12px;font-weight:700;color:${rolColor.text};">
+        <div style="width:8px;height:8px;border-radius:50%;background:#22c55e;animation:pulse 2s infinite;"></div>
+        ${esc(u.username)}
+        <span style="background:${rolColor.badge};color:white;padding:1px 7px;border-radius:99px;font-size:10px;font-weight:700;">${u.rol}</span>
+        <span style="font-size:10px;font-weight:400;opacity:0.7;">${tiempoStr}</span>
+      </div>`;
+    }).join('');
+  }
+
+  // Actualizar dots en tabla y mini-panel sidebar
+  actualizarDotsTabla(activos);
+  actualizarSidebar(activos);
+}
+
+// El latido es una escritura: va aparte, cada 30s (o lo que indique el servidor)
+sendHeartbeat();
+repetirPoll(sendHeartbeat, '/api/heartbeat', 30000);
+
+// ==========================================
+// SNAPSHOT DEL PANEL — un solo ciclo de polling
+// ==========================================
+// Pendientes nuevos, recibidos nuevos, estadísticas, conectados y convocatoria llegan en
+// una respuesta; el servidor devuelve los cursores since / atendidos_desde para la siguiente.
+let snapshotEnCurso=false;
+
+async function pollSnapshot(){
+  if(document.hidden||snapshotEnCurso) return;
+  snapshotEnCurso=true;
+  try{
+    const params=new URLSearchParams({since:maxIdReg, atendidos_desde:atendidosDesde});
+    const data=await fetchCondicional('/api/admin/snapshot?'+params);
+    if(data===null){ setOnline(); return; }
+    if(!data.ok){ setOffline(); return; }
+    maxIdReg=Math.max(maxIdReg,data.since);
+    atendidosDesde=data.atendidos_desde||atendidosDesde;
+
+    if(data.pendientes.length&&tablaReg.anteponer(data.pendientes.slice().reverse()))
+      showNotif(`📝 ${data.pendientes.length} nuevo(s) registrado(s)`,'info');
+    // Un recibido sale de Registrados (si estaba) y entra arriba en Recibidos
+    data.atendidos.forEach(p=>{
+      const estaba=tablaReg.quitar(p.id);
+      if(tablaRec.anteponer([p],true)&&estaba) showNotif(`✅ ${p.apellidos} atendido por ${p.usuario_atendio}`,'success');
+    });
+
+    mostrarEstadisticas(data.estadisticas);
+    mostrarUsuariosActivos(data.activos||[]);
+    aplicarEstadoConvocatoria(data.convocatoria.activa);
+    setOnline();
+  }catch(e){console.error('Error snapshot:',e); setOffline();}
+  finally{ snapshotEnCurso=false; }
+}
+
+// Primero las tablas completas; después el snapshot sigue desde sus cursores
+Promise.all([cargarRegistradosInicial(), cargarRecibidosInicial()]).then(()=>{
+  pollSnapshot();
+  repetirPoll(pollSnapshot, '/api/admin/snapshot', 3000);
+});
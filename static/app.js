@@ -749,6 +749,13 @@ document.getElementById('linkPrivacidad').addEventListener('click', function(e)
 // ENVÍO DEL FORMULARIO CON VALIDACIÓN DE DNI ÚNICO
 // ===============================
 
+let envioPendiente = null;
+
+function nuevaClaveIdempotencia() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2, 12);
+}
+
 form.addEventListener("submit", async (e) => {
   e.preventDefault();
   
@@ -840,11 +847,18 @@ form.addEventListener("submit", async (e) => {
       delete payload.tipo_discapacidad;
     }
     
+    // La misma clave se reutiliza si el envío falla por red: el servidor repite su respuesta
+    // en lugar de procesar el registro dos veces
+    const cuerpo = JSON.stringify(payload);
+    if (!envioPendiente || envioPendiente.cuerpo !== cuerpo) {
+      envioPendiente = { clave: nuevaClaveIdempotencia(), cuerpo };
+    }
     const response = await fetch("/api/submit", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(payload)
+      headers: { "Content-Type": "application/json", "Idempotency-Key": envioPendiente.clave },
+      body: cuerpo
     });
+    envioPendiente = null;
 
     const text = await response.text();
     let result;
@@ -864,7 +878,13 @@ form.addEventListener("submit", async (e) => {
     form.reset();
     limpiarTodosLosErrores();
     setMsg("", true);
-    showToastSuccess("✅ Registro exitoso. Su postulación ha sido recibida.");
+    if (result.recibo) {
+      // Ingesta diferida: el servidor confirmó el recibo, falta la aceptación final
+      setMsg(`📨 Postulación recibida. Comprobante: ${result.recibo}`, true);
+      confirmarRecibo(result.recibo);
+    } else {
+      showToastSuccess("✅ Registro exitoso. Su postulación ha sido recibida.");
+    }
     
     // Resetear el campo convocatoria después del reset
     convocatoria.disabled = true;
@@ -881,6 +901,35 @@ form.addEventListener("submit", async (e) => {
 });
 
 
+// ===============================
+// CONFIRMACIÓN DE RECIBO (ingesta diferida)
+// ===============================
+async function confirmarRecibo(recibo, intento = 0) {
+  try {
+    const response = await fetch(`/api/submit/estado/${encodeURIComponent(recibo)}`);
+    const result = await response.json();
+    if (result.estado === "aceptado") {
+      setMsg("", true);
+      showToastSuccess("✅ Registro exitoso. Su postulación ha sido recibida.");
+      return;
+    }
+    if (result.estado === "rechazado") {
+      setMsg("❌ " + (result.error || "Su postulación no pudo registrarse"), false);
+      showToastError(result.error || "Su postulación no pudo registrarse");
+      return;
+    }
+  } catch (err) {
+    console.error(err);
+  }
+  // Sigue pendiente: reintenta con espera creciente hasta ~1 minuto
+  if (intento < 12) {
+    setTimeout(() => confirmarRecibo(recibo, intento + 1), Math.min(1000 * (intento + 1), 8000));
+  } else {
+    showToastSuccess(`📨 Postulación recibida. Guarde su comprobante: ${recibo}`);
+  }
+}
+
+
 // ===============================
 // ACCESO ADMIN (3 CLICS EN LOGO)
 // ===============================
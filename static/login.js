@@ -0,0 +1,35 @@
+// Toggle mostrar/ocultar contraseña
+const togglePassword = document.getElementById('togglePassword');
+const passwordInput = document.getElementById('password');
+
+togglePassword.addEventListener('click', function() {
+  const type = passwordInput.getAttribute('type') === 'password' ? 'text' : 'password';
+  passwordInput.setAttribute('type', type);
+
+  // Cambiar el icono
+  this.textContent = type === 'password' ? '👁️' : '🙈';
+
+  // Actualizar aria-label
+  this.setAttribute('aria-label', type === 'password' ? 'Mostrar contraseña' : 'Ocultar contraseña');
+});
+
+// Prevenir envíos duplicados
+const loginForm = document.getElementById('loginForm');
+const submitBtn = document.getElementById('submitBtn');
+
+loginForm.addEventListener('submit', function(e) {
+  // Deshabilitar botón para evitar doble submit
+  submitBtn.disabled = true;
+  submitBtn.textContent = 'Ingresando...';
+
+  // Re-habilitar después de 3 segundos por si hay error de validación
+  setTimeout(function() {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Ingresar';
+  }, 3000);
+});
+
+// Focus automático en el campo usuario al cargar
+window.addEventListener('load', function() {
+  document.getElementById('usuario').focus();
+});
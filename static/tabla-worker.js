@@ -0,0 +1,45 @@
+// ==========================================
+// FILTRADO DE TablaVirtual FUERA DEL HILO PRINCIPAL
+// ==========================================
+// Copia de ids, texto de búsqueda (ya en minúsculas) y claves exactas,
+// en el mismo orden que la tabla. Responde a "filtrar" con los ids visibles.
+let ids = [], textos = [], claves = [];
+
+function quitar(lista) {
+  const fuera = new Set(lista);
+  const i2 = [], t2 = [], k2 = [];
+  for (let i = 0; i < ids.length; i++) {
+    if (fuera.has(ids[i])) continue;
+    i2.push(ids[i]); t2.push(textos[i]); k2.push(claves[i]);
+  }
+  ids = i2; textos = t2; claves = k2;
+}
+
+function filtrar(texto, igual) {
+  const condiciones = Object.entries(igual || {}).filter(([, v]) => v);
+  const salida = new Int32Array(ids.length);
+  let n = 0;
+  for (let i = 0; i < ids.length; i++) {
+    if (texto && !textos[i].includes(texto)) continue;
+    if (condiciones.length && condiciones.some(([c, v]) => claves[i][c] !== v)) continue;
+    salida[n++] = ids[i];
+  }
+  return salida.slice(0, n);
+}
+
+self.onmessage = (e) => {
+  const m = e.data;
+  if (m.tipo === 'cargar') {
+    ids = m.ids; textos = m.textos; claves = m.claves;
+  } else if (m.tipo === 'anteponer') {
+    ids = m.ids.concat(ids); textos = m.textos.concat(textos); claves = m.claves.concat(claves);
+  } else if (m.tipo === 'quitar') {
+    quitar(m.ids);
+  } else if (m.tipo === 'actualizar') {
+    const i = ids.indexOf(m.id);
+    if (i >= 0) { textos[i] = m.texto; claves[i] = m.claves; }
+  } else if (m.tipo === 'filtrar') {
+    const r = filtrar(m.texto, m.igual);
+    self.postMessage({ seq: m.seq, ids: r }, [r.buffer]);
+  }
+};
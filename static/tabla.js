@@ -0,0 +1,218 @@
+// ==========================================
+// TABLA VIRTUAL (compartida por admin.js y usuario.js)
+// ==========================================
+// Los datos viven en arrays planos; el texto de búsqueda de cada fila se arma una sola vez
+// en minúsculas y el filtrado corre en un Web Worker (tabla-worker.js). En el DOM solo se
+// dibujan las filas de la página actual o, con cfg.scroll, las que caben en el viewport.
+const TABLA_WORKER_URL = document.currentScript ? document.currentScript.dataset.worker : '';
+const SEP_BUSQUEDA = '\u0001';
+const MARGEN_FILAS = 10;
+const NUEVO_MS = 2000;
+
+class TablaVirtual {
+  // cfg: tbody, columnas, fila(item, n) -> <tr>, campos (búsqueda), claves (filtros exactos),
+  //      vacio (html cuando no hay datos), alCambiar(estado), scroll (contenedor), tam, claseNueva
+  constructor(cfg) {
+    this.cfg = cfg;
+    this.items = []; this.porId = new Map(); this.indice = new Map();
+    this.visibles = []; this.texto = ''; this.igual = {};
+    this.pag = 1; this.tam = cfg.tam || 25; this.altoFila = 0;
+    this.seq = 0; this.nuevos = new Map(); this.programado = false;
+    this.worker = null;
+    if (window.Worker && TABLA_WORKER_URL) {
+      try {
+        this.worker = new Worker(TABLA_WORKER_URL);
+        this.worker.onmessage = (e) => this._resultado(e.data);
+        // Si el worker no carga, se filtra en el hilo principal
+        this.worker.onerror = () => { this.worker = null; this._filtrar(false); };
+      } catch (e) { this.worker = null; }
+    }
+    if (cfg.scroll) {
+      cfg.scroll.addEventListener('scroll', () => this._programar(), { passive: true });
+      window.addEventListener('resize', () => this._programar());
+    }
+  }
+
+  get total() { return this.items.length; }
+  obtener(id) { return this.porId.get(Number(id)); }
+  tiene(id) { return this.porId.has(Number(id)); }
+  filaDe(id) { return this.cfg.tbody.querySelector(`tr[data-id="${Number(id)}"]`); }
+  hayFiltro() { return !!this.texto || Object.values(this.igual).some(v => v); }
+
+  _indexar(item) {
+    const texto = this.cfg.campos.map(c => item[c] == null ? '' : String(item[c])).join(SEP_BUSQUEDA).toLowerCase();
+    const claves = {};
+    (this.cfg.claves || []).forEach(c => { claves[c] = item[c] == null ? '' : String(item[c]); });
+    this.indice.set(item.id, { texto, claves });
+    return this.indice.get(item.id);
+  }
+
+  _enviar(tipo, lista) {
+    if (!this.worker) return;
+    const idx = lista.map(it => this.indice.get(it.id));
+    this.worker.postMessage({ tipo, ids: lista.map(it => it.id), textos: idx.map(x => x.texto), claves: idx.map(x => x.claves) });
+  }
+
+  cargar(lista) {
+    this.items = lista.map(it => ({ ...it, id: Number(it.id) }));
+    this.porId = new Map(); this.indice = new Map();
+    this.items.forEach(it => { this.porId.set(it.id, it); this._indexar(it); });
+    this._enviar('cargar', this.items);
+    this._filtrar(true);
+  }
+
+  // Inserta arriba, en el orden dado, los items que aún no están; devuelve cuántos entraron
+  anteponer(lista, nuevo = false) {
+    const entran = [];
+    lista.forEach(it => {
+      const id = Number(it.id);
+      if (this.porId.has(id)) return;
+      const item = { ...it, id };
+      this.porId.set(id, item); this._indexar(item); entran.push(item);
+      if (nuevo) this.nuevos.set(id, Date.now());
+    });
+    if (!entran.length) return 0;
+    this.items = entran.concat(this.items);
+    this._enviar('anteponer', entran);
+    this._filtrar(false);
+    return entran.length;
+  }
+
+  quitar(id) {
+    id = Number(id);
+    if (!this.porId.delete(id)) return false;
+    this.indice.delete(id); this.nuevos.delete(id);
+    this.items = this.items.filter(it => it.id !== id);
+    this.visibles = this.visibles.filter(x => x !== id);
+    if (this.worker) this.worker.postMessage({ tipo: 'quitar', ids: [id] });
+    this.render();
+    return true;
+  }
+
+  actualizar(id, cambios) {
+    const item = this.obtener(id);
+    if (!item) return null;
+    Object.assign(item, cambios, { id: item.id });
+    const idx = this._indexar(item);
+    if (this.worker) this.worker.postMessage({ tipo: 'actualizar', id: item.id, texto: idx.texto, claves: idx.claves });
+    this._filtrar(false);
+    return item;
+  }
+
+  filtrar(texto, igual = {}, reset = true) {
+    this.texto = (texto || '').toLowerCase();
+    this.igual = igual;
+    this._filtrar(reset);
+  }
+
+  _filtrar(reset) {
+    if (reset) {
+      this.pag = 1;
+      if (this.cfg.scroll) this.cfg.scroll.scrollTop = 0;
+    }
+    this.seq++;
+    if (!this.hayFiltro()) {
+      this.visibles = this.items.map(it => it.id);
+      this.render();
+    } else if (this.worker) {
+      this.worker.postMessage({ tipo: 'filtrar', seq: this.seq, texto: this.texto, igual: this.igual });
+    } else {
+      const condiciones = Object.entries(this.igual).filter(([, v]) => v);
+      this.visibles = [];
+      for (const it of this.items) {
+        const idx = this.indice.get(it.id);
+        if (this.texto && !idx.texto.includes(this.texto)) continue;
+        if (condiciones.some(([c, v]) => idx.claves[c] !== v)) continue;
+        this.visibles.push(it.id);
+      }
+      this.render();
+    }
+  }
+
+  _resultado(m) {
+    // Respuestas de filtros ya reemplazados se descartan
+    if (m.seq !== this.seq) return;
+    this.visibles = Array.from(m.ids).filter(id => this.porId.has(id));
+    this.render();
+  }
+
+  irPagina(pag) { this.pag = pag; this.render(); }
+  tamPagina(tam) { this.tam = tam; this.pag = 1; this.render(); }
+
+  // Lleva la fila a la vista (página o posición de scroll) y la devuelve si quedó dibujada
+  mostrar(id) {
+    const i = this.visibles.indexOf(Number(id));
+    if (i < 0) return null;
+    const { scroll } = this.cfg;
+    if (scroll) {
+      const alto = this.altoFila || 40;
+      scroll.scrollTop = Math.max(0, i * alto - scroll.clientHeight / 2);
+    } else {
+      this.pag = Math.floor(i / this.tam) + 1;
+    }
+    this.render();
+    return this.filaDe(id);
+  }
+
+  _programar() {
+    if (this.programado) return;
+    this.programado = true;
+    requestAnimationFrame(() => { this.programado = false; this.render(); });
+  }
+
+  _espaciador(alto) {
+    const tr = document.createElement('tr');
+    const td = document.createElement('td');
+    td.colSpan = this.cfg.columnas || 1;
+    td.style.cssText = `height:${alto}px;padding:0;border:0;`;
+    tr.appendChild(td);
+    return tr;
+  }
+
+  _esNuevo(id) {
+    const ts = this.nuevos.get(id);
+    if (ts === undefined) return false;
+    if (Date.now() - ts < NUEVO_MS) return true;
+    this.nuevos.delete(id);
+    return false;
+  }
+
+  render() {
+    const { tbody, fila, scroll } = this.cfg;
+    const total = this.visibles.length;
+    const alto = this.altoFila || 40;
+    let ini, fin, totalPag = 1;
+    if (scroll) {
+      const desde = Math.max(0, scroll.scrollTop - tbody.offsetTop);
+      ini = Math.max(0, Math.floor(desde / alto) - MARGEN_FILAS);
+      fin = Math.min(total, Math.ceil((desde + scroll.clientHeight) / alto) + MARGEN_FILAS);
+    } else {
+      totalPag = Math.ceil(total / this.tam) || 1;
+      if (this.pag > totalPag) this.pag = totalPag;
+      ini = (this.pag - 1) * this.tam;
+      fin = Math.min(ini + this.tam, total);
+    }
+
+    if (!this.items.length && this.cfg.vacio) {
+      tbody.innerHTML = this.cfg.vacio;
+    } else {
+      const frag = document.createDocumentFragment();
+      if (scroll && ini > 0) frag.appendChild(this._espaciador(ini * alto));
+      for (let i = ini; i < fin; i++) {
+        const item = this.porId.get(this.visibles[i]);
+        if (!item) continue;
+        const tr = fila(item, i + 1);
+        if (this._esNuevo(item.id)) tr.classList.add(this.cfg.claseNueva || 'highlight-new');
+        frag.appendChild(tr);
+      }
+      if (scroll && fin < total) frag.appendChild(this._espaciador((total - fin) * alto));
+      tbody.replaceChildren(frag);
+      // El alto real de fila se mide una vez; con él se recalcula la ventana
+      if (scroll && !this.altoFila) {
+        const tr = tbody.querySelector('tr[data-id]');
+        if (tr && tr.offsetHeight) { this.altoFila = tr.offsetHeight; this._programar(); }
+      }
+    }
+    if (this.cfg.alCambiar) this.cfg.alCambiar({ total, ini, fin, pag: this.pag, totalPag });
+  }
+}
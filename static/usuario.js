@@ -0,0 +1,640 @@
+// ── CSRF helper
+function getCsrfToken() {
+  return document.querySelector('meta[name="csrf-token"]')?.content || '';
+}
+function csrfHeaders() {
+  return { 'Content-Type': 'application/json', 'X-CSRF-Token': getCsrfToken() };
+}
+
+// ── Peticiones condicionales: reenvía el ETag de la última respuesta de la misma URL.
+// Devuelve null cuando el servidor responde 304 (sin cambios).
+const _etags = new Map();
+// Formato columnar (?formato=columnar): columnas en arrays, las de pocos valores como {dic, idx}
+function decodificarLista(data) {
+  if (!data || data.formato !== 'columnar') return data;
+  const cols = Object.entries(data.columnas).map(([k, v]) => Array.isArray(v) ? [k, v, null] : [k, v.idx, v.dic]);
+  const items = new Array(data.n);
+  for (let i = 0; i < data.n; i++) {
+    const o = {};
+    for (const [k, vals, dic] of cols) o[k] = dic ? dic[vals[i]] : vals[i];
+    items[i] = o;
+  }
+  data.items = items;
+  return data;
+}
+
+async function fetchCondicional(url) {
+  const clave = url.split('?')[0];
+  const previo = _etags.get(clave);
+  const headers = previo && previo.url === url ? { 'If-None-Match': previo.etag } : {};
+  const res = await fetch(url, { headers });
+  registrarIntervalo(url, res);
+  if (res.status === 304) return null;
+  const etag = res.headers.get('ETag');
+  if (etag && res.ok) _etags.set(clave, { url, etag }); else _etags.delete(clave);
+  return decodificarLista(await res.json());
+}
+
+// ── Intervalo de polling: el servidor sugiere X-Poll-Interval-Ms y, si está ocupado (503),
+// Retry-After. Cada ciclo espera el mayor entre su intervalo base y el sugerido.
+const _intervalos = new Map();
+function registrarIntervalo(url, res) {
+  const clave = url.split('?')[0];
+  const sugerido = Number(res.headers.get('X-Poll-Interval-Ms')) || 0;
+  const reintento = res.status === 503 ? (Number(res.headers.get('Retry-After')) || 0) * 1000 : 0;
+  const ms = Math.max(sugerido, reintento);
+  if (ms) _intervalos.set(clave, ms); else _intervalos.delete(clave);
+}
+function repetirPoll(fn, url, base) {
+  const ciclo = async () => {
+    try { await fn(); }
+    finally {
+      const ms = Math.max(base, _intervalos.get(url) || 0);
+      setTimeout(ciclo, ms * (0.9 + Math.random() * 0.2));
+    }
+  };
+  setTimeout(ciclo, base);
+}
+
+function updateDateTime(){
+  document.getElementById("datetime").textContent =
+    new Date().toLocaleString("es-PE");
+}
+updateDateTime();
+setInterval(updateDateTime, 1000);
+
+// ✅ ==========================================
+// SCROLL HORIZONTAL CON RUEDA DEL MOUSE
+// ==========================================
+const tableWrap = document.getElementById('tableWrap');
+
+// Con la tabla virtual el contenedor también hace scroll vertical: la rueda solo
+// se desvía a horizontal con Shift o cuando no hay nada que recorrer en vertical
+tableWrap.addEventListener('wheel', (e) => {
+  const vertical = tableWrap.scrollHeight > tableWrap.clientHeight;
+  if (tableWrap.scrollWidth > tableWrap.clientWidth && (e.shiftKey || !vertical)) {
+    e.preventDefault();
+    tableWrap.scrollLeft += e.deltaY;
+  }
+});
+
+// ==========================================
+// SISTEMA DE MODALES
+// ==========================================
+const modalOverlay = document.getElementById('modalOverlay');
+const modalTitle = document.getElementById('modalTitle');
+const modalBody = document.getElementById('modalBody');
+const modalFooter = document.getElementById('modalFooter');
+
+function showModal(config) {
+  return new Promise((resolve) => {
+    modalTitle.textContent = config.title || 'Aviso';
+
+    let bodyHTML = '';
+    if (config.icon) {
+      const iconClass = config.type || 'info';
+      const icons = {
+        success: '✓',
+        error: '✕',
+        warning: '⚠',
+        info: 'ℹ'
+      };
+      bodyHTML += `<div class="modal-icon ${iconClass}">${icons[iconClass] || icons.info}</div>`;
+    }
+    bodyHTML += `<div style="text-align:center">${config.message || ''}</div>`;
+    modalBody.innerHTML = bodyHTML;
+
+    modalFooter.innerHTML = '';
+
+    if (config.type === 'confirm') {
+      const btnCancel = document.createElement('button');
+      btnCancel.className = 'modal-btn modal-btn-cancel';
+      btnCancel.textContent = config.cancelText || 'Cancelar';
+      btnCancel.onclick = () => {
+        closeModal();
+        resolve(false);
+      };
+
+      const btnConfirm = document.createElement('button');
+      btnConfirm.className = `modal-btn modal-btn-${config.confirmClass || 'confirm'}`;
+      btnConfirm.textContent = config.confirmText || 'Aceptar';
+      btnConfirm.onclick = () => {
+        closeModal();
+        resolve(true);
+      };
+
+      modalFooter.appendChild(btnCancel);
+      modalFooter.appendChild(btnConfirm);
+    } else {
+      const btnOk = document.createElement('button');
+      btnOk.className = 'modal-btn modal-btn-confirm';
+      btnOk.textContent = 'Aceptar';
+      btnOk.onclick = () => {
+        closeModal();
+        resolve(true);
+      };
+      modalFooter.appendChild(btnOk);
+    }
+
+    modalOverlay.classList.add('active');
+  });
+}
+
+function closeModal() {
+  modalOverlay.classList.remove('active');
+}
+
+modalOverlay.addEventListener('click', (e) => {
+  if (e.target === modalOverlay) {
+    closeModal();
+  }
+});
+
+// ✅ ==========================================
+// TABLA DE PENDIENTES (TablaVirtual de tabla.js)
+// ==========================================
+// Solo se dibujan las filas visibles del contenedor con scroll; los datos
+// y el índice de búsqueda viven en memoria y el filtro corre en un Worker.
+const CAMPOS_EDITABLES = [
+  'area', 'convocatoria', 'apellidos', 'nombres', 'tipo_documento', 'numero_documento',
+  'fecha_nacimiento', 'sexo', 'celular', 'correo', 'fuerzas_armadas', 'tiene_discapacidad', 'tipo_discapacidad'
+];
+const reservados = new Set();
+const nuevos = new Set();
+
+function esc(str) {
+  if (str === null || str === undefined || str === '') return '-';
+  return String(str).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]));
+}
+
+function buildRow(p, n) {
+  const tr = document.createElement('tr');
+  tr.className = nuevos.has(p.id) ? 'row new-postulante' : 'row';
+  tr.dataset.id = p.id;
+  tr.innerHTML = `
+    <td class="td-num">${n}</td>
+    <td class="area">${esc(p.area)}</td>
+    <td class="convocatoria">${esc(p.convocatoria)}</td>
+    <td class="apellidos">${esc(p.apellidos)}</td>
+    <td class="nombres">${esc(p.nombres)}</td>
+    <td class="tipo-doc">${esc(p.tipo_documento)}</td>
+    <td class="num-doc">${esc(p.numero_documento)}</td>
+    <td class="fecha-nac">${esc(p.fecha_nacimiento)}</td>
+    <td class="sexo">${esc(p.sexo)}</td>
+    <td class="celular">${esc(p.celular)}</td>
+    <td class="correo">${esc(p.correo)}</td>
+    <td class="fuerzas-armadas">${esc(p.fuerzas_armadas)}</td>
+    <td class="tiene-discapacidad">${esc(p.tiene_discapacidad)}</td>
+    <td class="tipo-discapacidad">${esc(p.tipo_discapacidad)}</td>
+    <td class="created">${esc(p.created_at)}</td>
+    <td>
+      <div class="actions">
+        <button class="btn btn-success js-recibir" data-id="${p.id}">📥 Recibir</button>
+        <button class="btn btn-warning js-editar" data-id="${p.id}">✏️ Editar</button>
+      </div>
+    </td>
+  `;
+  return tr;
+}
+
+const tabla = new TablaVirtual({
+  tbody: document.getElementById('tbody'),
+  scroll: tableWrap,
+  columnas: 16,
+  fila: buildRow,
+  campos: ['area', 'convocatoria', 'apellidos', 'nombres', 'tipo_documento', 'numero_documento', 'celular', 'correo'],
+  claves: ['sexo'],
+  claseNueva: 'new-row-animate',
+  vacio: `
+    <tr id="emptyRow">
+      <td colspan="16" class="empty">✅ No hay postulantes pendientes</td>
+    </tr>
+  `,
+  alCambiar: ({ total }) => {
+    document.getElementById('badgeCount').textContent = tabla.hayFiltro()
+      ? `${total} ${total === 1 ? 'resultado' : 'resultados'}`
+      : `${tabla.total} pendientes`;
+  }
+});
+
+// Quita la fila con la animación de salida si está dibujada
+function quitarPostulante(id) {
+  reservados.delete(String(id));
+  nuevos.delete(Number(id));
+  const row = tabla.filaDe(id);
+  if (!row) {
+    tabla.quitar(id);
+    return;
+  }
+  row.classList.add('removing');
+  setTimeout(() => tabla.quitar(id), 300);
+}
+
+// ✅ ==========================================
+// FUNCIONALIDAD: EDITAR POSTULANTE
+// ==========================================
+document.addEventListener('click', async (e) => {
+  if (e.target.classList.contains('js-editar')) {
+    const btn = e.target;
+    const id = btn.dataset.id;
+    const item = tabla.obtener(id);
+
+    if (!item) {
+      await showModal({
+        title: 'Error',
+        message: 'Este postulante ya no está disponible.',
+        icon: true,
+        type: 'error'
+      });
+      return;
+    }
+
+    // Datos actuales desde la tabla en memoria (escapados para los atributos value)
+    const currentData = {};
+    CAMPOS_EDITABLES.forEach(c => { currentData[c] = esc(item[c]); });
+
+    // Mostrar formulario de edición en modal
+    modalTitle.textContent = '✏️ Editar Postulante';
+    modalBody.innerHTML = `
+      <form id="editForm">
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">Área</label>
+            <input type="text" class="form-input" id="edit_area" value="${currentData.area !== '-' ? currentData.area : ''}">
+          </div>
+          <div class="form-group">
+            <label class="form-label">Convocatoria</label>
+            <input type="text" class="form-input" id="edit_convocatoria" value="${currentData.convocatoria}" required>
+          </div>
+        </div>
+
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">Apellidos</label>
+            <input type="text" class="form-input" id="edit_apellidos" value="${currentData.apellidos}" required>
+          </div>
+          <div class="form-group">
+            <label class="form-label">Nombres</label>
+            <input type="text" class="form-input" id="edit_nombres" value="${currentData.nombres}" required>
+          </div>
+        </div>
+
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">Tipo Documento</label>
+            <select class="form-select" id="edit_tipo_documento" required>
+              <option value="DNI" ${currentData.tipo_documento === 'DNI' ? 'selected' : ''}>DNI</option>
+              <option value="CE" ${currentData.tipo_documento === 'CE' ? 'selected' : ''}>Carnet de Extranjería</option>
+              <option value="Pasaporte" ${currentData.tipo_documento === 'Pasaporte' ? 'selected' : ''}>Pasaporte</option>
+            </select>
+          </div>
+          <div class="form-group">
+            <label class="form-label">N° Documento</label>
+            <input type="text" class="form-input" id="edit_numero_documento" value="${currentData.numero_documento}" required>
+          </div>
+        </div>
+
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">Fecha Nacimiento</label>
+            <input type="date" class="form-input" id="edit_fecha_nacimiento" value="${currentData.fecha_nacimiento}" required>
+          </div>
+          <div class="form-group">
+            <label class="form-label">Sexo</label>
+            <select class="form-select" id="edit_sexo" required>
+              <option value="Masculino" ${currentData.sexo === 'Masculino' ? 'selected' : ''}>Masculino</option>
+              <option value="Femenino" ${currentData.sexo === 'Femenino' ? 'selected' : ''}>Femenino</option>
+            </select>
+          </div>
+        </div>
+
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">Celular</label>
+            <input type="tel" class="form-input" id="edit_celular" value="${currentData.celular}" required>
+          </div>
+          <div class="form-group">
+            <label class="form-label">Correo</label>
+            <input type="email" class="form-input" id="edit_correo" value="${currentData.correo}" required>
+          </div>
+        </div>
+
+        <div class="form-row">
+          <div class="form-group">
+            <label class="form-label">FF.AA.</label>
+            <select class="form-select" id="edit_fuerzas_armadas">
+              <option value="" ${currentData.fuerzas_armadas === '-' ? 'selected' : ''}>No aplica</option>
+              <option value="Sí" ${currentData.fuerzas_armadas === 'Sí' ? 'selected' : ''}>Sí</option>
+              <option value="No" ${currentData.fuerzas_armadas === 'No' ? 'selected' : ''}>No</option>
+            </select>
+          </div>
+          <div class="form-group">
+            <label class="form-label">Tiene Discapacidad</label>
+            <select class="form-select" id="edit_tiene_discapacidad">
+              <option value="" ${currentData.tiene_discapacidad === '-' ? 'selected' : ''}>No aplica</option>
+              <option value="Sí" ${currentData.tiene_discapacidad === 'Sí' ? 'selected' : ''}>Sí</option>
+              <option value="No" ${currentData.tiene_discapacidad === 'No' ? 'selected' : ''}>No</option>
+            </select>
+          </div>
+        </div>
+
+        <div class="form-group">
+          <label class="form-label">Tipo Discapacidad</label>
+          <input type="text" class="form-input" id="edit_tipo_discapacidad" value="${currentData.tipo_discapacidad !== '-' ? currentData.tipo_discapacidad : ''}">
+        </div>
+      </form>
+    `;
+
+    modalFooter.innerHTML = '';
+
+    const btnCancel = document.createElement('button');
+    btnCancel.className = 'modal-btn modal-btn-cancel';
+    btnCancel.textContent = 'Cancelar';
+    btnCancel.onclick = closeModal;
+
+    const btnSave = document.createElement('button');
+    btnSave.className = 'modal-btn modal-btn-success';
+    btnSave.textContent = '💾 Guardar Cambios';
+    btnSave.onclick = async () => {
+      const form = document.getElementById('editForm');
+      if (!form.checkValidity()) {
+        form.reportValidity();
+        return;
+      }
+
+      const updatedData = {
+        id: id,
+        area: document.getElementById('edit_area').value || null,
+        convocatoria: document.getElementById('edit_convocatoria').value,
+        apellidos: document.getElementById('edit_apellidos').value,
+        nombres: document.getElementById('edit_nombres').value,
+        tipo_documento: document.getElementById('edit_tipo_documento').value,
+        numero_documento: document.getElementById('edit_numero_documento').value,
+        fecha_nacimiento: document.getElementById('edit_fecha_nacimiento').value,
+        sexo: document.getElementById('edit_sexo').value,
+        celular: document.getElementById('edit_celular').value,
+        correo: document.getElementById('edit_correo').value,
+        fuerzas_armadas: document.getElementById('edit_fuerzas_armadas').value || null,
+        tiene_discapacidad: document.getElementById('edit_tiene_discapacidad').value || null,
+        tipo_discapacidad: document.getElementById('edit_tipo_discapacidad').value || null
+      };
+
+      closeModal();
+      document.getElementById('loadingOverlay').classList.add('active');
+
+      try {
+        const res = await fetch('/api/editar-postulante', {
+          method: 'POST',
+          headers: csrfHeaders(),
+          body: JSON.stringify(updatedData)
+        });
+
+        const data = await res.json();
+        document.getElementById('loadingOverlay').classList.remove('active');
+
+        if (data.ok) {
+          // Actualizar el item; la tabla vuelve a dibujar la fila si está a la vista
+          const { id: _, ...cambios } = updatedData;
+          tabla.actualizar(id, cambios);
+
+          // Animación de actualización
+          const row = tabla.filaDe(id);
+          if (row) {
+            row.style.background = '#d1fae5';
+            setTimeout(() => {
+              row.style.background = '';
+            }, 1000);
+          }
+
+          await showModal({
+            title: 'Cambios guardados',
+            message: `Los datos de <strong>${esc(updatedData.apellidos)}</strong> han sido actualizados exitosamente.`,
+            icon: true,
+            type: 'success'
+          });
+        } else {
+          await showModal({
+            title: 'Error',
+            message: data.error || 'No se pudo guardar los cambios.',
+            icon: true,
+            type: 'error'
+          });
+        }
+      } catch (err) {
+        document.getElementById('loadingOverlay').classList.remove('active');
+        await showModal({
+          title: 'Error',
+          message: 'Ocurrió un error de conexión',
+          icon: true,
+          type: 'error'
+        });
+      }
+    };
+
+    modalFooter.appendChild(btnCancel);
+    modalFooter.appendChild(btnSave);
+    modalOverlay.classList.add('active');
+  }
+});
+
+// ✅ ==========================================
+// FUNCIONALIDAD: RECIBIR POSTULANTE
+// ==========================================
+async function recibirPostulante(id) {
+  const item = tabla.obtener(id);
+
+  if (!item) {
+    await showModal({
+      title: 'Error',
+      message: 'Este postulante ya no está disponible.',
+      icon: true,
+      type: 'error'
+    });
+    return;
+  }
+
+  const nombre = esc(item.apellidos);
+
+  const confirmed = await showModal({
+    title: '¿Recibir postulante?',
+    message: `¿Confirmas que has recibido la documentación de <strong>${nombre}</strong>?`,
+    icon: true,
+    type: 'confirm',
+    confirmText: 'Sí, recibir',
+    cancelText: 'Cancelar',
+    confirmClass: 'success'
+  });
+
+  if (!confirmed) {
+    if (reservados.has(String(id))) liberarReserva(id);
+    return;
+  }
+
+  document.getElementById('loadingOverlay').classList.add('active');
+
+  try {
+    const res = await fetch('/api/recibir-postulante', {
+      method: 'POST',
+      headers: csrfHeaders(),
+      body: JSON.stringify({ id })
+    });
+
+    const data = await res.json();
+    document.getElementById('loadingOverlay').classList.remove('active');
+
+    if (data.ok) {
+      quitarPostulante(id);
+
+      await showModal({
+        title: 'Postulante recibido',
+        message: `Has atendido exitosamente a <strong>${nombre}</strong>.`,
+        icon: true,
+        type: 'success'
+      });
+    } else {
+      await showModal({
+        title: 'Error',
+        message: data.error || 'No se pudo recibir el postulante.',
+        icon: true,
+        type: 'error'
+      });
+
+      if (data.error && data.error.includes('ya fue atendido')) {
+        quitarPostulante(id);
+      }
+    }
+  } catch (err) {
+    document.getElementById('loadingOverlay').classList.remove('active');
+    await showModal({
+      title: 'Error',
+      message: 'Ocurrió un error de conexión',
+      icon: true,
+      type: 'error'
+    });
+  }
+}
+
+document.addEventListener('click', (e) => {
+  if (e.target.classList.contains('js-recibir')) {
+    recibirPostulante(e.target.dataset.id);
+  }
+});
+
+// ==========================================
+// FILTROS: BÚSQUEDA Y SEXO
+// ==========================================
+const searchInput = document.getElementById('searchInput');
+const sexoFilter = document.getElementById('sexoFilter');
+
+function applyFilters() {
+  tabla.filtrar(searchInput.value, { sexo: sexoFilter.value });
+}
+
+searchInput.addEventListener('input', applyFilters);
+sexoFilter.addEventListener('change', applyFilters);
+
+// ✅ ==========================================
+// POLLING: DETECTAR NUEVOS POSTULANTES
+// ==========================================
+let maxId = 0;
+let cargaInicial = true;
+
+function addNewRows(items) {
+  items.forEach(p => {
+    if (p.id > maxId) maxId = p.id;
+    if (!cargaInicial) nuevos.add(p.id);
+  });
+  // Llegan en orden ascendente; los más recientes van arriba
+  return tabla.anteponer(items.slice().reverse(), !cargaInicial);
+}
+
+async function pollPostulantes() {
+  try {
+    const data = await fetchCondicional(`/api/postulantes/pendientes-nuevos?after_id=${maxId}&formato=columnar`);
+
+    if (data && data.ok && data.items) {
+      if (cargaInicial) {
+        data.items.forEach(p => { if (p.id > maxId) maxId = p.id; });
+        tabla.cargar(data.items.slice().reverse());
+        cargaInicial = false;
+      } else if (data.items.length > 0 && addNewRows(data.items)) {
+        showNotification(`📥 ${data.items.length} nuevo(s) postulante(s)`);
+      }
+    }
+  } catch (err) {
+    console.error('Error polling:', err);
+  }
+}
+
+pollPostulantes();
+repetirPoll(pollPostulantes, '/api/postulantes/pendientes-nuevos', 3000);
+
+function showNotification(message) {
+  const notification = document.createElement('div');
+  notification.style.cssText = `
+    position: fixed;
+    top: 80px;
+    right: 20px;
+    background: var(--success);
+    color: white;
+    padding: 14px 20px;
+    border-radius: 12px;
+    box-shadow: 0 8px 24px rgba(0,0,0,0.2);
+    font-weight: 700;
+    font-size: 13px;
+    z-index: 9999;
+    animation: slideInRight 0.3s ease-out;
+  `;
+  notification.textContent = message;
+
+  document.body.appendChild(notification);
+
+  setTimeout(() => {
+    notification.style.animation = 'slideOutRight 0.3s ease-out';
+    setTimeout(() => notification.remove(), 300);
+  }, 3000);
+}
+
+// ==========================================
+// COLA DE ATENCIÓN: TOMAR EL SIGUIENTE LIBRE
+// ==========================================
+async function tomarSiguiente() {
+  const area = document.getElementById('colaArea').value;
+  try {
+    const res = await fetch(`/api/cola/siguiente?area=${encodeURIComponent(area)}`, {
+      method: 'POST',
+      headers: csrfHeaders()
+    });
+    const data = await res.json();
+
+    if (!data.ok) {
+      await showModal({ title: 'Error', message: data.error || 'No se pudo tomar el siguiente.', icon: true, type: 'error' });
+      return;
+    }
+    if (!data.items.length) {
+      await showModal({ title: 'Cola vacía', message: 'No hay postulantes libres en la cola.', icon: true, type: 'info' });
+      return;
+    }
+
+    const p = data.items[0];
+    if (!tabla.tiene(p.id)) addNewRows([p]);
+    reservados.add(String(p.id));
+    tabla.mostrar(p.id);
+    recibirPostulante(String(p.id));
+  } catch (err) {
+    console.error('Error cola:', err);
+  }
+}
+
+async function liberarReserva(id) {
+  reservados.delete(String(id));
+  try {
+    await fetch('/api/cola/liberar', {
+      method: 'POST',
+      headers: csrfHeaders(),
+      body: JSON.stringify({ ids: [Number(id)] })
+    });
+  } catch (err) { /* la reserva vence sola */ }
+}
+
+document.getElementById('btnSiguiente').addEventListener('click', tomarSiguiente);
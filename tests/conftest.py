@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import psycopg2
+import pytest
+
+# Las pruebas corren contra un PostgreSQL real: TEST_DATABASE_URL apunta a un servidor
+# local donde se pueda crear bases. Cada sesión de pytest crea una base vacía, importa
+# app.py contra ella (init_db arma el esquema y la campaña inicial) y la borra al terminar.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF = "pruebas"
+AREAS_SEMILLA = ("GGRD", "GFC", "GDU", "GSCGA")
+
+
+@pytest.fixture(scope="session")
+def base_datos():
+    if not TEST_DATABASE_URL:
+        pytest.skip("Definir TEST_DATABASE_URL con un PostgreSQL local donde se pueda crear bases")
+    nombre = f"cas_pruebas_{os.getpid()}"
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {nombre} TEMPLATE template0 ENCODING 'UTF8'")
+    try:
+        yield urlunsplit(urlsplit(TEST_DATABASE_URL)._replace(path=f"/{nombre}"))
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {nombre} WITH (FORCE)")
+        admin.close()
+
+
+@pytest.fixture(scope="session")
+def app_modulo(base_datos):
+    # app.py se conecta al importarse: el entorno se fija antes. Sin tareas en segundo
+    # plano, nada escribe en la base fuera de las peticiones que mide cada prueba.
+    os.environ["DATABASE_URL"] = base_datos
+    os.environ["TAREAS_ACTIVAS"] = "0"
+    os.environ.setdefault("LOG_MUESTREO", "0")
+    sys.path.insert(0, RAIZ)
+    import app
+    yield app
+    app.db_pool.closeall()
+
+
+@pytest.fixture(scope="session")
+def cliente(app_modulo):
+    def crear(usuario=None, rol=None):
+        c = app_modulo.app.test_client()
+        c.environ_base["wsgi.url_scheme"] = "https"
+        if usuario:
+            with c.session_transaction() as s:
+                s.update(usuario=usuario, rol=rol, login_time=time.time(), csrf_token=CSRF)
+        return c
+    return crear
+
+
+@pytest.fixture(scope="session")
+def sembrar(app_modulo):
+    def sembrar_postulantes(n, campana_id=None):
+        fecha = app_modulo.now_peru()
+        with app_modulo.PooledConn() as conn:
+            with conn.cursor() as cur:
+                campana = {"id": campana_id} if campana_id else app_modulo.campana_abierta(cur)
+                # Los documentos siguen al último id: dos siembras nunca repiten número
+                cur.execute("SELECT COALESCE(max(id), 0) AS id FROM postulantes")
+                base = cur.fetchone()["id"] + 1
+                filas = [(campana["id"], AREAS_SEMILLA[i % len(AREAS_SEMILLA)], "N°001-2026 CAS",
+                          f"PRUEBA {base + i:09d}", "SEMILLA", "CE", f"{base + i:09d}", "1990-01-01",
+                          "Femenino" if i % 2 else "Masculino", "912345678", "semilla@ejemplo.pe",
+                          "No", "No", "", fecha) for i in range(n)]
+                ids = app_modulo.execute_values(cur, """
+                    INSERT INTO postulantes (campana_id, area, convocatoria, apellidos, nombres, tipo_documento,
+                      numero_documento, fecha_nacimiento, sexo, celular, correo, fuerzas_armadas,
+                      tiene_discapacidad, tipo_discapacidad, created_at)
+                    VALUES %s RETURNING id
+                """, filas, page_size=5000, fetch=True)
+                conn.commit()
+        return [r["id"] for r in ids]
+    return sembrar_postulantes
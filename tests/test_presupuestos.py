@@ -0,0 +1,278 @@
+import re
+import time
+
+import pytest
+
+from conftest import CSRF
+
+# (sentencias, conexiones del pool, milisegundos) como máximo por petición, en el camino
+# más caro del endpoint (caché fría, con plazo) y con los volúmenes que siembra ctx. Una
+# consulta extra en /api/submit o un N+1 en un listado hace fallar la muestra; la latencia
+# deja margen para una máquina lenta y solo atrapa lo que crece con el volumen.
+PRESUPUESTOS = {
+    # Páginas, estáticos y archivo frío (no tocan la base)
+    "estatico_dist": (0, 0, 100),
+    "home": (0, 0, 100),
+    "usuario_panel": (0, 0, 100),
+    "health": (0, 0, 100),
+    "estado_recibo": (0, 0, 100),
+    "estado_ingesta": (0, 0, 100),
+    "ver_exportacion": (0, 0, 100),
+    "descargar_exportacion": (0, 0, 100),
+    "api_buscar_archivo": (0, 0, 500),
+    "export_archivo_csv": (0, 0, 1500),
+    "login": (2, 2, 200),
+    "logout": (2, 2, 200),
+    "admin": (3, 1, 200),
+    # Formulario público: campaña abierta (caché fría) + consulta/inserción
+    "verificar_postulante": (4, 2, 200),
+    "submit": (5, 2, 200),
+    # Polling y listados: ETag en una conexión y la lectura en otra
+    "postulantes_pendientes_nuevos": (4, 2, 500),
+    "postulantes_atendidos_nuevos": (4, 2, 500),
+    "postulantes_registrados": (4, 2, 500),
+    "datos_atendidos": (2, 1, 200),
+    "postulantes_atendidos_ids": (2, 1, 200),
+    "estadisticas": (5, 2, 500),
+    "estadisticas_serie": (4, 2, 500),
+    "estadisticas_pivot": (4, 2, 1000),
+    "reporte_atencion": (4, 2, 500),
+    "usuarios_activos": (4, 2, 200),
+    "admin_snapshot": (9, 1, 1000),
+    "heartbeat": (2, 1, 200),
+    "api_logs": (3, 1, 500),
+    "listar_duplicados": (2, 1, 200),
+    # Atención
+    "recibir_postulante": (2, 1, 200),
+    "editar_postulante": (1, 1, 200),
+    "api_eliminar": (1, 1, 200),
+    "cola_siguiente": (2, 1, 200),
+    "cola_liberar": (1, 1, 200),
+    # Administración
+    "crear_usuario": (1, 1, 200),
+    "activar_usuario": (1, 1, 200),
+    "desactivar_usuario": (1, 1, 200),
+    "eliminar_usuario": (1, 1, 200),
+    "cambiar_password": (2, 2, 200),
+    "limpiar_logs": (1, 1, 500),
+    "get_estado_convocatoria": (2, 2, 200),
+    "set_estado_convocatoria": (2, 2, 200),
+    "listar_campanas": (1, 1, 200),
+    "crear_campana": (3, 2, 500),
+    "estado_campana": (2, 2, 200),
+    "finalizar_campana": (7, 2, 500),
+    "crear_exportacion": (1, 1, 200),
+    # El Excel se arma y se estiliza celda por celda: ~1,5 s por cada mil recibidos
+    "export_directo": (4, 3, 10000),
+    # Sin tareas en segundo plano la detección corre dentro de la petición
+    "analizar_duplicados": (11, 2, 2000),
+    "revisar_duplicado": (1, 1, 200),
+    "listar_tareas": (2, 1, 200),
+    "pedir_tarea": (2, 2, 200),
+}
+
+
+def postulacion_nueva(ctx, dni="dni"):
+    p = ctx["postulante"]
+    return {**{k: v for k, v in p.items() if k != "id"}, "tipo_documento": "DNI", "numero_documento": ctx[dni]}
+
+
+# (rol, método, ruta, cuerpo, estado esperado[, opciones]); las rutas se completan con ctx y
+# un cuerpo invocable se arma con ctx. Opciones: "captura" guarda el "id" de la respuesta en
+# esa clave de ctx, "espera" aguarda a que esa exportación termine, "spool" activa la
+# ingesta por spool y "form" envía el cuerpo como formulario. Corren en este orden: al
+# final las que borran logs, crean o finalizan campañas e inician sesión.
+MUESTRAS = [
+    (None, "GET", "/", None, 200),
+    (None, "GET", "/login", None, 200),
+    (None, "GET", "/api/health", None, 200),
+    (None, "POST", "/api/verificar-postulante", lambda ctx: {"tipo_documento": "DNI", "numero_documento": ctx["dni"]}, 200),
+    (None, "POST", "/api/submit", postulacion_nueva, 200),
+    (None, "POST", "/api/submit", lambda ctx: postulacion_nueva(ctx, "dni_spool"), 202, {"spool": True}),
+    (None, "GET", "/api/submit/estado/{recibo}", None, 200, {"spool": True}),
+    ("usuario", "GET", "/usuario", None, 200),
+    ("usuario", "GET", "/api/postulantes/pendientes-nuevos?after_id=0", None, 200),
+    ("usuario", "POST", "/api/postulantes/datos-atendidos", lambda ctx: {"ids": ctx["atendidos"]}, 200),
+    ("usuario", "GET", "/api/postulantes/atendidos-ids?after_id=0", None, 200),
+    ("usuario", "GET", "/api/postulantes/registrados", None, 200),
+    ("usuario", "POST", "/api/cola/siguiente?n=5", None, 200),
+    ("usuario", "POST", "/api/cola/liberar", lambda ctx: {"ids": [ctx["pendiente"]]}, 200),
+    ("usuario", "POST", "/api/editar-postulante", lambda ctx: {**ctx["postulante"], "celular": "987654321"}, 200),
+    ("usuario", "POST", "/api/recibir-postulante", lambda ctx: {"id": ctx["pendiente"]}, 200),
+    ("usuario", "POST", "/api/heartbeat", {}, 200),
+    ("usuario", "POST", "/api/eliminar/{descartable}", {}, 200),
+    ("admin", "GET", "/admin", None, 200),
+    ("admin", "GET", "/api/ingesta/estado", None, 200),
+    ("admin", "GET", "/api/postulantes/atendidos-nuevos?after_id=0", None, 200),
+    ("admin", "GET", "/api/estadisticas", None, 200),
+    ("admin", "GET", "/api/estadisticas/serie?granularidad=dia", None, 200),
+    ("admin", "GET", "/api/estadisticas/pivot?dims=area,sexo", None, 200),
+    ("admin", "GET", "/api/reportes/atencion", None, 200),
+    ("admin", "GET", "/api/logs", None, 200),
+    ("admin", "GET", "/api/logs?buscar=postulante", None, 200),
+    ("admin", "GET", "/api/usuarios-activos", None, 200),
+    ("admin", "GET", "/api/admin/snapshot", None, 200),
+    ("admin", "POST", "/api/crear-usuario", lambda ctx: {"username": ctx["usuario"], "password": "pruebas", "rol": "usuario"}, 200),
+    ("admin", "POST", "/api/desactivar-usuario", lambda ctx: {"username": ctx["usuario"]}, 200),
+    ("admin", "POST", "/api/activar-usuario", lambda ctx: {"username": ctx["usuario"]}, 200),
+    ("admin", "POST", "/api/cambiar-password", lambda ctx: {"username": ctx["usuario"], "password": "pruebas2"}, 200),
+    ("admin", "POST", "/api/eliminar-usuario", lambda ctx: {"username": ctx["usuario"]}, 200),
+    ("admin", "GET", "/api/convocatoria/estado", None, 200),
+    ("admin", "POST", "/api/convocatoria/estado", {"activa": True}, 200),
+    ("admin", "GET", "/api/campanas", None, 200),
+    ("admin", "POST", "/api/campanas/{campana}/estado", {"abierta": True}, 200),
+    # Caché de exportaciones vacía: la descarga directa genera el archivo
+    ("admin", "GET", "/admin/export/csv", None, 200),
+    ("admin", "GET", "/admin/export/excel", None, 200),
+    ("admin", "POST", "/api/exportaciones", {"tipo": "csv"}, 202, {"captura": "export_id", "espera": True}),
+    ("admin", "GET", "/api/exportaciones/{export_id}", None, 200),
+    ("admin", "GET", "/api/exportaciones/{export_id}/descarga", None, 200),
+    ("admin", "GET", "/api/archivo/{archivada}/buscar?documento={dni_archivado}", None, 200),
+    ("admin", "GET", "/admin/export/archivo/{archivada}", None, 200),
+    ("admin", "GET", "/api/duplicados", None, 200),
+    ("admin", "POST", "/api/duplicados/analizar", {}, 200),
+    ("admin", "POST", "/api/duplicados/{duplicado}/revisar", {"estado": "descartado"}, 200),
+    ("admin", "GET", "/api/admin/tareas", None, 200),
+    ("admin", "POST", "/api/admin/tareas/presencia/ejecutar", {}, 202),
+    (None, "GET", "/static/dist/{estatico}", None, 200),
+    ("admin", "POST", "/api/limpiar-logs", {}, 200),
+    ("admin", "POST", "/api/campanas", lambda ctx: {"nombre": f"Pruebas {ctx['usuario']}"}, 200, {"captura": "nueva"}),
+    ("admin", "POST", "/api/campanas/{nueva}/finalizar", {"forzar": True}, 200),
+    ("usuario", "GET", "/logout", None, 302),
+    (None, "POST", "/login", lambda ctx: {"usuario": ctx["login"], "password": "pruebas", "csrf_token": CSRF}, 302,
+     {"form": True}),
+]
+ARCHIVADOS = 2000
+POSTULANTES = 5000
+LOGS = 3000
+
+
+@pytest.fixture(scope="module")
+def ctx(app_modulo, sembrar, cliente, tmp_path_factory):
+    # Volúmenes de una campaña real: un N+1 o un listado sin límite se notan en consultas y latencia
+    marca = int(time.time())
+    parche = pytest.MonkeyPatch()
+    carpeta = tmp_path_factory.mktemp("presupuestos")
+    parche.setattr(app_modulo, "ARCHIVO_DIR", str(carpeta / "archivo"))
+    parche.setattr(app_modulo, "DIST_DIR", str(carpeta / "dist"))
+    parche.setattr(app_modulo, "EXPORT_DIR", str(carpeta / "exportaciones"))
+    (carpeta / "dist").mkdir()
+    (carpeta / "dist" / "app.pruebas.js").write_text("console.log('pruebas');\n" * 200)
+    admin = cliente("pruebas_admin", "admin")
+
+    # Campaña finalizada y archivada, con sus postulantes en el archivo frío
+    resp = admin.post("/api/campanas", json={"nombre": f"Archivada {marca}"}, headers={"X-CSRF-Token": CSRF})
+    archivada = resp.get_json()["id"]
+    sembrar(ARCHIVADOS, archivada)
+    resp = admin.post(f"/api/campanas/{archivada}/finalizar", json={"forzar": True}, headers={"X-CSRF-Token": CSRF})
+    assert resp.status_code == 200, resp.get_json()
+    with app_modulo.PooledConn() as conn:
+        indice = app_modulo.archivar_campana(conn, archivada)
+
+    ids = sembrar(POSTULANTES)
+    pendiente, descartable = ids[-2:]
+    atendidos = ids[:POSTULANTES // 2]
+    with app_modulo.PooledConn() as conn:
+        with conn.cursor() as cur:
+            # La mitad ya recibida, repartida entre dos usuarios
+            cur.execute("""
+                UPDATE postulantes
+                SET usuario_atendio = CASE WHEN id %% 2 = 0 THEN 'pruebas_usuario' ELSE 'pruebas_otro' END,
+                    fecha_atencion = created_at
+                WHERE id = ANY(%s)
+            """, (atendidos,))
+            app_modulo.execute_values(cur, "INSERT INTO logs (fecha, usuario, accion) VALUES %s",
+                                      [(app_modulo.now_peru(), "pruebas_usuario", f"Recibió al postulante {i}")
+                                       for i in range(LOGS)], page_size=1000)
+            # Un par sospechoso: misma persona con DNI y CE
+            cur.execute("SELECT campana_id FROM postulantes WHERE id = %s", (pendiente,))
+            campana = cur.fetchone()["campana_id"]
+            app_modulo.execute_values(cur, """
+                INSERT INTO postulantes (campana_id, area, convocatoria, apellidos, nombres, tipo_documento,
+                  numero_documento, fecha_nacimiento, sexo, celular, correo, fuerzas_armadas,
+                  tiene_discapacidad, tipo_discapacidad, created_at)
+                VALUES %s
+            """, [(campana, "GGRD", "N°001-2026 CAS", "QUISPE MAMANI", "ROSA ELENA", tipo, doc, "1985-06-15",
+                   "Femenino", "998877665", "rquispe@ejemplo.pe", "No", "No", "", app_modulo.now_peru())
+                  for tipo, doc in (("DNI", f"{30000000 + marca % 10**7:08d}"), ("CE", f"{marca % 10**9:09d}"))])
+            cur.execute("""
+                INSERT INTO usuarios (username, password, rol, activo, created_at)
+                VALUES (%s, 'pruebas', 'usuario', 1, %s)
+            """, (f"pruebas_login_{marca}", app_modulo.now_peru()))
+            conn.commit()
+        app_modulo.detectar_duplicados(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT max(id) AS id FROM duplicados_sospechosos WHERE estado = 'pendiente'")
+            duplicado = cur.fetchone()["id"]
+            cur.execute(f"SELECT {', '.join(app_modulo.CAMPOS_POSTULACION)}, id "
+                        f"FROM postulantes WHERE id = %s", (pendiente,))
+            postulante = dict(cur.fetchone())
+    assert duplicado, "la siembra no dejó un par sospechoso"
+
+    # Un recibo real del spool, como lo devuelve /api/submit con INGESTA_SPOOL
+    spool = str(carpeta / "spool.db")
+    parche.setattr(app_modulo, "INGESTA_SPOOL", spool)
+    app_modulo.init_spool()
+    with app_modulo.app.test_request_context():
+        resp, _ = app_modulo.encolar_postulacion(
+            campana, postulacion_nueva({"postulante": postulante, "dni": f"{60000000 + marca % 10**7:08d}"}))
+        recibo = resp.get_json()["recibo"]
+    parche.setattr(app_modulo, "INGESTA_SPOOL", None)
+
+    yield {"postulante": postulante, "pendiente": pendiente, "descartable": descartable, "campana": campana,
+           "atendidos": atendidos[:500], "duplicado": duplicado, "recibo": recibo, "archivada": archivada,
+           "dni_archivado": indice["bloques"][0]["doc_min"], "estatico": "app.pruebas.js",
+           "dni": f"{40000000 + marca % 10**7:08d}", "dni_spool": f"{50000000 + marca % 10**7:08d}",
+           "usuario": f"pruebas_{marca}", "login": f"pruebas_login_{marca}", "spool": spool,
+           "export_id": "ninguna", "nueva": 0}
+    parche.undo()
+
+
+@pytest.fixture(scope="module")
+def clientes(cliente):
+    publico = cliente()
+    with publico.session_transaction() as s:
+        s["csrf_token"] = CSRF
+    return {None: publico,
+            "usuario": cliente("pruebas_usuario", "usuario"),
+            "admin": cliente("pruebas_admin", "admin")}
+
+
+def test_endpoints_con_presupuesto_y_muestra(app_modulo):
+    rutas = app_modulo.app.url_map.bind("localhost")
+    endpoints = {r.endpoint for r in app_modulo.app.url_map.iter_rules()} - {"static"}
+    # Cada marcador de la ruta vale por un id cualquiera: solo importa a qué endpoint llega
+    medidos = {rutas.match(re.sub(r"\{\w+\}", "1", m[2]).split("?")[0], method=m[1])[0] for m in MUESTRAS}
+    assert sorted(set(PRESUPUESTOS) ^ endpoints) == []
+    assert sorted(endpoints - medidos) == []
+
+
+@pytest.mark.parametrize("muestra", MUESTRAS, ids=[f"{m[1]} {m[2]}" for m in MUESTRAS])
+def test_consultas_por_endpoint(app_modulo, clientes, ctx, muestra, monkeypatch):
+    rol, metodo, ruta, cuerpo, estado, *opciones = muestra
+    opciones = opciones[0] if opciones else {}
+    ruta = ruta.format(**ctx)
+    if callable(cuerpo):
+        cuerpo = cuerpo(ctx)
+    if opciones.get("spool"):
+        monkeypatch.setattr(app_modulo, "INGESTA_SPOOL", ctx["spool"])
+    datos = {"data": cuerpo} if opciones.get("form") else {"json": cuerpo}
+    resp = clientes[rol].open(ruta, method=metodo, headers={"X-CSRF-Token": CSRF} if rol else None, **datos)
+    # El conteo se cierra en teardown_request, que en los streams corre al cerrar la respuesta
+    resp.get_data()
+    resp.close()
+    if "captura" in opciones and resp.is_json:
+        ctx[opciones["captura"]] = (resp.get_json() or {}).get("id", ctx[opciones["captura"]])
+    medido = app_modulo._conteo.ultimo
+    if opciones.get("espera"):
+        limite = time.time() + 30
+        while (app_modulo.leer_exportacion(ctx[opciones["captura"]]) or {}).get("estado") != "listo":
+            assert time.time() < limite, "la exportación no terminó"
+            time.sleep(0.05)
+
+    assert resp.status_code == estado, resp.get_data(as_text=True)[:300]
+    assert medido["endpoint"] in PRESUPUESTOS, f"{medido['endpoint']} no tiene presupuesto"
+    max_consultas, max_conexiones, max_ms = PRESUPUESTOS[medido["endpoint"]]
+    assert medido["consultas"] <= max_consultas, medido
+    assert medido["conexiones"] <= max_conexiones, medido
+    assert medido["latencia_ms"] <= max_ms, medido
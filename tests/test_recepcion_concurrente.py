@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+
+from conftest import CSRF
+
+HILOS = 8
+POSTULANTES = 50
+
+
+def test_cada_postulante_se_recibe_una_vez(app_modulo, cliente, sembrar):
+    # Todos los hilos recorren los mismos ids en el mismo orden: cada recepción compite con las demás
+    ids = sembrar(POSTULANTES)
+    barrera = threading.Barrier(HILOS)
+    recibidos = defaultdict(list)
+    rechazos = defaultdict(list)
+    errores = []
+    lock = threading.Lock()
+
+    def atender(n):
+        usuario = f"pruebas_{n}"
+        c = cliente(usuario, "usuario")
+        barrera.wait()
+        for pid in ids:
+            resp = c.post("/api/recibir-postulante", json={"id": pid}, headers={"X-CSRF-Token": CSRF})
+            with lock:
+                if resp.status_code == 200:
+                    recibidos[pid].append(usuario)
+                elif resp.status_code == 409:
+                    rechazos[pid].append(resp.get_json()["error"])
+                else:
+                    errores.append(f"{usuario} id {pid}: {resp.status_code} {resp.get_data(as_text=True)[:120]}")
+
+    trabajadores = [threading.Thread(target=atender, args=(n,)) for n in range(HILOS)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+
+    with app_modulo.PooledConn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT p.id, p.usuario_atendio,
+                       (SELECT count(*) FROM logs l
+                        WHERE l.accion = 'Recibió a ' || p.apellidos || ', ' || p.nombres) AS logs
+                FROM postulantes p WHERE p.id = ANY(%s)
+            """, (ids,))
+            filas = {r["id"]: r for r in cur.fetchall()}
+
+    assert errores == []
+    for pid in ids:
+        ganadores = recibidos.get(pid, [])
+        assert len(ganadores) == 1, f"id {pid}: recibido por {ganadores}"
+        assert filas[pid]["usuario_atendio"] == ganadores[0]
+        assert filas[pid]["logs"] == 1
+        # Quien pierde la carrera se entera de quién ganó
+        assert rechazos[pid] == [f"Ya fue recibido por {ganadores[0]}"] * (HILOS - 1)
+
+
+def test_el_perdedor_ve_al_ganador(app_modulo, cliente, sembrar):
+    # El ganador tiene la fila bloqueada sin confirmar: el perdedor espera y responde con su nombre
+    pid, = sembrar(1)
+    ganador = psycopg2.connect(app_modulo.DATABASE_URL)
+    try:
+        with ganador.cursor() as cur:
+            cur.execute("UPDATE postulantes SET usuario_atendio = 'pruebas_ganador', fecha_atencion = %s "
+                        "WHERE id = %s", (app_modulo.now_peru(), pid))
+        perdedor = cliente("pruebas_perdedor", "usuario")
+        resp = {}
+        hilo = threading.Thread(target=lambda: resp.update(r=perdedor.post(
+            "/api/recibir-postulante", json={"id": pid}, headers={"X-CSRF-Token": CSRF})))
+        hilo.start()
+        time.sleep(0.3)
+        assert hilo.is_alive()
+        ganador.commit()
+        hilo.join()
+    finally:
+        ganador.close()
+    assert resp["r"].status_code == 409
+    assert resp["r"].get_json()["error"] == "Ya fue recibido por pruebas_ganador"